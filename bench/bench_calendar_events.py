@@ -0,0 +1,80 @@
+# bench/bench_calendar_events.py
+# ------------------------------------------------------------
+# Compara el constructor de eventos por filas (iterrows) con el vectorizado.
+# Uso: python -m bench.bench_calendar_events [--sizes 1000 10000 100000]
+# ------------------------------------------------------------
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.calendar_events import build_events, status_color
+
+ROOMS = ["Glass Room 1", "Glass Room 2", "Glass Room 3", "Glass Room 4", "Winners", "Ballito Area"]
+STATUSES = ["Pendiente", "Confirmado", "Cancelado", None]
+
+
+def synthetic_bookings(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24, n), unit="h")
+    end = start + pd.to_timedelta(rng.integers(1, 8, n), unit="h")
+    return pd.DataFrame(
+        {
+            "id": np.arange(1, n + 1),
+            "room": rng.choice(ROOMS, n),
+            "title": rng.choice(["Boda", "Reunión", "Cumpleaños", "Graduación"], n),
+            "organizador": rng.choice(["Rivera", "", None, "Pérez"], n),
+            "start_dt": start.strftime("%Y-%m-%dT%H:%M:%S"),
+            "end_dt": end.strftime("%Y-%m-%dT%H:%M:%S"),
+            "color": rng.choice(["#3b82f6", "", None], n),
+            "status": rng.choice(np.array(STATUSES, dtype=object), n),
+        }
+    )
+
+
+def build_events_rowwise(df: pd.DataFrame) -> list[dict]:
+    # Implementación anterior de la página (referencia)
+    events = []
+    for _, r in df.iterrows():
+        title_txt = f'{r["room"]}: {r["title"]}'
+        if pd.notna(r.get("organizador", None)) and str(r["organizador"]).strip():
+            title_txt += f' ({r["organizador"]})'
+        events.append(
+            {
+                "id": str(r["id"]),
+                "title": title_txt,
+                "start": r["start_dt"],
+                "end": r["end_dt"],
+                "color": status_color(r),
+            }
+        )
+    return events
+
+
+def _best_of(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    print(f"{'filas':>8} {'iterrows (s)':>13} {'vectorizado (s)':>16} {'speed-up':>9}")
+    for n in args.sizes:
+        df = synthetic_bookings(n)
+        assert build_events(df) == build_events_rowwise(df)
+        t_row = _best_of(build_events_rowwise, df, 1 if n >= 100_000 else args.repeat)
+        t_vec = _best_of(build_events, df, args.repeat)
+        print(f"{n:>8} {t_row:>13.4f} {t_vec:>16.4f} {t_row / t_vec:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# bench/bench_suite.py
+# ------------------------------------------------------------
+# Suite de rendimiento de los caminos calientes de Reservas
+# - Genera (o reutiliza) un bookings.db sintético por tamaño (bench/gen_db.py)
+# - Cada tamaño corre en un subproceso con DATA_DIR propio (utils.db fija la
+#   ruta al importarse y cachea conexiones/índices por proceso)
+# - Mide lecturas, choques, enlaces Confirmar/Cancelar, ventana de recordatorios,
+#   eventos del calendario, formato y páginas de la lista, búsqueda FTS,
+#   disponibilidad y ocupación
+# - Renderiza la página completa con AppTest y mide cada sección por separado
+#   (sección = rerun con su toggle encendido menos el rerun base)
+# - Resultados en JSON; --compare marca regresiones contra una corrida anterior
+# Uso: python -m bench.bench_suite [--sizes 1000 10000 100000 1000000]
+#      python -m bench.bench_suite --sizes 10000 --compare bench/results/<anterior>.json
+# ------------------------------------------------------------
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "bench" / "results"
+WORK_DIR = Path(tempfile.gettempdir()) / "eventos-bench"
+PAGE = "pages/01_Reservas.py"
+# Toggles de la página, en orden de aparición (la sección base es cabecera + formulario + calendario)
+SECTIONS = (
+    "show_rooms_admin",
+    "show_import",
+    "show_availability",
+    "show_search",
+    "show_bookings_list",
+    "show_series",
+    "show_analytics",
+    "show_reminders",
+)
+
+
+def _timed(fn, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"min": min(times), "median": statistics.median(times), "n": repeat}
+
+
+def _per_call(fn, args: list) -> dict:
+    # Muchas llamadas cortas: se reporta el tiempo por llamada
+    t0 = time.perf_counter()
+    for a in args:
+        fn(*a)
+    total = time.perf_counter() - t0
+    return {"min": total / len(args), "median": total / len(args), "n": len(args)}
+
+
+# ======================= HOT PATHS (subproceso) =======================
+
+def hot_paths(rows: int, repeat: int) -> dict:
+    """Mide los caminos calientes contra el DB de DATA_DIR (ya generado)."""
+    from utils import tokens
+    from utils.analytics import occupancy
+    from utils.availability import find_free_slots
+    from utils.bookings import (
+        get_booking_index,
+        has_overlap,
+        has_overlap_sql,
+        list_page,
+        list_view,
+        read_bookings,
+        read_reminder_window,
+        set_booking_status,
+        update_status_by_token,
+    )
+    from utils.calendar_events import build_events, visible_range
+    from utils.db import get_conn, to_ts
+    from utils.search import search
+
+    out = {}
+    t0 = time.perf_counter()
+    conn = get_conn()
+    out["db.open"] = {"min": time.perf_counter() - t0, "median": time.perf_counter() - t0, "n": 1}
+    t0 = time.perf_counter()
+    get_booking_index()
+    out["index.build"] = {"min": time.perf_counter() - t0, "median": time.perf_counter() - t0, "n": 1}
+
+    today = datetime.now().date()
+    big = repeat if rows <= 100_000 else 1
+    out["read_bookings.all"] = _timed(lambda: read_bookings(conn), big)
+    out["read_bookings.list_window"] = _timed(
+        lambda: read_bookings(conn, date_from=today - timedelta(days=60), date_to=today + timedelta(days=120)), repeat
+    )
+    m_from, m_to = visible_range("dayGridMonth", today)
+    month = read_bookings(conn, date_from=m_from, date_to=m_to)
+    out["read_bookings.month"] = _timed(lambda: read_bookings(conn, date_from=m_from, date_to=m_to), repeat)
+    out["calendar.build_events.month"] = _timed(lambda: build_events(month), repeat)
+    listing = read_bookings(conn, date_from=today - timedelta(days=60), date_to=today + timedelta(days=120))
+    out["list_view.format"] = _timed(lambda: list_view(listing), repeat)
+    out["list_page.first"] = _timed(lambda: list_page(conn), repeat)
+    # Página profunda: cursor tomado a mitad de la tabla (costo independiente de la profundidad)
+    mid = conn.execute("SELECT start_ts, id FROM bookings ORDER BY start_ts, id LIMIT 1 OFFSET ?",
+                       (rows // 2,)).fetchone()
+    out["list_page.deep"] = _timed(lambda: list_page(conn, after=mid), repeat)
+    out["list_page.filtered"] = _timed(lambda: list_page(conn, status="Cancelado", sort="room"), repeat)
+    out["list_page.text"] = _timed(lambda: list_page(conn, text="rivera boda"), repeat)
+    out["search.words"] = _timed(lambda: search(conn, "rivera boda"), repeat)
+    out["search.prefix"] = _timed(lambda: search(conn, "reun"), repeat)
+
+    now = datetime.now()
+    win = (to_ts(now + timedelta(hours=23)), to_ts(now + timedelta(hours=26)))
+    out["reminders.window"] = _timed(lambda: read_reminder_window(conn, *win), repeat)
+
+    rng = random.Random(0)
+    rooms = [r[0] for r in conn.execute("SELECT room FROM rooms")]
+    lo, hi = conn.execute("SELECT MIN(start_ts), MAX(end_ts) FROM bookings").fetchone()
+    queries = []
+    for _ in range(1000):
+        s = rng.randrange(lo, hi)
+        start = datetime(1970, 1, 1) + timedelta(seconds=s)
+        queries.append((conn, rng.choice(rooms), start.isoformat(), (start + timedelta(hours=2)).isoformat()))
+    out["has_overlap"] = _per_call(has_overlap, queries)
+    out["has_overlap_sql"] = _per_call(has_overlap_sql, queries[:200])
+
+    # Enlaces: se restaura el estado original fuera de la medición
+    sample = conn.execute(
+        "SELECT id, status, end_dt, confirm_token FROM bookings ORDER BY random() LIMIT 200"
+    ).fetchall()
+    signed = [(tokens.sign(i, "confirm", tokens.link_expiry(e)), "Confirmado") for i, _s, e, _t in sample]
+    legacy = [(t, "Confirmado") for _i, _s, _e, t in sample if t]
+    out["update_status_by_token.signed"] = _per_call(update_status_by_token, signed)
+    if legacy:
+        out["update_status_by_token.legacy"] = _per_call(update_status_by_token, legacy)
+    out["update_status_by_token.forged"] = _per_call(update_status_by_token, [("x" * 27, "Confirmado")] * 200)
+    for i, status, _e, _t in sample:
+        set_booking_status(i, status)
+
+    out["availability.month"] = _timed(lambda: find_free_slots(120, today, today + timedelta(days=30)), repeat)
+    out["analytics.year"] = _timed(lambda: occupancy(today - timedelta(days=365), today), repeat)
+    return out
+
+
+def page_sections(repeat: int) -> dict:
+    """Render headless de la página: rerun base y costo extra de cada sección con su toggle."""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.setdefault("AUTH_ENABLED", "0")
+    at = AppTest.from_file(str(ROOT / PAGE), default_timeout=600)
+    out = {}
+    t0 = time.perf_counter()
+    at.run()
+    out["page.first_run"] = {"min": time.perf_counter() - t0, "median": time.perf_counter() - t0, "n": 1}
+    errors = [str(e.value) for e in at.exception]
+    out["page.base"] = _timed(at.run, repeat)
+    for key in SECTIONS:
+        # Base medida justo antes de cada sección: el ruido entre reruns es del orden de las secciones
+        base = _timed(at.run, repeat)
+        at.toggle(key=key).set_value(True)
+        res = _timed(at.run, repeat)
+        errors += [str(e.value) for e in at.exception]
+        out[f"section.{key.removeprefix('show_')}"] = {
+            "min": max(res["min"] - base["min"], 0.0),
+            "median": max(res["median"] - base["median"], 0.0),
+            "n": repeat,
+        }
+        at.toggle(key=key).set_value(False)
+        at.run()
+    return {"timings": out, "errors": errors}
+
+
+def child(rows: int, repeat: int, apptest: bool) -> dict:
+    res = {"rows": rows, "timings": hot_paths(rows, repeat), "errors": []}
+    if apptest:
+        page = page_sections(repeat)
+        res["timings"].update(page["timings"])
+        res["errors"] = page["errors"]
+    return res
+
+
+# ======================= ORQUESTADOR =======================
+
+def run_size(rows: int, args) -> dict:
+    data_dir = Path(args.workdir) / str(rows)
+    if args.regen or not (data_dir / "bookings.db").exists():
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "bench.gen_db", "--rows", str(rows), "--out", str(data_dir)],
+                       cwd=ROOT, check=True)
+        print(f"  generado en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    cmd = [sys.executable, "-m", "bench.bench_suite", "--child", str(rows), "--repeat", str(args.repeat)]
+    if rows > args.apptest_max:
+        cmd.append("--no-apptest")
+    env = {**os.environ, "DATA_DIR": str(data_dir), "AUTH_ENABLED": "0"}
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, previous: dict, threshold: float) -> list:
+    """[(tamaño, métrica, antes, ahora, ratio)] de lo que empeoró más de `threshold`."""
+    prev = {r["rows"]: r["timings"] for r in previous["runs"]}
+    worse = []
+    for run in current["runs"]:
+        old = prev.get(run["rows"], {})
+        for name, t in run["timings"].items():
+            # Se compara el mínimo (lo menos afectado por ruido); por debajo de 1 ms no se marca
+            if name not in old or old[name]["min"] <= 0:
+                continue
+            ratio = t["min"] / old[name]["min"]
+            if ratio > threshold and t["min"] > 1e-3:
+                worse.append((run["rows"], name, old[name]["min"], t["min"], ratio))
+    return worse
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks de Reservas sobre DBs sintéticos")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--workdir", default=str(WORK_DIR), help="DBs generados (se reutilizan entre corridas)")
+    ap.add_argument("--regen", action="store_true", help="regenerar los DBs aunque existan")
+    ap.add_argument("--apptest-max", type=int, default=100_000, help="no renderizar la página por encima de N filas")
+    ap.add_argument("--out", help="archivo JSON de salida (por defecto bench/results/<fecha>.json)")
+    ap.add_argument("--compare", help="JSON de una corrida anterior")
+    ap.add_argument("--threshold", type=float, default=1.25, help="ratio a partir del cual se marca regresión")
+    ap.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--no-apptest", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child is not None:
+        print(json.dumps(child(args.child, args.repeat, not args.no_apptest)))
+        return 0
+
+    result = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": _git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "runs": [],
+    }
+    for rows in args.sizes:
+        print(f"== {rows} filas", file=sys.stderr)
+        run = run_size(rows, args)
+        result["runs"].append(run)
+        for name, t in run["timings"].items():
+            print(f"  {name:<36} {t['median'] * 1000:>10.2f} ms", file=sys.stderr)
+        for err in run["errors"]:
+            print(f"  ERROR: {err}", file=sys.stderr)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"Resultados: {out}", file=sys.stderr)
+
+    if args.compare:
+        worse = compare(result, json.loads(Path(args.compare).read_text()), args.threshold)
+        for rows, name, before, now, ratio in worse:
+            print(f"REGRESIÓN {rows:>8} {name:<36} {before * 1000:.2f} → {now * 1000:.2f} ms ({ratio:.2f}x)")
+        return 1 if worse else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
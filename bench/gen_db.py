@@ -0,0 +1,126 @@
+# bench/gen_db.py
+# ------------------------------------------------------------
+# Genera un bookings.db sintético con el esquema actual (utils.db)
+# - Reservas repartidas entre las salas de ROOMS, sin choques dentro de cada sala
+# - Mezcla de estados, teléfonos (o vacío), duraciones, personas, sillas y mesas
+# - ~80% del rango en el pasado y ~20% en el futuro respecto a hoy
+# - Un 10% con token UUID heredado (ruta legacy de Confirmar/Cancelar)
+# Uso: python -m bench.gen_db --rows 100000 --out /tmp/eventos-bench/100000
+#      (crea <out>/bookings.db; la app/bench lo usan con DATA_DIR=<out>)
+# ------------------------------------------------------------
+import argparse
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from utils import occupancy, reminders
+from utils.db import EPOCH, ROOM_CAPACITY_DEFAULTS, ROOMS, connect, ensure_schema, to_ts
+
+STATUSES = np.array(["Pendiente", "Confirmado", "Cancelado"], dtype=object)
+STATUS_P = [0.40, 0.45, 0.15]
+DURATIONS_H = np.array([1, 2, 3, 4, 6, 8])
+GAPS_H = np.array([0, 1, 2, 4, 12, 24, 48])
+TITLES = np.array(["Boda", "Reunión", "Cumpleaños", "Graduación", "Conferencia", "Taller"], dtype=object)
+ORGS = np.array(["Rivera", "Pérez", "Santiago", "Colón", "Ortiz", ""], dtype=object)
+# Tipos de sillas/mesas de los selectores del formulario (la edición los exige)
+CHAIRS = np.array(["Plegable", "Tiffany", "Banquetera", ""], dtype=object)
+TABLES = np.array(['Redonda 60"', "Rectangular 8ft", "Cocktail", ""], dtype=object)
+CHUNK = 50_000
+
+
+def _iso(ts: np.ndarray) -> np.ndarray:
+    # Inverso vectorizado de to_ts: "YYYY-MM-DDTHH:MM:SS" como guarda el formulario
+    return np.datetime_as_string(np.datetime64(EPOCH, "s") + ts.astype("timedelta64[s]"), unit="s").astype(object)
+
+
+def synthetic_rows(n: int, seed: int = 0, now: datetime | None = None) -> list[np.ndarray]:
+    """Columnas (en el orden de INSERT_COLS) para n reservas."""
+    rng = np.random.default_rng(seed)
+    rooms = np.asarray(ROOMS, dtype=object)
+    room = rooms[np.arange(n) % len(rooms)]
+    dur = rng.choice(DURATIONS_H, n) * 3600
+    gap = rng.choice(GAPS_H, n) * 3600
+    # Por sala: inicios consecutivos (fin anterior + hueco), anclados para que ~20% quede en el futuro
+    start = np.zeros(n, dtype=np.int64)
+    for i in range(len(rooms)):
+        sel = np.arange(i, n, len(rooms))
+        step = dur[sel] + gap[sel]
+        offs = np.concatenate([[0], np.cumsum(step)[:-1]])
+        anchor = (to_ts(now or datetime.now()) - int(offs[-1] * 0.8)) // 3600 * 3600 if len(sel) else 0
+        start[sel] = anchor + offs
+    end = start + dur
+    cap = np.array([ROOM_CAPACITY_DEFAULTS.get(r, 50) for r in room])
+    attendees = (rng.random(n) * np.minimum(cap, 300)).astype(np.int64)
+    phone_ok = rng.random(n) < 0.6
+    phones = np.where(phone_ok, np.char.add("+1787", rng.integers(1_000_000, 9_999_999, n).astype(str)), "")
+    legacy = rng.random(n) < 0.10
+    tokens = np.full(n, None, dtype=object)
+    tokens[legacy] = [str(uuid.UUID(bytes=rng.bytes(16), version=4)) for _ in range(legacy.sum())]
+    return [
+        room,
+        rng.choice(TITLES, n),
+        rng.choice(ORGS, n),
+        _iso(start),
+        _iso(end),
+        start,
+        end,
+        rng.choice(np.array(["#3b82f6", "#16a34a", "#f59e0b"], dtype=object), n),
+        attendees,
+        phones.astype(object),
+        rng.choice(STATUSES, n, p=STATUS_P),
+        tokens,
+        rng.choice(np.array(["", "Decoración incluida", "Traer proyector"], dtype=object), n),
+        rng.choice(CHAIRS, n),
+        (attendees * rng.uniform(0.8, 1.2, n)).astype(np.int64),
+        rng.choice(TABLES, n),
+        attendees // 8,
+    ]
+
+
+INSERT_COLS = (
+    "room", "title", "organizador", "start_dt", "end_dt", "start_ts", "end_ts", "color", "attendees",
+    "phone", "status", "confirm_token", "notes", "chair_type", "chair_qty", "table_type", "table_qty",
+)
+
+
+def generate(out_dir, rows: int, seed: int = 0) -> Path:
+    """Crea <out_dir>/bookings.db desde cero con `rows` reservas."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "bookings.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    conn = connect(path)
+    conn.isolation_level = None
+    conn.execute("PRAGMA journal_mode = WAL")
+    ensure_schema(conn)
+    cols = synthetic_rows(rows, seed)
+    sql = f"INSERT INTO bookings({', '.join(INSERT_COLS)}) VALUES ({', '.join('?' * len(INSERT_COLS))})"
+    conn.execute("BEGIN IMMEDIATE")
+    for a in range(0, rows, CHUNK):
+        conn.executemany(sql, zip(*(c[a:a + CHUNK].tolist() for c in cols)))
+    # Tablas derivadas como las deja la importación masiva
+    reminders.schedule_new(conn, 1)
+    occupancy.apply_new(conn, 1)
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA optimize")
+    conn.close()
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Genera un bookings.db sintético")
+    ap.add_argument("--rows", type=int, required=True)
+    ap.add_argument("--out", required=True, help="carpeta destino (se usa como DATA_DIR)")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    path = generate(args.out, args.rows, args.seed)
+    print(f"{path}: {args.rows} reservas en {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
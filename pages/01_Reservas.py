@@ -11,22 +11,75 @@
 # - Migración automática de columnas si tu DB es antigua
 # - Links de Confirmar/Cancelar por query param
 # - Editor de reservas + reset seguro del formulario
+# - Lista paginada (keyset) con filtros/orden en SQL; acciones por ID directo a la DB
+# - Búsqueda de texto completo (FTS5) en todo el historial, sin acentos y por prefijo
+# - Reservas viejas en un archivo frío (utils/archive.py): se leen igual, sólo lectura
+# - Importación masiva (CSV/Parquet) con informe de rechazos
+# - Búsqueda de huecos libres en todas las salas
+# - Series recurrentes (diaria/semanal/mensual) con edición por ocurrencia
+# - Ocupación por sala (hora de la semana, día, mes) y demanda de sillas/mesas
+# - Perfil opcional por rerun (PROFILE_RERUNS=1): secciones + SQL en el sidebar y JSONL
 # Requisitos: pip install streamlit streamlit-calendar pandas requests
 # ------------------------------------------------------------
 
 import os
 import re
-import sqlite3
-import requests
 from uuid import uuid4
 from datetime import datetime, time, timedelta
 from urllib.parse import urlencode, quote_plus
 from pathlib import Path
 
+import altair as alt
 import pandas as pd
 import streamlit as st
 
-from pathlib import Path
+from utils.bookings import (
+    delete_booking,
+    get_booking,
+    get_room_catalog,
+    list_page,
+    read_bookings,
+    read_reminder_window,
+    reserve,
+    save_rooms,
+    set_booking_status,
+    update_status_by_token,
+)
+from utils.analytics import OPEN_HOURS, occupancy
+from utils.availability import find_free_slots
+from utils.bulk_import import IMPORT_FIELDS, REQUIRED as IMPORT_REQUIRED, import_bookings
+from utils.db import data_version, get_conn, to_ts, transaction
+from utils.outbox import counts as outbox_counts, enqueue_reminder
+from utils.profiling import (
+    finish_run,
+    recent as profile_recent,
+    section as profile_section,
+    slow_statements,
+    start_run,
+    timed,
+)
+from utils.reminders import reminder_text
+from utils.search import SEARCH_LIMIT, search
+from utils.series import (
+    FREQS,
+    MAX_OCCURRENCES,
+    WEEKDAYS,
+    SERIES_FIELDS,
+    Recurrence,
+    create_series,
+    delete_series,
+    describe,
+    describe_rows,
+    detach_occurrence,
+    get_series,
+    list_series,
+    read_occurrences,
+    skip_occurrence,
+    update_series,
+)
+from utils.tokens import link_expiry, sign as sign_token
+from utils.whatsapp import is_configured, is_valid_e164
+from utils.calendar_events import SegmentCache, build_events, shift_anchor, visible_range
 #st.set_page_config(page_title="Calendario de Eventos", layout="wide", page_icon=PAGE_ICON)
 
 ROOT = Path(__file__).resolve().parents[1] if Path(__file__).parent.name in ("pages","utils") else Path(__file__).resolve().parent
@@ -56,8 +109,12 @@ PAGE_ICON = str(LOGO_PATH) if LOGO_PATH.exists() else "📅"
 
 # ======================= AUTH (fallback si falta utils.auth) =======================
 try:
-    from utils.auth import gate  # type: ignore
+    from utils.auth import gate, is_admin  # type: ignore
 except Exception:
+    # Sin utils.auth no hay roles: quien pasa la contraseña administra (como antes)
+    def is_admin():
+        return True
+
     # Fallback ultra-simple: si defines APP_AUTH_PASSWORD, pide password en sidebar.
     def gate():
         pwd = os.getenv("APP_AUTH_PASSWORD", "").strip()
@@ -86,22 +143,8 @@ except ModuleNotFoundError:
 
 # ======================= CONFIG BASE =======================
 APP_BASE_URL = os.getenv("APP_BASE_URL", "https://eventosapp-ugso.onrender.com:8501")
-ROOMS = [
-    "Glass Room 1",
-    "Glass Room 2",
-    "Glass Room 3",
-    "Glass Room 4",
-    "Winners",
-    "Ballito Area"
-]
-ROOM_CAPACITY_DEFAULTS = {
-    "Glass Room 1": 30,
-    "Glass Room 2": 30,
-    "Glass Room 3": 30,
-    "Glass Room 4": 60,
-    "Winners": 500,
-    "Ballito Area": 1000,
-}
+# Endpoint ligero (python -m utils.confirm_server); sin él los enlaces los atiende esta página
+CONFIRM_BASE_URL = os.getenv("CONFIRM_BASE_URL", "").rstrip("/") or APP_BASE_URL
 
 # Tipos sugeridos (puedes editar)
 CHAIR_TYPES = ["(Ninguna)", "Tiffany", "Plegable", "Banquetera", "Auditorio", "Otro"]
@@ -122,10 +165,6 @@ def fmt_iso(dt: datetime) -> str:
     return dt.strftime("%Y-%m-%d %H:%M:%S")
 
 
-def is_valid_e164(phone: str) -> bool:
-    return bool(re.fullmatch(r"\+\d{8,15}", (phone or "").strip()))
-
-
 def to_wa_me_number(phone_e164: str) -> str:
     return re.sub(r"\D", "", phone_e164 or "")
 
@@ -147,14 +186,16 @@ def clear_params():
             pass
 
 
-def build_confirm_cancel_urls(token: str) -> tuple[str, str]:
-    confirm_url = f"{APP_BASE_URL}/?{urlencode({'confirm': token})}"
-    cancel_url = f"{APP_BASE_URL}/?{urlencode({'cancel': token})}"
+def build_confirm_cancel_urls(booking_id: int, end_dt) -> tuple[str, str]:
+    # Tokens firmados: vencen al terminar el evento (+ LINK_GRACE_H)
+    exp = link_expiry(end_dt)
+    confirm_url = f"{CONFIRM_BASE_URL}/?{urlencode({'confirm': sign_token(booking_id, 'confirm', exp)})}"
+    cancel_url = f"{CONFIRM_BASE_URL}/?{urlencode({'cancel': sign_token(booking_id, 'cancel', exp)})}"
     return confirm_url, cancel_url
 
 
-def build_whatsapp_cta(phone_e164, room, title, start_dt, end_dt, attendees, token):
-    confirm_url, cancel_url = build_confirm_cancel_urls(token)
+def build_whatsapp_cta(phone_e164, room, title, start_dt, end_dt, attendees, booking_id):
+    confirm_url, cancel_url = build_confirm_cancel_urls(booking_id, end_dt)
     msg = (
         "🏇Hola, quiero confirmar la reserva:\n"
         f"• Sala: {room}\n"
@@ -164,35 +205,18 @@ def build_whatsapp_cta(phone_e164, room, title, start_dt, end_dt, attendees, tok
         f"• Personas: {attendees}\n"
         f"• Confirmar: {confirm_url}\n"
         f"• Cancelar: {cancel_url}\n"
-        f"• Código: {token}"
+        f"• Código: #{booking_id}"
     )
     num_for_wa = to_wa_me_number(phone_e164)
     return f"https://wa.me/{num_for_wa}?{urlencode({'text': msg}, quote_via=quote_plus)}"
 
 
-def send_whatsapp_cloud_reply(to_phone_e164, text_message):
-    phone_id = os.environ.get("WHATSAPP_PHONE_NUMBER_ID")
-    token = os.environ.get("WHATSAPP_TOKEN")
-    if not phone_id or not token:
-        raise RuntimeError("Faltan variables WHATSAPP_PHONE_NUMBER_ID / WHATSAPP_TOKEN.")
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    data = {
-        "messaging_product": "whatsapp",
-        "to": to_phone_e164.replace(" ", ""),
-        "type": "text",
-        "text": {"body": text_message[:4096]},
-    }
-    url = f"https://graph.facebook.com/v20.0/{phone_id}/messages"
-    r = requests.post(url, headers=headers, json=data, timeout=20)
-    if r.status_code >= 300:
-        raise RuntimeError(f"Cloud API error {r.status_code}: {r.text}")
-
-
 # ======= Helpers para reset seguro del formulario =======
 
 def _new_defaults():
     return {
-        "new_room": ROOMS[0],
+        "new_room": (get_room_catalog().names() or [""])[0],
+        "new_idem_key": str(uuid4()),   # se conserva entre reruns: doble clic = misma reserva
         "new_title": "",
         "new_org": "",
         "new_start_date": datetime.now().date(),
@@ -207,6 +231,7 @@ def _new_defaults():
         "new_chair_qty": 0,
         "new_table_type": TABLE_TYPES[0],
         "new_table_qty": 0,
+        "new_repeat": "No",
     }
 
 
@@ -220,342 +245,173 @@ def bootstrap_new_form_state():
         # Inicialización
 
 
-def request_new_form_reset_and_rerun():
-    st.session_state["_reset_form"] = True
-    st.rerun()
+def show_reserve_error(res, room, attendees):
+    if res.reason == "capacity":
+        st.error(f"Capacidad excedida: {attendees} > {res.capacity} para {room}.")
+    elif res.reason == "invalid_range":
+        st.error("La hora/fecha de cierre debe ser posterior al inicio.")
+    elif res.reason == "not_found":
+        st.warning("ID no encontrado.")
+    elif res.reason == "conflict":
+        lines = "\n".join(
+            f"- #{c['id']} {c['title']}"
+            + (f" ({c['organizador']})" if c["organizador"] else "")
+            + f": {fmt_dt(datetime.fromisoformat(c['start_dt']))} → {fmt_dt(datetime.fromisoformat(c['end_dt']))}"
+            + f" · {c['status']}"
+            for c in res.conflicts
+        )
+        st.error(f"⚠️ Conflicto: ya existe una reservación en **{room}** dentro de ese rango:\n{lines}")
 
 
-# ======================= DB + MIGRACIÓN =======================
-@st.cache_resource
-def get_conn():
-    
-    APP_DIR = Path(__file__).resolve().parent   # carpeta donde está Home.py
-    #DATA_DIR = APP_DIR / "data"
-    DATA_DIR = Path(os.getenv("DATA_DIR", APP_DIR / "data"))  # usa disco en Render, carpeta local en dev
-    #DATA_DIR.mkdir(exist_ok=True)
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    # Ahora sí guarda la DB dentro de la carpeta /data
-    db_path = DATA_DIR / "bookings.db"
-
-    conn = sqlite3.connect(str(db_path), check_same_thread=False)
-    # Tabla principal (mínimo)
-    conn.execute(
-        """
-    CREATE TABLE IF NOT EXISTS bookings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        room TEXT NOT NULL,
-        title TEXT NOT NULL,
-        organizador TEXT NOT NULL,
-        start_dt TEXT NOT NULL,
-        end_dt TEXT NOT NULL,
-        notes TEXT,
-        chair_type TEXT,
-        chair_qty INTEGER,
-        table_type TEXT,
-        table_qty INTEGER
-    )
-    """
-    )
-    # Tabla rooms (capacidad por sala)
-    conn.execute(
-        """
-    CREATE TABLE IF NOT EXISTS rooms (
-        room TEXT PRIMARY KEY,
-        type TEXT,
-        capacity INTEGER
+# ======= Repetición (series) =======
+REPEAT_OPTIONS = {"No": None, **{label: freq for freq, label in FREQS.items()}}
+
+
+def repeat_inputs():
+    r1, r2, r3 = st.columns([1, 1, 2])
+    freq = REPEAT_OPTIONS[r1.selectbox("Repetir", list(REPEAT_OPTIONS), key="new_repeat")]
+    if freq is None:
+        return
+    r2.number_input("Cada", min_value=1, step=1, value=1, key="new_rep_every")
+    if freq == "weekly":
+        r3.multiselect("Días", list(range(7)), format_func=lambda d: WEEKDAYS[d], key="new_rep_days")
+    e1, e2 = st.columns(2)
+    end_mode = e1.radio("Termina", ["En fecha", "Tras N veces"], horizontal=True, key="new_rep_end")
+    if end_mode == "En fecha":
+        e2.date_input("Fecha final", value=datetime.now().date() + timedelta(days=90), key="new_rep_until")
+    else:
+        e2.number_input("Repeticiones", min_value=1, max_value=MAX_OCCURRENCES, step=1, value=10, key="new_rep_count")
+
+
+def recurrence_from_form() -> Recurrence:
+    by_date = st.session_state.get("new_rep_end", "En fecha") == "En fecha"
+    return Recurrence(
+        freq=REPEAT_OPTIONS[st.session_state["new_repeat"]],
+        every=int(st.session_state.get("new_rep_every", 1)),
+        byweekday=tuple(st.session_state.get("new_rep_days", ())),
+        until=st.session_state.get("new_rep_until") if by_date else None,
+        count=None if by_date else int(st.session_state.get("new_rep_count", 10)),
     )
-    """
+
+
+def save_series_from_form(start_iso, end_iso):
+    rec = recurrence_from_form()
+    res = create_series(
+        {
+            "room": st.session_state["new_room"],
+            "title": st.session_state["new_title"],
+            "organizador": st.session_state["new_org"],
+            "start_dt": start_iso,
+            "end_dt": end_iso,
+            "color": st.session_state["new_color"],
+            "attendees": st.session_state["new_attendees"],
+            "phone": st.session_state["new_phone"],
+            "status": "Pendiente",
+            "notes": st.session_state["new_notes"],
+            "chair_type": st.session_state["new_chair_type"],
+            "chair_qty": int(st.session_state["new_chair_qty"]),
+            "table_type": st.session_state["new_table_type"],
+            "table_qty": int(st.session_state["new_table_qty"]),
+        },
+        rec,
     )
-    migrate_schema(conn)
-    ensure_rooms_seed(conn)
-    return conn
-
-
-def migrate_schema(conn: sqlite3.Connection):
-    cur = conn.execute("PRAGMA table_info(bookings)")
-    cols = {row[1] for row in cur.fetchall()}
-
-    # base + extras
-    if "notes" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN notes TEXT")
-    if "color" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN color TEXT")
-    if "organizador" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN organizador TEXT")
-    if "attendees" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN attendees INTEGER DEFAULT 0")
-        conn.execute("UPDATE bookings SET attendees = 0 WHERE attendees IS NULL")
-    if "phone" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN phone TEXT")
-    if "status" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN status TEXT DEFAULT 'Pendiente'")
-        conn.execute("UPDATE bookings SET status = 'Pendiente' WHERE status IS NULL OR status = ''")
-    if "confirm_token" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN confirm_token TEXT")
-    # Recordatorios 24h
-    if "reminder_24h_sent" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN reminder_24h_sent INTEGER DEFAULT 0")
-    if "reminder_24h_sent_at" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN reminder_24h_sent_at TEXT")
-    # Sillas/Mesas
-    if "chair_type" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN chair_type TEXT")
-    if "chair_qty" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN chair_qty INTEGER DEFAULT 0")
-    if "table_type" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN table_type TEXT")
-    if "table_qty" not in cols:
-        conn.execute("ALTER TABLE bookings ADD COLUMN table_qty INTEGER DEFAULT 0")
-
-    conn.commit()
-
-
-def ensure_rooms_seed(conn: sqlite3.Connection):
-    # Defaults por prefijo si no hay override exacto
-    default_by_prefix = {
-        "Glass Room": ("Sala Acristalada", 12),
-        "Winners": ("Salón Conferencias", 60),
-        "Ballito": ("Área Abierta", 100),
-    }
+    show_series_result(res, st.session_state["new_room"], st.session_state["new_attendees"])
+    if res.ok:
+        st.success(f"Serie #{res.series_id} creada: {describe(rec)} ({res.occurrences} ocurrencias).")
+        request_new_form_reset_and_rerun()
 
-    for r in ROOMS:
-        cur = conn.execute("SELECT room, type, capacity FROM rooms WHERE room = ?", (r,))
-        row = cur.fetchone()
 
-        if not row:
-            # 1) Override exacto por nombre
-            if r in ROOM_CAPACITY_DEFAULTS:
-                tipo = None
-                cap = ROOM_CAPACITY_DEFAULTS[r]
-            else:
-                # 2) Fallback por prefijo
-                tipo, cap = None, 30
-                for pref, (t, c) in default_by_prefix.items():
-                    if r.startswith(pref):
-                        tipo, cap = t, c
-                        break
-            conn.execute("INSERT INTO rooms(room, type, capacity) VALUES(?,?,?)", (r, tipo, cap))
-        else:
-            # Si ya existe y capacity es NULL, completa
-            _, tipo, cap_actual = row
-            if cap_actual is None:
-                if r in ROOM_CAPACITY_DEFAULTS:
-                    cap = ROOM_CAPACITY_DEFAULTS[r]
-                else:
-                    cap = 30
-                    for pref, (_t, _c) in default_by_prefix.items():
-                        if r.startswith(pref):
-                            cap = _c
-                            break
-                conn.execute("UPDATE rooms SET capacity=? WHERE room=?", (cap, r))
-    conn.commit()
+def series_end(start: datetime, end_time, duration_s: int) -> datetime:
+    """Fin con la hora elegida conservando los días enteros que abarcaba la serie;
+    si así no queda después del inicio, termina al día siguiente (cruza medianoche)."""
+    days = timedelta(days=max(duration_s - 1, 0) // 86400)
+    end = datetime.combine(start.date(), end_time) + days
+    return end + timedelta(days=1) if end <= start + days else end
 
 
-def get_room_capacity(conn, room: str) -> int | None:
-    cur = conn.execute("SELECT capacity FROM rooms WHERE room = ?", (room,))
-    row = cur.fetchone()
-    return int(row[0]) if row and row[0] is not None else None
+def show_series_result(res, room, attendees):
+    if res.reason == "invalid":
+        st.error(res.message)
+    elif res.reason == "capacity":
+        st.error(f"Capacidad excedida: {attendees} > {res.capacity} para {room}.")
+    elif res.reason == "not_found":
+        st.warning("Serie no encontrada.")
+    elif res.reason == "conflict":
+        lines = "\n".join(f"- {fmt_dt(t)} choca con #{ref}" for t, ref in res.conflicts[:20])
+        more = f"\n- … y {len(res.conflicts) - 20} más" if len(res.conflicts) > 20 else ""
+        st.error(f"⚠️ {len(res.conflicts)} ocurrencias chocan en **{room}**:\n{lines}{more}")
 
 
-def read_rooms(conn) -> pd.DataFrame:
-    return pd.read_sql_query("SELECT room, type, capacity FROM rooms ORDER BY room", conn)
+def request_new_form_reset_and_rerun():
+    st.session_state["_reset_form"] = True
+    st.rerun()
 
 
-def save_rooms(conn, df_rooms: pd.DataFrame):
-    for _, row in df_rooms.iterrows():
-        conn.execute(
-            "UPDATE rooms SET type=?, capacity=? WHERE room=?",
-            (row["type"], int(row["capacity"]) if pd.notna(row["capacity"]) else None, row["room"]),
-        )
-    conn.commit()
+# ======================= VERSIÓN DE DATOS + CACHÉ =======================
+LIST_SORT_LABELS = {"start": "Inicio", "room": "Sala", "status": "Estado", "id": "ID"}
 
 
-def read_bookings(conn, room_filter=None, date_from=None, date_to=None):
-    q = (
-        "SELECT id, room, title, organizador, start_dt, end_dt, color, "
-        "attendees, phone, status, confirm_token, reminder_24h_sent, reminder_24h_sent_at, "
-        "notes, chair_type, chair_qty, table_type, table_qty "
-        "FROM bookings"
-    )
-    conds, params = [], []
-    if room_filter:
-        conds.append("room = ?"); params.append(room_filter)
-    if date_from:
-        conds.append("datetime(end_dt) >= datetime(?)"); params.append(fmt_iso(datetime.combine(date_from, time())))
-    if date_to:
-        conds.append("datetime(start_dt) <= datetime(?)"); params.append(fmt_iso(datetime.combine(date_to, time(23, 59, 59))))
-    if conds:
-        q += " WHERE " + " AND ".join(conds)
-    q += " ORDER BY start_dt"
-    df = pd.read_sql_query(q, conn, params=params)
-    return df
-
-
-def has_overlap(conn, room, start_dt_iso, end_dt_iso, ignore_id=None):
-    q = (
-        """
-    SELECT COUNT(*) FROM bookings
-    WHERE room = ?
-      AND datetime(?) < datetime(end_dt)
-      AND datetime(?) > datetime(start_dt)
-    """
-    )
-    params = [room, start_dt_iso, end_dt_iso]
-    if ignore_id is not None:
-        q += " AND id != ?"
-        params.append(ignore_id)
-    cur = conn.execute(q, params)
-    return cur.fetchone()[0] > 0
-
-
-def insert_booking(
-    conn,
-    room,
-    title,
-    organizador,
-    start_dt_iso,
-    end_dt_iso,
-    color,
-    attendees,
-    phone,
-    token,
-    notes,
-    chair_type,
-    chair_qty,
-    table_type,
-    table_qty,
-):
-    conn.execute(
-        "INSERT INTO bookings("
-        " room, title, organizador, start_dt, end_dt, color, attendees, phone, status, confirm_token,"
-        " notes, chair_type, chair_qty, table_type, table_qty"
-        ") VALUES (?,?,?,?,?,?,?,?,?, ?,?,?,?,?,?)",
-        (
-            room,
-            title,
-            organizador,
-            start_dt_iso,
-            end_dt_iso,
-            color,
-            attendees,
-            phone,
-            "Pendiente",
-            token,
-            notes,
-            chair_type,
-            chair_qty,
-            table_type,
-            table_qty,
-        ),
-    )
-    conn.commit()
-
-
-def update_booking(
-    conn,
-    booking_id,
-    room,
-    title,
-    organizador,
-    start_dt_iso,
-    end_dt_iso,
-    color,
-    attendees,
-    phone,
-    status,
-    notes,
-    chair_type,
-    chair_qty,
-    table_type,
-    table_qty,
-):
-    conn.execute(
-        """
-        UPDATE bookings
-           SET room=?, title=?, organizador=?, start_dt=?, end_dt=?,
-               color=?, attendees=?, phone=?, status=?,
-               notes=?, chair_type=?, chair_qty=?, table_type=?, table_qty=?
-         WHERE id=?
-    """,
-        (
-            room,
-            title,
-            organizador,
-            start_dt_iso,
-            end_dt_iso,
-            color,
-            attendees,
-            phone,
-            status,
-            notes,
-            chair_type,
-            chair_qty,
-            table_type,
-            table_qty,
-            booking_id,
-        ),
+@st.cache_data(max_entries=64, show_spinner=False)
+def _cached_list_page(version, filters, after):
+    room, status, d_from, d_to, text, sort, desc = filters
+    return list_page(
+        get_conn(), sort, desc, after, room=room, status=status, date_from=d_from, date_to=d_to, text=text
     )
-    conn.commit()
 
 
-def delete_booking(conn, booking_id):
-    conn.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
-    conn.commit()
+def cached_list_page(filters, after):
+    # Una página (LIST_PAGE_SIZE filas) ya formateada por versión de datos + filtros + cursor
+    return _cached_list_page(data_version(), filters, after)
 
 
-def update_status_by_token(conn, token, to_status):
-    cur = conn.execute("SELECT id, status FROM bookings WHERE confirm_token = ?", (token,))
-    row = cur.fetchone()
-    if not row:
-        return False, None
-    current = row[1]
-    if current == to_status:
-        return True, "already"
-    conn.execute("UPDATE bookings SET status = ? WHERE id = ?", (to_status, row[0]))
-    conn.commit()
-    return True, "updated"
+def writable_booking(booking_id):
+    """Reserva para editar/cambiar estado/borrar; avisa si no existe o está en el archivo frío."""
+    row = get_booking(get_conn(), booking_id) if booking_id else None
+    if row is None:
+        st.warning("ID no encontrado.")
+    elif row["archived"]:
+        st.warning(f"La reservación #{int(booking_id)} está archivada (sólo lectura).")
+    else:
+        return row
+    return None
 
 
-def status_color(row):
-    stt = (row.get("status") or "").strip()
-    if stt == "Confirmado":
-        return "#16a34a"
-    if stt == "Cancelado":
-        return "#6b7280"
-    return row.get("color") or "#f59e0b"
+def room_index(names, room) -> int:
+    # Una sala borrada del catálogo no rompe el selectbox
+    return names.index(room) if room in names else 0
 
 
 # ======================= PROCESAR QUERY PARAMS =======================
-conn = get_conn()
-params = get_params()
-changed = False
-if "confirm" in params:
-    token = params.get("confirm")
-    if isinstance(token, list):
-        token = token[0]
-    ok, state = update_status_by_token(conn, token, "Confirmado")
-    if ok and state == "updated":
-        st.success("✅ Reserva confirmada.")
-        changed = True
-    elif ok and state == "already":
-        st.info("Esta reserva ya estaba confirmada.")
-    else:
-        st.warning("Token de confirmación inválido.")
-elif "cancel" in params:
-    token = params.get("cancel")
-    if isinstance(token, list):
-        token = token[0]
-    ok, state = update_status_by_token(conn, token, "Cancelado")
-    if ok and state == "updated":
-        st.warning("❌ Reserva cancelada.")
-        changed = True
-    elif ok and state == "already":
-        st.info("Esta reserva ya estaba cancelada.")
-    else:
-        st.warning("Token de cancelación inválido.")
-if changed:
-    clear_params()
+start_run("Reservas")
+with profile_section("query_params"):
+    params = get_params()
+    changed = False
+    if "confirm" in params:
+        token = params.get("confirm")
+        if isinstance(token, list):
+            token = token[0]
+        ok, state = update_status_by_token(token, "Confirmado")
+        if ok and state == "updated":
+            st.success("✅ Reserva confirmada.")
+            changed = True
+        elif ok and state == "already":
+            st.info("Esta reserva ya estaba confirmada.")
+        else:
+            st.warning("Token de confirmación inválido.")
+    elif "cancel" in params:
+        token = params.get("cancel")
+        if isinstance(token, list):
+            token = token[0]
+        ok, state = update_status_by_token(token, "Cancelado")
+        if ok and state == "updated":
+            st.warning("❌ Reserva cancelada.")
+            changed = True
+        elif ok and state == "already":
+            st.info("Esta reserva ya estaba cancelada.")
+        else:
+            st.warning("Token de cancelación inválido.")
+    if changed:
+        clear_params()
 
 # ======================= HEADER CON LOGO =======================
 hc1, hc2 = st.columns([1, 6])
@@ -572,416 +428,788 @@ if LOGO.exists():
     st.sidebar.image(str(LOGO), width=170)
     st.markdown("---")
 st.sidebar.header("Filtros")
-room_filter = st.sidebar.selectbox("Salones", ["(Todas)"] + ROOMS)
+room_filter = st.sidebar.selectbox("Salones", ["(Todas)"] + get_room_catalog().names())
 room_filter = None if room_filter == "(Todas)" else room_filter
 
 # ======================= ADMIN: SALAS Y CAPACIDADES =======================
-with st.expander("🛠️ Salones y capacidades (editar)"):
-    df_rooms = read_rooms(conn)
+@st.fragment
+@timed("rooms_admin")
+def rooms_admin_section():
+    # Sólo admin; y sólo se pinta mientras el panel está abierto
+    if not is_admin() or not st.toggle("🛠️ Salones y capacidades (editar)", key="show_rooms_admin"):
+        return
+    df_rooms = get_room_catalog().frame()
+    st.caption(
+        "Añade una fila para crear una sala nueva; las salas con reservas no se pueden borrar. "
+        "El nombre de una sala existente no se edita aquí (sus reservas quedarían en la sala vieja)."
+    )
     edited = st.data_editor(
         df_rooms,
-        num_rows="fixed",
+        key="rooms_editor",
+        num_rows="dynamic",
         use_container_width=True,
         column_config={
-            "room": st.column_config.TextColumn("Sala", disabled=True),
+            "room": st.column_config.TextColumn("Sala", required=True),
             "type": st.column_config.TextColumn("Tipo de sala"),
             "capacity": st.column_config.NumberColumn("Capacidad", min_value=0, step=1),
         },
     )
     if st.button("Guardar cambios de salas", use_container_width=True):
-        save_rooms(conn, edited)
-        st.success("Salas actualizadas.")
+        # data_editor no bloquea celdas por fila: un nombre cambiado en una fila existente
+        # sería borrar + crear sala, así que se rechaza antes de guardar
+        changes = st.session_state.get("rooms_editor", {}).get("edited_rows", {})
+        renamed = [df_rooms.iloc[int(i)]["room"] for i, cols in changes.items() if "room" in cols]
+        if renamed:
+            st.error("No se puede cambiar el nombre de salas existentes: " + ", ".join(renamed))
+            return
+        res = save_rooms(edited)
+        if res["kept"]:
+            st.warning("No se borraron (tienen reservas): " + ", ".join(res["kept"]))
+        if res["updated"] or res["added"] or res["deleted"]:
+            st.success(
+                f"Salas actualizadas: {res['updated']} modificadas, {res['added']} nuevas, {res['deleted']} borradas."
+            )
+        else:
+            st.info("Sin cambios.")
+
+
+rooms_admin_section()
+
+# ======================= IMPORTACIÓN MASIVA =======================
+def show_import_report(rep):
+    ok_rows = rep.total - len(rep.rejected)
+    if rep.dry_run:
+        st.info(f"Validación: {ok_rows} de {rep.total} filas se importarían.")
+    else:
+        st.success(f"Importadas {rep.inserted} de {rep.total} filas.")
+    if len(rep.rejected):
+        st.warning(f"{len(rep.rejected)} filas rechazadas.")
+        st.dataframe(rep.rejected.head(500), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Descargar informe de rechazos (CSV)",
+            rep.rejected.to_csv(index=False).encode("utf-8"),
+            file_name="rechazos_importacion.csv",
+            mime="text/csv",
+        )
+
+
+@st.fragment
+@timed("import")
+def import_section():
+    if not is_admin() or not st.toggle("📥 Importar reservas (CSV/Parquet)", key="show_import"):
+        return
+    st.caption(
+        "Columnas obligatorias: room, title, organizador, start_dt, end_dt. "
+        "Opcionales: " + ", ".join(c for c in IMPORT_FIELDS if c not in IMPORT_REQUIRED) + "."
+    )
+    up = st.file_uploader("Archivo", type=["csv", "parquet"], key="import_file")
+    dry_run = st.checkbox("Sólo validar (no guardar)", key="import_dry_run")
+    if up is not None and st.button("Importar", type="primary", use_container_width=True):
+        try:
+            rep = import_bookings(up, name=up.name, dry_run=dry_run)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        if not rep.dry_run and rep.inserted:
+            # Calendario, lista y ocupación cambian: rerun de toda la app; el informe se
+            # guarda para volver a pintarlo después
+            st.session_state["import_report"] = rep
+            st.rerun()
+        show_import_report(rep)
+    elif "import_report" in st.session_state:
+        show_import_report(st.session_state.pop("import_report"))
+
+
+import_section()
+
+# ======================= DISPONIBILIDAD =======================
+@st.fragment
+@timed("availability")
+def availability_section():
+    if not st.toggle("🔎 Buscar disponibilidad", key="show_availability"):
+        return
+    today = datetime.now().date()
+    a1, a2, a3, a4 = st.columns(4)
+    dur_h = a1.number_input("Duración (horas)", min_value=0.25, max_value=72.0, value=2.0, step=0.25, key="av_hours")
+    av_from = a2.date_input("Desde", value=today, key="av_from")
+    av_to = a3.date_input("Hasta", value=today + timedelta(days=30), key="av_to")
+    min_cap = a4.number_input("Capacidad mínima", min_value=0, step=1, value=0, key="av_cap")
+    b1, b2, b3 = st.columns([1, 1, 2])
+    day_start = b1.time_input("Abre", value=time(8, 0), key="av_day_start")
+    day_end = b2.time_input("Cierra", value=time(22, 0), key="av_day_end")
+    preferred = b3.multiselect("Salas preferidas", get_room_catalog().names(), key="av_preferred")
+    limit_hours = st.checkbox("Limitar al horario", value=True, key="av_use_hours")
+    if av_to < av_from:
+        st.warning("La fecha final debe ser igual o posterior a la inicial.")
+        return
+    if limit_hours and day_end <= day_start:
+        st.warning("La hora de cierre debe ser posterior a la de apertura.")
+        return
+    slots = find_free_slots(
+        int(dur_h * 60),
+        av_from,
+        av_to,
+        min_capacity=int(min_cap),
+        day_start=day_start if limit_hours else None,
+        day_end=day_end if limit_hours else None,
+        preferred_rooms=preferred,
+    )
+    if not slots:
+        st.info("No hay huecos con esos criterios.")
+        return
+    st.caption(f"{len(slots)} huecos en {len({s.room for s in slots})} salas.")
+    st.dataframe(
+        pd.DataFrame(
+            {
+                "Sala": [s.room for s in slots],
+                "Desde": [fmt_dt(s.start) for s in slots],
+                "Hasta": [fmt_dt(s.end) for s in slots],
+                "Horas libres": [round(s.hours, 2) for s in slots],
+                "Capacidad": [s.capacity for s in slots],
+                "Preferida": ["⭐" if s.preferred else "" for s in slots],
+            }
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+
+availability_section()
 
 # ======================= FORM NUEVA RESERVA =======================
-bootstrap_new_form_state()
-with st.expander("➕ Crear nueva reservación", expanded=True):
-    col1, col2 = st.columns(2)
-    with col1:
+@st.fragment
+@timed("form")
+def new_booking_section():
+    # Teclear en el formulario sólo re-ejecuta este fragmento
+    bootstrap_new_form_state()
+    with st.expander("➕ Crear nueva reservación", expanded=True):
+        col1, col2 = st.columns(2)
+        with col1:
         
-        if "new_room" not in st.session_state:
-            st.session_state["new_room"] = ROOMS[0]  # inicializa con el primero
-
-        room = st.selectbox(
-            "Salón",
-            ROOMS,
-            index=ROOMS.index(st.session_state["new_room"]),
-            key="new_room"
-        )
-        cap_vis = get_room_capacity(conn, st.session_state["new_room"])
-        if cap_vis is not None:
-            st.caption(f"Capacidad máxima de {st.session_state['new_room']}: **{cap_vis}** personas")
+            catalog = get_room_catalog()
+            room_names = catalog.names()
+            if st.session_state.get("new_room") not in room_names:
+                st.session_state["new_room"] = (room_names or [""])[0]  # inicializa con el primero
+
+            st.selectbox(
+                "Salón",
+                room_names,
+                index=room_index(room_names, st.session_state["new_room"]),
+                key="new_room"
+            )
+            cap_vis = catalog.capacity(st.session_state["new_room"])
+            if cap_vis is not None:
+                st.caption(f"Capacidad máxima de {st.session_state['new_room']}: **{cap_vis}** personas")
 
-        if "new_title" not in st.session_state:
-            st.session_state["new_title"] = ""   # o valor por defecto
+            if "new_title" not in st.session_state:
+                st.session_state["new_title"] = ""   # o valor por defecto
         
-        title = st.text_input(
-            "Título del evento",
-            value=st.session_state["new_title"],
-            placeholder="Boda / Reunión / Cumpleaños / Graduación",
-            key="new_title",
-        )
-        if "new_org" not in st.session_state:
-            st.session_state["new_org"] = ""   # o valor por defecto
-        organizador = st.text_input("Organizador", value=st.session_state["new_org"], key="new_org")
+            title = st.text_input(
+                "Título del evento",
+                value=st.session_state["new_title"],
+                placeholder="Boda / Reunión / Cumpleaños / Graduación",
+                key="new_title",
+            )
+            if "new_org" not in st.session_state:
+                st.session_state["new_org"] = ""   # o valor por defecto
+            st.text_input("Organizador", value=st.session_state["new_org"], key="new_org")
        
-        if "new_start_date" not in st.session_state:
-            st.session_state["new_start_date"] = datetime.today()   # o valor por defecto       
+            if "new_start_date" not in st.session_state:
+                st.session_state["new_start_date"] = datetime.today()   # o valor por defecto       
         
-        start_date = st.date_input("Fecha comienzo", value=st.session_state["new_start_date"], key="new_start_date")
+            st.date_input("Fecha comienzo", value=st.session_state["new_start_date"], key="new_start_date")
         
-        if "new_start_time" not in st.session_state:
-            st.session_state["new_start_time"] = datetime.now().time()     
+            if "new_start_time" not in st.session_state:
+                st.session_state["new_start_time"] = datetime.now().time()     
         
-        start_time = st.time_input("Hora comienzo", value=st.session_state["new_start_time"], key="new_start_time")
+            st.time_input("Hora comienzo", value=st.session_state["new_start_time"], key="new_start_time")
        
-        if "new_attendees" not in st.session_state:
-            st.session_state["new_attendees"] = 0   # o valor por defecto       
+            if "new_attendees" not in st.session_state:
+                st.session_state["new_attendees"] = 0   # o valor por defecto       
         
-        attendees = st.number_input(
-            "Cantidad de personas", min_value=0, step=1, value=st.session_state["new_attendees"], key="new_attendees"
-        )
+            st.number_input(
+                "Cantidad de personas", min_value=0, step=1, value=st.session_state["new_attendees"], key="new_attendees"
+            )
 
-        st.markdown("**Sillas**")
-        st.selectbox("Tipo de silla", CHAIR_TYPES, key="new_chair_type")
-        st.number_input("Cantidad de sillas", min_value=0, step=1, key="new_chair_qty")
+            st.markdown("**Sillas**")
+            st.selectbox("Tipo de silla", CHAIR_TYPES, key="new_chair_type")
+            st.number_input("Cantidad de sillas", min_value=0, step=1, key="new_chair_qty")
 
-    with col2:
-        if "new_end_date" not in st.session_state:
-            st.session_state["new_end_date"] = datetime.today()   # o valor por defecto       
+        with col2:
+            if "new_end_date" not in st.session_state:
+                st.session_state["new_end_date"] = datetime.today()   # o valor por defecto       
                 
-        end_date = st.date_input("Fecha cierre", value=st.session_state["new_end_date"], key="new_end_date")
+            st.date_input("Fecha cierre", value=st.session_state["new_end_date"], key="new_end_date")
 
-        if "new_end_time" not in st.session_state:
-            st.session_state["new_end_time"] = datetime.now().time()             
-        end_time = st.time_input("Hora cierre", value=st.session_state["new_end_time"], key="new_end_time")
+            if "new_end_time" not in st.session_state:
+                st.session_state["new_end_time"] = datetime.now().time()             
+            st.time_input("Hora cierre", value=st.session_state["new_end_time"], key="new_end_time")
         
-        if "new_color" not in st.session_state:
-            st.session_state["new_color"] = "#16a34a"        
-        color = st.color_picker("Color del calendario", value=st.session_state["new_color"], key="new_color")
+            if "new_color" not in st.session_state:
+                st.session_state["new_color"] = "#16a34a"        
+            st.color_picker("Color del calendario", value=st.session_state["new_color"], key="new_color")
         
-        if "new_phone" not in st.session_state:
-            st.session_state["new_phone"] = ""   # o valor por defecto
-        phone = st.text_input(
-            "WhatsApp de Contacto (E.164)",
-            value=st.session_state["new_phone"],
-            placeholder="+1787XXXXXXX",
-            key="new_phone",
-        )
+            if "new_phone" not in st.session_state:
+                st.session_state["new_phone"] = ""   # o valor por defecto
+            st.text_input(
+                "WhatsApp de Contacto (E.164)",
+                value=st.session_state["new_phone"],
+                placeholder="+1787XXXXXXX",
+                key="new_phone",
+            )
         
-        if "new_notes" not in st.session_state:
-            st.session_state["new_notes"] = ""   # o valor por defecto        
-        st.text_area("Notas (opcional)", value=st.session_state.get("new_notes", ""), key="new_notes")
+            if "new_notes" not in st.session_state:
+                st.session_state["new_notes"] = ""   # o valor por defecto        
+            st.text_area("Notas (opcional)", value=st.session_state.get("new_notes", ""), key="new_notes")
 
-        st.markdown("**Mesas**")
+            st.markdown("**Mesas**")
 
-        if "new_table_type" not in st.session_state:
-            st.session_state["new_table_type"] = TABLE_TYPES[0]  # o valor por defecto          
-        st.selectbox("Tipo de mesa", TABLE_TYPES, key="new_table_type")
+            if "new_table_type" not in st.session_state:
+                st.session_state["new_table_type"] = TABLE_TYPES[0]  # o valor por defecto          
+            st.selectbox("Tipo de mesa", TABLE_TYPES, key="new_table_type")
         
         
-        st.number_input("Cantidad de mesas", min_value=0, step=1, key="new_table_qty")
+            st.number_input("Cantidad de mesas", min_value=0, step=1, key="new_table_qty")
 
-    btn = st.button(
-        "Guardar (generar enlace de WhatsApp)", type="primary", use_container_width=True, disabled=not title
-    )
+        repeat_inputs()
 
-    if btn:
-        start_dt = datetime.combine(st.session_state["new_start_date"], st.session_state["new_start_time"])
-        end_dt = datetime.combine(st.session_state["new_end_date"], st.session_state["new_end_time"])
-        start_iso, end_iso = start_dt.isoformat(), end_dt.isoformat()
+        btn = st.button(
+            "Guardar (generar enlace de WhatsApp)", type="primary", use_container_width=True, disabled=not title
+        )
 
-        # Validaciones
-        cap = get_room_capacity(conn, st.session_state["new_room"])
-        if cap is not None and st.session_state["new_attendees"] > cap:
-            st.error(
-                f"Capacidad excedida: {st.session_state['new_attendees']} > {cap} para {st.session_state['new_room']}."
-            )
-        elif end_dt <= start_dt:
-            st.error("La hora/fecha de cierre debe ser posterior al inicio.")
-        elif has_overlap(conn, st.session_state["new_room"], start_iso, end_iso):
-            st.error(
-                f"⚠️ Conflicto: ya existe una reservación en **{st.session_state['new_room']}** dentro de ese rango."
-            )
-        elif st.session_state["new_phone"] and not is_valid_e164(st.session_state["new_phone"]):
-            st.error("Teléfono inválido. Usa formato E.164 (ej. +1787XXXXXXX).")
-        else:
-            if st.session_state["new_chair_qty"] and st.session_state["new_attendees"] > st.session_state["new_chair_qty"]:
-                st.warning("Hay más personas que sillas asignadas. Revisa cantidades.")
-
-            token = str(uuid4())
-            insert_booking(
-                conn,
-                st.session_state["new_room"],
-                st.session_state["new_title"],
-                st.session_state["new_org"],
-                start_iso,
-                end_iso,
-                st.session_state["new_color"],
-                st.session_state["new_attendees"],
-                st.session_state["new_phone"],
-                token,
-                st.session_state["new_notes"],
-                st.session_state["new_chair_type"],
-                int(st.session_state["new_chair_qty"]),
-                st.session_state["new_table_type"],
-                int(st.session_state["new_table_qty"]),
-            )
-            st.success("¡Reservación creada correctamente!")
-            if st.session_state["new_phone"]:
-                try:
-                    cta = build_whatsapp_cta(
-                        st.session_state["new_phone"],
-                        st.session_state["new_room"],
-                        st.session_state["new_title"],
-                        start_dt,
-                        end_dt,
-                        st.session_state["new_attendees"],
-                        token,
-                    )
-                    st.info("Comparte este enlace con el cliente para que INICIE el chat en WhatsApp y confirme/cancele:")
-                    st.markdown(f"[📲 Abrir WhatsApp con mensaje pre-escrito]({cta})")
-                except Exception as e:
-                    st.warning(f"No se pudo generar el enlace de WhatsApp: {e}")
+        if btn:
+            start_dt = datetime.combine(st.session_state["new_start_date"], st.session_state["new_start_time"])
+            end_dt = datetime.combine(st.session_state["new_end_date"], st.session_state["new_end_time"])
+            start_iso, end_iso = start_dt.isoformat(), end_dt.isoformat()
+
+            # Validaciones locales; capacidad y choques se validan dentro de reserve()
+            if end_dt <= start_dt:
+                st.error("La hora/fecha de cierre debe ser posterior al inicio.")
+            elif st.session_state["new_phone"] and not is_valid_e164(st.session_state["new_phone"]):
+                st.error("Teléfono inválido. Usa formato E.164 (ej. +1787XXXXXXX).")
+            elif st.session_state.get("new_repeat", "No") != "No":
+                save_series_from_form(start_iso, end_iso)
             else:
-                st.warning("No se ingresó teléfono. No se generó enlace de WhatsApp.")
-            # Reset seguro del formulario
-            request_new_form_reset_and_rerun()
+                if st.session_state["new_chair_qty"] and st.session_state["new_attendees"] > st.session_state["new_chair_qty"]:
+                    st.warning("Hay más personas que sillas asignadas. Revisa cantidades.")
+
+                res = reserve(
+                    {
+                        "room": st.session_state["new_room"],
+                        "title": st.session_state["new_title"],
+                        "organizador": st.session_state["new_org"],
+                        "start_dt": start_iso,
+                        "end_dt": end_iso,
+                        "color": st.session_state["new_color"],
+                        "attendees": st.session_state["new_attendees"],
+                        "phone": st.session_state["new_phone"],
+                        "status": "Pendiente",
+                        "notes": st.session_state["new_notes"],
+                        "chair_type": st.session_state["new_chair_type"],
+                        "chair_qty": int(st.session_state["new_chair_qty"]),
+                        "table_type": st.session_state["new_table_type"],
+                        "table_qty": int(st.session_state["new_table_qty"]),
+                    },
+                    idempotency_key=st.session_state.get("new_idem_key"),
+                )
+                if not res.ok:
+                    show_reserve_error(res, st.session_state["new_room"], st.session_state["new_attendees"])
+                else:
+                    st.success("¡Reservación creada correctamente!")
+                    if st.session_state["new_phone"]:
+                        try:
+                            cta = build_whatsapp_cta(
+                                st.session_state["new_phone"],
+                                st.session_state["new_room"],
+                                st.session_state["new_title"],
+                                start_dt,
+                                end_dt,
+                                st.session_state["new_attendees"],
+                                res.booking_id,
+                            )
+                            st.info("Comparte este enlace con el cliente para que INICIE el chat en WhatsApp y confirme/cancele:")
+                            st.markdown(f"[📲 Abrir WhatsApp con mensaje pre-escrito]({cta})")
+                        except Exception as e:
+                            st.warning(f"No se pudo generar el enlace de WhatsApp: {e}")
+                    else:
+                        st.warning("No se ingresó teléfono. No se generó enlace de WhatsApp.")
+                    # Reset seguro del formulario
+                    request_new_form_reset_and_rerun()
+
+
+new_booking_section()
 
 # ======================= DATOS & CALENDARIO =======================
-today = datetime.now().date()
-df = read_bookings(
-    conn,
-    room_filter=room_filter,
-    date_from=today - timedelta(days=60),
-    date_to=today + timedelta(days=120),
-)
+CAL_VIEWS = {"Mes": "dayGridMonth", "Semana": "timeGridWeek", "Día": "timeGridDay", "Agenda": "listWeek"}
+CAL_PREFETCH_DAYS = 7
 
-st.subheader("Vista Calendario")
-if CAL_AVAILABLE:
-    events = []
-    for _, r in df.iterrows():
-        title_txt = f'{r["room"]}: {r["title"]}'
-        if pd.notna(r.get("organizador", None)) and str(r["organizador"]).strip():
-            title_txt += f' ({r["organizador"]})'
-        events.append(
-            {
-                "id": str(r["id"]),
-                "title": title_txt,
-                "start": r["start_dt"],
-                "end": r["end_dt"],
-                "color": status_color(r),
-            }
+
+def _segment_loader(room_filter):
+    def load(m_from, m_to):
+        return build_events(read_bookings(get_conn(), room_filter=room_filter, date_from=m_from, date_to=m_to))
+    return load
+
+
+def calendar_events(room_filter, date_from, date_to) -> list[dict]:
+    # Segmentos mensuales por sesión; al navegar sólo se leen los meses nuevos
+    cache = st.session_state.setdefault("cal_segments", SegmentCache())
+    return cache.events(room_filter, data_version(), date_from, date_to, _segment_loader(room_filter))
+
+
+def prefetch_calendar(room_filter, view, anchor):
+    # Rango anterior/siguiente precargado: el clic en ◀/▶ no toca la DB
+    cache = st.session_state.setdefault("cal_segments", SegmentCache())
+    version = data_version()
+    for step in (-1, 1):
+        d_from, d_to = visible_range(view, shift_anchor(view, anchor, step))
+        cache.ensure(room_filter, version, d_from, d_to, _segment_loader(room_filter))
+
+
+@st.fragment
+@timed("calendar")
+def calendar_section(room_filter):
+    st.subheader("Vista Calendario")
+    if CAL_AVAILABLE:
+        today = datetime.now().date()
+        st.session_state.setdefault("cal_anchor", today)
+        nav = st.columns([1, 1, 1, 3])
+        view_label = nav[3].radio(
+            "Vista", list(CAL_VIEWS), horizontal=True, key="cal_view", label_visibility="collapsed"
         )
+        view = CAL_VIEWS[view_label]
+        if nav[0].button("◀", key="cal_prev", use_container_width=True):
+            st.session_state["cal_anchor"] = shift_anchor(view, st.session_state["cal_anchor"], -1)
+        if nav[1].button("Hoy", key="cal_today", use_container_width=True):
+            st.session_state["cal_anchor"] = today
+        if nav[2].button("▶", key="cal_next", use_container_width=True):
+            st.session_state["cal_anchor"] = shift_anchor(view, st.session_state["cal_anchor"], 1)
+        anchor = st.session_state["cal_anchor"]
+
+        # Sólo el rango visible (+ margen) viaja al componente
+        d_from, d_to = visible_range(view, anchor)
+        with profile_section("calendar.events"):
+            events = calendar_events(
+                room_filter,
+                d_from - timedelta(days=CAL_PREFETCH_DAYS),
+                d_to + timedelta(days=CAL_PREFETCH_DAYS),
+            )
 
-    cal_options = {
-        "initialView": "dayGridMonth",
-        "headerToolbar": {
-            "left": "prev,next today",
-            "center": "title",
-            "right": "dayGridMonth,timeGridWeek,timeGridDay,listWeek",
-        },
-        "slotMinTime": "07:00:00",
-        "slotMaxTime": "23:00:00",
-        "locale": "es",
-        "weekNumbers": True,
-        "nowIndicator": True,
-        "selectable": False,
-        "expandRows": True,
-        "height": "auto",
-    }
-    calendar(
-        events={"events": events},
-        options=cal_options,
-        key="calendar",
-        custom_css="""
-            .fc-event-title { font-weight:600; }
-            .fc .fc-col-header-cell-cushion { padding: 6px 4px; }
-        """,
+        cal_options = {
+            "initialView": view,
+            "initialDate": anchor.isoformat(),
+            "firstDay": 1,
+            "headerToolbar": {"left": "", "center": "title", "right": ""},
+            "slotMinTime": "07:00:00",
+            "slotMaxTime": "23:00:00",
+            "locale": "es",
+            "weekNumbers": True,
+            "nowIndicator": True,
+            "selectable": False,
+            "expandRows": True,
+            "height": "auto",
+        }
+        with profile_section("calendar.component"):
+            calendar(
+                events={"events": events},
+                options=cal_options,
+                key=f"calendar_{view}_{anchor.isoformat()}",   # nueva vista/fecha = se remonta el componente
+                custom_css="""
+                    .fc-event-title { font-weight:600; }
+                    .fc .fc-col-header-cell-cushion { padding: 6px 4px; }
+                """,
+            )
+        with profile_section("calendar.prefetch"):
+            prefetch_calendar(room_filter, view, anchor)
+    else:
+        st.error("No se encontró 'streamlit_calendar'. Instala: `pip install streamlit-calendar`")
+
+
+calendar_section(room_filter)
+
+# ======================= BÚSQUEDA (todo el historial) =======================
+@st.fragment
+@timed("search")
+def search_section(room_filter):
+    if not st.toggle("🔍 Buscar reservaciones (todo el historial)", key="show_search"):
+        return
+    q1, q2, q3, q4 = st.columns([3, 1, 1, 1])
+    text = q1.text_input(
+        "Buscar", key="search_text", placeholder="rivera boda, reunion, 787…",
+        help="Título, organizador, notas o teléfono. Sin acentos y por inicio de palabra.",
+    )
+    status = q2.selectbox("Estado", ["(Todos)", "Pendiente", "Confirmado", "Cancelado"], key="search_status")
+    s_from = q3.date_input("Desde", value=None, key="search_from")
+    s_to = q4.date_input("Hasta", value=None, key="search_to")
+    if not text.strip():
+        return
+    res = search(
+        get_conn(),
+        text,
+        room=room_filter,
+        status=None if status == "(Todos)" else status,
+        date_from=s_from,
+        date_to=s_to,
+    )
+    if res.empty:
+        st.info("Sin resultados.")
+        return
+    res["start_dt"] = pd.to_datetime(res["start_dt"], format="ISO8601").dt.strftime("%Y-%m-%d %I:%M %p")
+    st.caption(f"{len(res)} resultado(s) más relevantes (máx. {SEARCH_LIMIT}); usa el ID en las acciones de la lista.")
+    st.dataframe(
+        res.rename(columns={"start_dt": "inicio", "match": "coincidencia"}),
+        use_container_width=True,
+        hide_index=True,
     )
-else:
-    st.error("No se encontró 'streamlit_calendar'. Instala: `pip install streamlit-calendar`")
+
+
+search_section(room_filter)
 
 # ======================= LISTA, ENLACES, ESTADO, BORRAR =======================
-with st.expander("📋 Lista de reservaciones (enlaces/estado/borrar)", expanded=False):
-    if df.empty:
-        st.info("No hay reservaciones registradas.")
+@st.fragment
+@timed("list")
+def bookings_list_section(room_filter):
+    if not st.toggle("📋 Lista de reservaciones (enlaces/estado/borrar)", key="show_bookings_list"):
+        return
+    f1, f2, f3, f4 = st.columns([1, 1, 1, 2])
+    l_status = f1.selectbox("Estado", ["(Todos)", "Pendiente", "Confirmado", "Cancelado"], key="list_status")
+    l_from = f2.date_input("Desde", value=None, key="list_from")
+    l_to = f3.date_input("Hasta", value=None, key="list_to")
+    l_text = f4.text_input("Buscar (título, organizador, teléfono, notas)", key="list_text")
+    s1, s2, s3 = st.columns([2, 1, 3])
+    l_sort = s1.selectbox("Ordenar por", list(LIST_SORT_LABELS), format_func=LIST_SORT_LABELS.get, key="list_sort")
+    l_desc = s2.toggle("Descendente", key="list_desc")
+    filters = (
+        room_filter,
+        None if l_status == "(Todos)" else l_status,
+        l_from,
+        l_to,
+        l_text.strip() or None,
+        l_sort,
+        l_desc,
+    )
+    # Cursores de las páginas visitadas; cambiar filtros/orden vuelve a la primera
+    if st.session_state.get("list_filters") != filters:
+        st.session_state["list_filters"] = filters
+        st.session_state["list_cursors"] = [None]
+    cursors = st.session_state["list_cursors"]
+    df_view, next_cursor = cached_list_page(filters, cursors[-1])
+
+    if df_view.empty:
+        st.info("No hay reservaciones con esos filtros.")
     else:
-        df_view = df.assign(
-            start=lambda x: pd.to_datetime(x["start_dt"]).dt.strftime("%Y-%m-%d %I:%M %p"),
-            end=lambda x: pd.to_datetime(x["end_dt"]).dt.strftime("%Y-%m-%d %I:%M %p"),
-        )[[
-            "id",
-            "room",
-            "title",
-            "organizador",
-            "start",
-            "end",
-            "attendees",
-            "phone",
-            "chair_type",
-            "chair_qty",
-            "table_type",
-            "table_qty",
-            "status",
-            "color",
-            "notes",
-            "confirm_token",
-            "reminder_24h_sent",
-            "reminder_24h_sent_at",
-        ]]
         st.dataframe(df_view.drop(columns=["confirm_token"]), use_container_width=True, hide_index=True)
-
-        c1, c2, c3 = st.columns(3)
-
-        with c1:
-            st.markdown("**Generar enlace wa.me**")
-            link_id = st.number_input("ID", min_value=0, step=1, value=0, key="link_id")
-            if st.button("Crear enlace", use_container_width=True):
-                if link_id and (df["id"] == link_id).any():
-                    row = df[df["id"] == link_id].iloc[0]
-                    if not row["phone"] or not is_valid_e164(row["phone"]):
-                        st.warning("La reserva no tiene teléfono válido en E.164.")
-                    else:
-                        cta = build_whatsapp_cta(
-                            row["phone"],
-                            row["room"],
-                            row["title"],
-                            pd.to_datetime(row["start_dt"]).to_pydatetime(),
-                            pd.to_datetime(row["end_dt"]).to_pydatetime(),
-                            int(row["attendees"] or 0),
-                            row["confirm_token"],
-                        )
-                        st.markdown(f"[📲 Abrir WhatsApp con mensaje pre-escrito]({cta})")
-                else:
-                    st.warning("ID no encontrado.")
-
-        with c2:
-            st.markdown("**Actualizar estado**")
-            up_id = st.number_input("ID", min_value=0, step=1, value=0, key="update_id")
-            new_status = st.selectbox("Nuevo estado", ["Pendiente", "Confirmado", "Cancelado"], key="new_status")
-            if st.button("Aplicar", use_container_width=True):
-                if up_id and (df["id"] == up_id).any():
-                    conn.execute("UPDATE bookings SET status = ? WHERE id = ?", (new_status, int(up_id)))
-                    conn.commit()
-                    st.success("Estado actualizado.")
-                    st.rerun()
+    p1, p2, p3 = s3.columns([1, 1, 1])
+    p2.markdown(f"Página **{len(cursors)}**")
+    # Callbacks: el cursor cambia antes del rerun del fragmento que dispara el botón
+    p1.button("◀ Anterior", key="list_prev", disabled=len(cursors) == 1, use_container_width=True,
+              on_click=cursors.pop)
+    p3.button("Siguiente ▶", key="list_next", disabled=next_cursor is None, use_container_width=True,
+              on_click=cursors.append, args=(next_cursor,))
+
+    c1, c2, c3 = st.columns(3)
+
+    with c1:
+        st.markdown("**Generar enlace wa.me**")
+        link_id = st.number_input("ID", min_value=0, step=1, value=0, key="link_id")
+        if st.button("Crear enlace", use_container_width=True):
+            row = get_booking(get_conn(), link_id) if link_id else None
+            if row:
+                if not row["phone"] or not is_valid_e164(row["phone"]):
+                    st.warning("La reserva no tiene teléfono válido en E.164.")
                 else:
-                    st.warning("ID no encontrado.")
-
-        with c3:
-            st.markdown("**Borrar reservación**")
-            del_id = st.number_input("ID", min_value=0, step=1, value=0, key="delete_id")
-            if st.button("Eliminar", type="secondary", use_container_width=True):
-                if del_id and (df["id"] == del_id).any():
-                    delete_booking(conn, int(del_id))
-                    st.success("Reservación eliminada.")
-                    st.rerun()
-                else:
-                    st.warning("ID no encontrado.")
-
-        # ============== EDITAR RESERVA ==============
-        st.markdown("---")
-        st.markdown("### ✏️ Editar reservación")
-        edit_id = st.number_input("ID a editar", min_value=0, step=1, value=0, key="edit_id")
-
-        if st.button("Cargar reservación", key="btn_load_edit", use_container_width=True):
-            if edit_id and (df["id"] == edit_id).any():
-                row = df[df["id"] == edit_id].iloc[0]
-                st.session_state["e_room"] = row["room"]
-                st.session_state["e_title"] = row["title"]
-                st.session_state["e_org"] = row.get("organizador", "")
-                st.session_state["e_start_date"] = pd.to_datetime(row["start_dt"]).date()
-                st.session_state["e_start_time"] = pd.to_datetime(row["start_dt"]).time()
-                st.session_state["e_end_date"] = pd.to_datetime(row["end_dt"]).date()
-                st.session_state["e_end_time"] = pd.to_datetime(row["end_dt"]).time()
-                st.session_state["e_att"] = int(row["attendees"] or 0)
-                st.session_state["e_color"] = row["color"] or "#3b82f6"
-                st.session_state["e_phone"] = row["phone"] or ""
-                st.session_state["e_status"] = row["status"] or "Pendiente"
-                st.session_state["e_notes"] = row.get("notes", "") if "notes" in df.columns else ""
-                st.session_state["e_chair_type"] = row.get("chair_type") or CHAIR_TYPES[0]
-                st.session_state["e_chair_qty"] = int(row.get("chair_qty") or 0)
-                st.session_state["e_table_type"] = row.get("table_type") or TABLE_TYPES[0]
-                st.session_state["e_table_qty"] = int(row.get("table_qty") or 0)
+                    cta = build_whatsapp_cta(
+                        row["phone"],
+                        row["room"],
+                        row["title"],
+                        pd.to_datetime(row["start_dt"]).to_pydatetime(),
+                        pd.to_datetime(row["end_dt"]).to_pydatetime(),
+                        int(row["attendees"] or 0),
+                        int(row["id"]),
+                    )
+                    st.markdown(f"[📲 Abrir WhatsApp con mensaje pre-escrito]({cta})")
             else:
                 st.warning("ID no encontrado.")
 
-        if "e_room" in st.session_state:
-            ec1, ec2 = st.columns(2)
-            with ec1:
-                e_room = st.selectbox("Sala", ROOMS, index=ROOMS.index(st.session_state["e_room"]), key="e_room")
-                e_title = st.text_input("Título", value=st.session_state["e_title"], key="e_title")
-                e_org = st.text_input("Organizador", value=st.session_state["e_org"], key="e_org")
-                e_start_date = st.date_input("Fecha inicio", value=st.session_state["e_start_date"], key="e_start_date")
-                e_start_time = st.time_input("Hora inicio", value=st.session_state["e_start_time"], key="e_start_time")
-                st.text_area("Notas (opcional)", value=st.session_state["e_notes"], key="e_notes")
-            with ec2:
-                e_end_date = st.date_input("Fecha fin", value=st.session_state["e_end_date"], key="e_end_date")
-                e_end_time = st.time_input("Hora fin", value=st.session_state["e_end_time"], key="e_end_time")
-                e_att = st.number_input("Personas", min_value=0, step=1, value=st.session_state["e_att"], key="e_att")
-                e_color = st.color_picker("Color", value=st.session_state["e_color"], key="e_color")
-                e_phone = st.text_input("WhatsApp (E.164)", value=st.session_state["e_phone"], key="e_phone")
-                e_status = st.selectbox(
-                    "Estado",
-                    ["Pendiente", "Confirmado", "Cancelado"],
-                    index=["Pendiente", "Confirmado", "Cancelado"].index(st.session_state["e_status"]),
-                    key="e_status",
+    with c2:
+        st.markdown("**Actualizar estado**")
+        up_id = st.number_input("ID", min_value=0, step=1, value=0, key="update_id")
+        new_status = st.selectbox("Nuevo estado", ["Pendiente", "Confirmado", "Cancelado"], key="new_status")
+        if st.button("Aplicar", use_container_width=True):
+            if writable_booking(up_id):
+                set_booking_status(int(up_id), new_status)
+                st.success("Estado actualizado.")
+                st.rerun()
+
+    with c3:
+        st.markdown("**Borrar reservación**")
+        del_id = st.number_input("ID", min_value=0, step=1, value=0, key="delete_id")
+        if st.button("Eliminar", type="secondary", use_container_width=True):
+            if writable_booking(del_id):
+                delete_booking(int(del_id))
+                st.success("Reservación eliminada.")
+                st.rerun()
+
+    # ============== EDITAR RESERVA ==============
+    st.markdown("---")
+    st.markdown("### ✏️ Editar reservación")
+    edit_id = st.number_input("ID a editar", min_value=0, step=1, value=0, key="edit_id")
+
+    if st.button("Cargar reservación", key="btn_load_edit", use_container_width=True):
+        row = writable_booking(edit_id)
+        if row:
+            st.session_state["e_room"] = row["room"]
+            st.session_state["e_title"] = row["title"]
+            st.session_state["e_org"] = row.get("organizador", "")
+            st.session_state["e_start_date"] = pd.to_datetime(row["start_dt"]).date()
+            st.session_state["e_start_time"] = pd.to_datetime(row["start_dt"]).time()
+            st.session_state["e_end_date"] = pd.to_datetime(row["end_dt"]).date()
+            st.session_state["e_end_time"] = pd.to_datetime(row["end_dt"]).time()
+            st.session_state["e_att"] = int(row["attendees"] or 0)
+            st.session_state["e_color"] = row["color"] or "#3b82f6"
+            st.session_state["e_phone"] = row["phone"] or ""
+            st.session_state["e_status"] = row["status"] or "Pendiente"
+            st.session_state["e_notes"] = row.get("notes") or ""
+            st.session_state["e_chair_type"] = row.get("chair_type") or CHAIR_TYPES[0]
+            st.session_state["e_chair_qty"] = int(row.get("chair_qty") or 0)
+            st.session_state["e_table_type"] = row.get("table_type") or TABLE_TYPES[0]
+            st.session_state["e_table_qty"] = int(row.get("table_qty") or 0)
+
+    if "e_room" in st.session_state:
+        ec1, ec2 = st.columns(2)
+        with ec1:
+            room_names = get_room_catalog().names()
+            st.selectbox("Sala", room_names, index=room_index(room_names, st.session_state["e_room"]), key="e_room")
+            st.text_input("Título", value=st.session_state["e_title"], key="e_title")
+            st.text_input("Organizador", value=st.session_state["e_org"], key="e_org")
+            st.date_input("Fecha inicio", value=st.session_state["e_start_date"], key="e_start_date")
+            st.time_input("Hora inicio", value=st.session_state["e_start_time"], key="e_start_time")
+            st.text_area("Notas (opcional)", value=st.session_state["e_notes"], key="e_notes")
+        with ec2:
+            st.date_input("Fecha fin", value=st.session_state["e_end_date"], key="e_end_date")
+            st.time_input("Hora fin", value=st.session_state["e_end_time"], key="e_end_time")
+            st.number_input("Personas", min_value=0, step=1, value=st.session_state["e_att"], key="e_att")
+            st.color_picker("Color", value=st.session_state["e_color"], key="e_color")
+            st.text_input("WhatsApp (E.164)", value=st.session_state["e_phone"], key="e_phone")
+            st.selectbox(
+                "Estado",
+                ["Pendiente", "Confirmado", "Cancelado"],
+                index=["Pendiente", "Confirmado", "Cancelado"].index(st.session_state["e_status"]),
+                key="e_status",
+            )
+            st.markdown("**Sillas / Mesas**")
+            st.selectbox("Tipo de silla", CHAIR_TYPES, key="e_chair_type")
+            st.number_input("Cantidad de sillas", min_value=0, step=1, key="e_chair_qty")
+            st.selectbox("Tipo de mesa", TABLE_TYPES, key="e_table_type")
+            st.number_input("Cantidad de mesas", min_value=0, step=1, key="e_table_qty")
+
+        if st.button("Guardar cambios", type="primary", use_container_width=True):
+            sdt = datetime.combine(st.session_state["e_start_date"], st.session_state["e_start_time"])
+            edt = datetime.combine(st.session_state["e_end_date"], st.session_state["e_end_time"])
+            if edt <= sdt:
+                st.error("La hora/fecha de fin debe ser posterior al inicio.")
+            elif not is_valid_e164(st.session_state["e_phone"]) and st.session_state["e_phone"]:
+                st.error("Teléfono inválido. Usa formato E.164 (ej. +1787XXXXXXX).")
+            else:
+                if st.session_state["e_chair_qty"] and int(st.session_state["e_att"]) > int(st.session_state["e_chair_qty"]):
+                    st.warning("Hay más personas que sillas asignadas. Revisa cantidades.")
+                res = reserve(
+                    {
+                        "room": st.session_state["e_room"],
+                        "title": st.session_state["e_title"],
+                        "organizador": st.session_state["e_org"],
+                        "start_dt": sdt.isoformat(),
+                        "end_dt": edt.isoformat(),
+                        "color": st.session_state["e_color"],
+                        "attendees": int(st.session_state["e_att"]),
+                        "phone": st.session_state["e_phone"],
+                        "status": st.session_state["e_status"],
+                        "notes": st.session_state["e_notes"],
+                        "chair_type": st.session_state["e_chair_type"],
+                        "chair_qty": int(st.session_state["e_chair_qty"]),
+                        "table_type": st.session_state["e_table_type"],
+                        "table_qty": int(st.session_state["e_table_qty"]),
+                    },
+                    booking_id=int(edit_id),
                 )
-                st.markdown("**Sillas / Mesas**")
-                st.selectbox("Tipo de silla", CHAIR_TYPES, key="e_chair_type")
-                st.number_input("Cantidad de sillas", min_value=0, step=1, key="e_chair_qty")
-                st.selectbox("Tipo de mesa", TABLE_TYPES, key="e_table_type")
-                st.number_input("Cantidad de mesas", min_value=0, step=1, key="e_table_qty")
-
-            if st.button("Guardar cambios", type="primary", use_container_width=True):
-                sdt = datetime.combine(st.session_state["e_start_date"], st.session_state["e_start_time"])
-                edt = datetime.combine(st.session_state["e_end_date"], st.session_state["e_end_time"])
-                cap2 = get_room_capacity(conn, st.session_state["e_room"])
-                if cap2 is not None and int(st.session_state["e_att"]) > cap2:
-                    st.error(
-                        f"Capacidad excedida: {int(st.session_state['e_att'])} > {cap2} para {st.session_state['e_room']}."
-                    )
-                elif edt <= sdt:
-                    st.error("La hora/fecha de fin debe ser posterior al inicio.")
-                elif not is_valid_e164(st.session_state["e_phone"]) and st.session_state["e_phone"]:
-                    st.error("Teléfono inválido. Usa formato E.164 (ej. +1787XXXXXXX).")
-                elif has_overlap(conn, st.session_state["e_room"], sdt.isoformat(), edt.isoformat(), ignore_id=int(edit_id)):
-                    st.error("⚠️ Conflicto: ya existe una reserva en esa sala dentro de ese rango.")
+                if not res.ok:
+                    show_reserve_error(res, st.session_state["e_room"], int(st.session_state["e_att"]))
                 else:
-                    if st.session_state["e_chair_qty"] and int(st.session_state["e_att"]) > int(st.session_state["e_chair_qty"]):
-                        st.warning("Hay más personas que sillas asignadas. Revisa cantidades.")
-                    update_booking(
-                        conn,
-                        int(edit_id),
-                        st.session_state["e_room"],
-                        st.session_state["e_title"],
-                        st.session_state["e_org"],
-                        sdt.isoformat(),
-                        edt.isoformat(),
-                        st.session_state["e_color"],
-                        int(st.session_state["e_att"]),
-                        st.session_state["e_phone"],
-                        st.session_state["e_status"],
-                        st.session_state["e_notes"],
-                        st.session_state["e_chair_type"],
-                        int(st.session_state["e_chair_qty"]),
-                        st.session_state["e_table_type"],
-                        int(st.session_state["e_table_qty"]),
-                    )
                     st.success("Reservación actualizada.")
                     for k in list(st.session_state.keys()):
                         if k.startswith("e_"):
                             del st.session_state[k]
                     st.rerun()
 
-            if st.button("Cancelar edición", use_container_width=True):
-                for k in list(st.session_state.keys()):
-                    if k.startswith("e_"):
-                        del st.session_state[k]
+        if st.button("Cancelar edición", use_container_width=True):
+            for k in list(st.session_state.keys()):
+                if k.startswith("e_"):
+                    del st.session_state[k]
+            st.rerun()
+
+
+bookings_list_section(room_filter)
+
+# ======================= SERIES RECURRENTES =======================
+@st.fragment
+@timed("series")
+def series_section(room_filter):
+    if not st.toggle("🔁 Series recurrentes (editar ocurrencia o serie)", key="show_series"):
+        return
+    df_s = list_series(get_conn(), room_filter)
+    if df_s.empty:
+        st.info("No hay series. Crea una con «Repetir» en el formulario de nueva reservación.")
+        return
+    df_s["regla"] = describe_rows(df_s)
+    st.dataframe(
+        df_s[["id", "room", "title", "organizador", "start_dt", "regla", "status"]], use_container_width=True, hide_index=True
+    )
+    sid = st.selectbox("Serie", df_s["id"].tolist(), format_func=lambda i: f"#{i} {df_s.set_index('id').at[i, 'title']}", key="series_pick")
+    found = get_series(int(sid))
+    if found is None:
+        st.warning("Serie no encontrada.")
+        return
+    row, rec = found
+    today = datetime.now().date()
+    occ = read_occurrences(get_conn(), row["room"], today, today + timedelta(days=365))
+    occ = occ[occ["series_id"] == int(sid)] if not occ.empty else occ
+    this_tab, all_tab = st.tabs(["Sólo esta ocurrencia", "Toda la serie"])
+
+    with this_tab:
+        if occ.empty:
+            st.info("Sin ocurrencias próximas.")
+        else:
+            occ_id = st.selectbox(
+                "Ocurrencia", occ["id"].tolist(),
+                format_func=lambda i: fmt_dt(datetime.fromisoformat(occ.set_index("id").at[i, "start_dt"])),
+                key="series_occ",
+            )
+            occ_row = occ.set_index("id").loc[occ_id]
+            o_start = datetime.fromisoformat(occ_row["start_dt"])
+            o_end = datetime.fromisoformat(occ_row["end_dt"])
+            occ_date = occ_id.split(":", 1)[1]
+            m1, m2, m3 = st.columns(3)
+            new_date = m1.date_input("Fecha", value=o_start.date(), key=f"occ_date_{occ_id}")
+            new_start = m2.time_input("Inicio", value=o_start.time(), key=f"occ_start_{occ_id}")
+            new_end = m3.time_input("Fin", value=o_end.time(), key=f"occ_end_{occ_id}")
+            b1, b2 = st.columns(2)
+            if b1.button("Mover/editar sólo esta", use_container_width=True, key="occ_move"):
+                booking = {c: row[c] for c in SERIES_FIELDS}
+                booking["start_dt"] = datetime.combine(new_date, new_start).isoformat()
+                booking["end_dt"] = datetime.combine(new_date, new_end).isoformat()
+                res = detach_occurrence(int(sid), occ_date, booking)
+                if res.ok:
+                    st.success(f"Ocurrencia separada como reserva #{res.booking_id}.")
+                    st.rerun()
+                else:
+                    show_reserve_error(res, row["room"], row["attendees"])
+            if b2.button("Eliminar sólo esta", use_container_width=True, key="occ_skip"):
+                skip_occurrence(int(sid), occ_date)
+                st.success("Ocurrencia eliminada.")
                 st.rerun()
 
+    with all_tab:
+        first = datetime.fromisoformat(row["start_dt"])
+        last = first + timedelta(seconds=int(row["duration_s"]))
+        a1, a2 = st.columns(2)
+        s_title = a1.text_input("Título", value=row["title"], key=f"ser_title_{sid}")
+        s_org = a2.text_input("Organizador", value=row["organizador"], key=f"ser_org_{sid}")
+        a3, a4, a5 = st.columns(3)
+        s_start = a3.time_input("Inicio", value=first.time(), key=f"ser_start_{sid}")
+        s_end = a4.time_input("Fin", value=last.time(), key=f"ser_end_{sid}")
+        s_att = a5.number_input("Personas", min_value=0, step=1, value=int(row["attendees"] or 0), key=f"ser_att_{sid}")
+        s_status = st.selectbox(
+            "Estado", ["Pendiente", "Confirmado", "Cancelado"],
+            index=["Pendiente", "Confirmado", "Cancelado"].index(row["status"] or "Pendiente"), key=f"ser_status_{sid}",
+        )
+        c1, c2 = st.columns(2)
+        if c1.button("Guardar toda la serie", type="primary", use_container_width=True, key="ser_save"):
+            booking = {c: row[c] for c in SERIES_FIELDS}
+            booking.update(title=s_title, organizador=s_org, attendees=int(s_att), status=s_status)
+            new_first = datetime.combine(first.date(), s_start)
+            booking["start_dt"] = new_first.isoformat()
+            booking["end_dt"] = series_end(new_first, s_end, int(row["duration_s"])).isoformat()
+            res = update_series(int(sid), booking, rec)
+            show_series_result(res, row["room"], s_att)
+            if res.ok:
+                st.success(f"Serie actualizada ({res.occurrences} ocurrencias).")
+                st.rerun()
+        if c2.button("Eliminar serie", use_container_width=True, key="ser_delete"):
+            delete_series(int(sid))
+            st.success("Serie eliminada (las ocurrencias separadas se conservan).")
+            st.rerun()
+
+
+series_section(room_filter)
+
+# ======================= OCUPACIÓN =======================
+@st.fragment
+@timed("analytics")
+def analytics_section(room_filter):
+    if not st.toggle("📊 Ocupación y uso de salas", key="show_analytics"):
+        return
+    today = datetime.now().date()
+    o1, o2, o3 = st.columns([1, 1, 2])
+    an_from = o1.date_input("Desde", value=today - timedelta(days=90), key="an_from")
+    an_to = o2.date_input("Hasta", value=today + timedelta(days=30), key="an_to")
+    names = get_room_catalog().names()
+    an_rooms = o3.multiselect(
+        "Salas", names, default=[room_filter] if room_filter in names else [], key="an_rooms",
+        placeholder="Todas",
+    )
+    if an_to < an_from:
+        st.warning("La fecha final debe ser igual o posterior a la inicial.")
+        return
+    occ = occupancy(an_from, an_to, an_rooms or None)
+    a, b = OPEN_HOURS
+    st.caption(f"Utilización sobre el horario {a:02d}:00–{b:02d}:00 (ANALYTICS_OPEN_HOURS). Las canceladas no cuentan.")
+    st.dataframe(
+        occ.rooms,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "room": "Sala",
+            "capacity": "Capacidad",
+            "horas": st.column_config.NumberColumn("Horas ocupadas", format="%.1f"),
+            "uso": st.column_config.ProgressColumn("Utilización", format="%.0f%%", min_value=0, max_value=100),
+            "personas_media": st.column_config.NumberColumn("Personas (media)", format="%.1f"),
+            "personas_pico": st.column_config.NumberColumn("Personas (pico)", format="%.0f"),
+            "carga": st.column_config.ProgressColumn("Carga vs capacidad", format="%.0f%%", min_value=0, max_value=100),
+        },
+    )
+    t_week, t_day, t_month, t_demand = st.tabs(["Hora de la semana", "Por día", "Por mes", "Sillas y mesas"])
+    with t_week:
+        how = occ.hour_of_week.groupby(["dia", "hora"], sort=False, as_index=False)["uso"].mean()
+        st.altair_chart(
+            alt.Chart(how)
+            .mark_rect()
+            .encode(
+                x=alt.X("hora:O", title="Hora"),
+                y=alt.Y("dia:O", title=None, sort=list(WEEKDAYS)),
+                color=alt.Color("uso:Q", title="% uso", scale=alt.Scale(domain=[0, 100])),
+                tooltip=["dia", "hora", alt.Tooltip("uso:Q", format=".0f")],
+            ),
+            use_container_width=True,
+        )
+    with t_day:
+        st.line_chart(occ.by_day, y_label="% uso")
+    with t_month:
+        st.bar_chart(occ.by_month, stack=False, y_label="% uso")
+    with t_demand:
+        st.line_chart(occ.demand[["sillas_pico", "mesas_pico"]], y_label="En uso (pico por hora)")
+        st.caption(
+            f"Total en el rango: {occ.demand['sillas_horas'].sum():,.0f} sillas·hora, "
+            f"{occ.demand['mesas_horas'].sum():,.0f} mesas·hora."
+        )
+
+
+analytics_section(room_filter)
+
 # ======================= RECORDATORIOS 24H =======================
-with st.expander("🔔 Recordatorios 24 h"):
+@st.fragment
+@timed("reminders")
+def reminders_section():
+    if not st.toggle("🔔 Recordatorios 24 h", key="show_reminders"):
+        return
     st.caption("Envía recordatorios para eventos que empiezan en ~24 horas. Se enviará 1 vez por reserva.")
     lookahead_h = st.number_input("Horas hacia adelante", min_value=1, max_value=72, value=24, step=1)
     now = datetime.now()
@@ -989,17 +1217,7 @@ with st.expander("🔔 Recordatorios 24 h"):
     end_win = now + timedelta(hours=lookahead_h + 2)
     st.write(f"Ventana objetivo: **{fmt_dt(start_win)}** → **{fmt_dt(end_win)}**")
 
-    df_up = pd.read_sql_query(
-        """
-        SELECT id, room, title, organizador, start_dt, end_dt, attendees, phone, status, reminder_24h_sent
-          FROM bookings
-         WHERE phone IS NOT NULL AND phone != ''
-           AND datetime(start_dt) BETWEEN datetime(?) AND datetime(?)
-           AND (status = 'Confirmado' OR status = 'Pendiente')
-        """,
-        conn,
-        params=(fmt_iso(start_win), fmt_iso(end_win)),
-    )
+    df_up = read_reminder_window(get_conn(), to_ts(start_win), to_ts(end_win))
 
     if df_up.empty:
         st.info("No hay reservas en la ventana de recordatorio.")
@@ -1029,30 +1247,30 @@ with st.expander("🔔 Recordatorios 24 h"):
         colA, colB = st.columns(2)
         with colA:
             if st.button("Enviar por Cloud API (si hay token)", type="primary", use_container_width=True):
-                ok_count, fail = 0, []
-                for _, r in df_up.iterrows():
-                    if int(r["reminder_24h_sent"] or 0) == 1:
-                        continue
-                    body = (
-                        f"🔔 Recordatorio: {r['title']} ({r['organizador']}) en {r['room']}\n"
-                        f"Inicio: {fmt_dt(pd.to_datetime(r['start_dt']).to_pydatetime())}\n"
-                        f"Personas: {int(r['attendees'] or 0)}\n"
-                        f"¡Te esperamos!"
-                    )
-                    try:
-                        send_whatsapp_cloud_reply(r["phone"], body)
-                        conn.execute(
-                            "UPDATE bookings SET reminder_24h_sent=1, reminder_24h_sent_at=? WHERE id=?",
-                            (fmt_iso(datetime.now()), int(r["id"])),
+                pending = df_up[df_up["reminder_24h_sent"].fillna(0).astype(int) != 1]
+                with transaction() as w:
+                    queued = 0
+                    for _, r in pending.iterrows():
+                        rem = w.execute(
+                            "SELECT id FROM reminders WHERE booking_id = ? AND offset_h = 24", (int(r["id"]),)
+                        ).fetchone()
+                        queued += enqueue_reminder(
+                            w,
+                            int(r["id"]),
+                            r["phone"],
+                            reminder_text(r["title"], r["organizador"], r["room"], r["start_dt"], r["attendees"]),
+                            reminder_id=rem[0] if rem else None,
+                            fallback_key=f"reminder24:{int(r['id'])}:{r['start_dt']}",
                         )
-                        conn.commit()
-                        ok_count += 1
-                    except Exception as e:
-                        fail.append((r["id"], str(e)))
-                st.success(f"Recordatorios enviados: {ok_count}")
-                if fail:
-                    st.warning("Fallidos: " + ", ".join([f"#{i}:{err[:40]}" for i, err in fail]))
-                st.rerun()
+                # Los envía el proceso de fondo (python -m utils.scheduler), no esta página
+                st.success(f"Recordatorios encolados: {queued}")
+                if not is_configured():
+                    st.info("Sin WHATSAPP_TOKEN quedan en cola; usa los enlaces wa.me.")
+            counts = outbox_counts(get_conn())
+            st.caption(
+                f"Cola de envíos — pendientes: {counts['pending'] + counts['sending']} · "
+                f"enviados: {counts['sent']} · fallidos: {counts['dead']}"
+            )
         with colB:
             st.markdown("**Enlaces manuales (wa.me) si no tienes token:**")
             for _, r in df_up.iterrows():
@@ -1067,6 +1285,9 @@ with st.expander("🔔 Recordatorios 24 h"):
                 wa = f"https://wa.me/{to_wa_me_number(r['phone'])}?{urlencode({'text': msg}, quote_via=quote_plus)}"
                 st.markdown(f"- #{r['id']} [{r['title']}]({wa})")
 
+
+reminders_section()
+
 # ======================= AYUDA =======================
 with st.expander("ℹ️ Ayuda"):
     st.markdown(
@@ -1077,6 +1298,34 @@ with st.expander("ℹ️ Ayuda"):
   Sin token, usa los enlaces `wa.me` generados para cada reserva.
 - **Flujo gratis:** el cliente inicia chat con `wa.me`. Luego puedes responder **gratis durante 24 h**.
 - **APP_BASE_URL:** actualmente `{APP_BASE_URL}`. Ajusta al desplegar.
+- **CONFIRM_BASE_URL:** enlaces Confirmar/Cancelar → `{CONFIRM_BASE_URL}` (con `python -m utils.confirm_server` no se abre la app completa).
 """)
 
+# ======================= PERFIL (PROFILE_RERUNS=1) =======================
+def profile_panel():
+    rec = finish_run()
+    if rec is None:
+        return
+    with st.sidebar.expander("⏱️ Perfil del rerun", expanded=False):
+        st.metric("Rerun", f"{rec['total_ms']:.0f} ms")
+        st.caption(
+            f"SQL: {rec['sql_count']} sentencias · {rec['sql_ms']:.0f} ms"
+            + (f" · {rec['sql_dropped']} sin detalle" if rec["sql_dropped"] else "")
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [{"Sección": "  " * s["depth"] + s["name"], "ms": s["ms"]} for s in rec["sections"]]
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+        st.markdown("**SQL más lento**")
+        st.dataframe(pd.DataFrame(slow_statements(rec)), use_container_width=True, hide_index=True)
+        hist = profile_recent(rec["session"])
+        if len(hist) > 1:
+            st.markdown("**Últimos reruns (incluye fragmentos)**")
+            st.dataframe(pd.DataFrame(hist[::-1]), use_container_width=True, hide_index=True)
+        st.caption("Detalle por rerun en profile.jsonl (DATA_DIR o PROFILE_LOG).")
+
 
+profile_panel()
@@ -0,0 +1,79 @@
+# tests/support.py
+# ------------------------------------------------------------
+# Entorno común de los tests; cada módulo lo importa ANTES que utils
+# - DATA_DIR temporal (la base, el archivo y el secreto viven ahí)
+# - Servidor local que imita la Cloud API de WhatsApp (WHATSAPP_API_BASE
+#   apunta a http.server en 127.0.0.1; no sale nada a internet)
+# Todos los módulos comparten la misma base: usar salas/fechas propias.
+# ------------------------------------------------------------
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de importar utils: DATA_DIR y API_BASE se leen al importarse
+DATA_DIR = os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="eventos-test-")
+
+FAIL_500 = "+17870000500"
+FAIL_400 = "+17870000400"
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, como la API real
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        srv = self.server
+        with srv.lock:
+            srv.requests.append((time.monotonic(), self.client_address, self.path, body["to"]))
+            srv.auth.add(self.headers.get("Authorization"))
+        if body["to"] == FAIL_500:
+            code, out = 500, {"error": {"message": "boom"}}
+        elif body["to"] == FAIL_400:
+            code, out = 400, {"error": {"message": "bad number"}}
+        else:
+            code, out = 200, {"messages": [{"id": "wamid.x"}]}
+        data = json.dumps(out).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandIn)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.auth = set()
+
+
+server = StandInServer()
+threading.Thread(target=server.serve_forever, daemon=True).start()
+os.environ["WHATSAPP_API_BASE"] = f"http://127.0.0.1:{server.server_address[1]}/v20.0"
+os.environ["WHATSAPP_PHONE_NUMBER_ID"] = "123"
+os.environ["WHATSAPP_TOKEN"] = "test-token"
+
+
+def iso(dt) -> str:
+    """Fecha/hora en el ISO que guarda la app (start_dt/end_dt)."""
+    return dt.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def add_room(name: str, capacity: int | None = 50, kind: str = "Salón"):
+    """Sala propia del test (el catálogo se relee solo al cambiar la DB)."""
+    from utils.db import transaction
+
+    with transaction() as w:
+        w.execute("INSERT OR REPLACE INTO rooms(room, type, capacity) VALUES (?, ?, ?)", (name, kind, capacity))
@@ -0,0 +1,79 @@
+# tests/test_archive.py
+# ------------------------------------------------------------
+# Archivo frío (utils/archive.py)
+# - archive_old mueve sólo lo que terminó antes del corte (mes completo)
+# - boundary/reaches: las lecturas suman el archivo sólo si el rango llega
+# - Lo archivado se sigue leyendo (get_booking, búsqueda, choques de reserve)
+#   y sale del índice en memoria
+# ------------------------------------------------------------
+import unittest
+from datetime import date, datetime, timedelta
+
+from support import add_room, iso
+
+from utils import archive
+from utils.bookings import get_booking, get_booking_index, reserve
+from utils.db import get_conn, to_ts, transaction
+from utils.search import search
+
+ROOM = "Sala Archivo"
+NOW = datetime(2003, 3, 15)    # corte a 12 meses: 2002-03-01
+
+
+def _insert(start, hours=2, title="Archivo"):
+    with transaction() as w:
+        return w.execute(
+            "INSERT INTO bookings(room, title, organizador, start_dt, end_dt, start_ts, end_ts, status) "
+            "VALUES (?, ?, 'Org', ?, ?, ?, ?, 'Confirmado')",
+            (ROOM, title, iso(start), iso(start + timedelta(hours=hours)), to_ts(start), to_ts(start + timedelta(hours=hours))),
+        ).lastrowid
+
+
+class ArchiveTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        add_room(ROOM)
+        cls.old = _insert(datetime(2002, 2, 28, 20), title="Aniversario Zafiro")   # termina 22:00 antes del corte
+        cls.edge = _insert(datetime(2002, 2, 28, 23), hours=3)                    # cruza el corte: se queda
+        cls.new = _insert(datetime(2002, 3, 1, 9))
+        get_booking_index()
+        cls.res = archive.archive_old(months=12, batch=1, now=NOW)
+
+    def test_cutoff(self):
+        self.assertEqual(archive.cutoff(12, NOW), datetime(2002, 3, 1))
+        self.assertEqual(archive.cutoff(3, datetime(2003, 1, 31)), datetime(2002, 10, 1))
+
+    def test_moves_only_finished_before_cutoff(self):
+        self.assertEqual(self.res["moved"], 1)
+        conn = get_conn()
+        hot = {i for (i,) in conn.execute("SELECT id FROM main.bookings WHERE room = ?", (ROOM,))}
+        cold = {i for (i,) in conn.execute("SELECT id FROM archive.bookings WHERE room = ?", (ROOM,))}
+        self.assertEqual((hot, cold), ({self.edge, self.new}, {self.old}))
+        self.assertEqual(archive.boundary(conn), to_ts(datetime(2002, 2, 28, 22)))
+        self.assertEqual(archive.archive_old(months=12, now=NOW)["moved"], 0)   # repetir no mueve nada
+
+    def test_reads_reach_archive_only_when_needed(self):
+        conn = get_conn()
+        self.assertTrue(archive.reaches(conn, None))
+        self.assertTrue(archive.reaches(conn, to_ts(datetime(2002, 2, 1))))
+        self.assertFalse(archive.reaches(conn, to_ts(datetime(2002, 3, 1))))
+        self.assertEqual(archive.source(conn, to_ts(datetime(2002, 3, 1))), "bookings")
+        b = get_booking(conn, self.old)
+        self.assertTrue(b["archived"])
+        self.assertEqual(b["title"], "Aniversario Zafiro")
+        self.assertFalse(get_booking(conn, self.new)["archived"])
+
+    def test_search_and_conflicts_see_archive(self):
+        conn = get_conn()
+        self.assertEqual(list(search(conn, "zafiro")["id"]), [self.old])
+        self.assertTrue(search(conn, "zafiro", date_from=date(2002, 3, 1)).empty)
+        self.assertNotIn(self.old, get_booking_index().conflicts(ROOM, to_ts(datetime(2002, 2, 28)), to_ts(datetime(2002, 3, 1))))
+        s = datetime(2002, 2, 28, 21)
+        res = reserve({"room": ROOM, "title": "x", "organizador": "y", "start_dt": iso(s),
+                       "end_dt": iso(s + timedelta(minutes=30)), "attendees": 0})
+        self.assertEqual((res.ok, res.reason), (False, "conflict"))
+        self.assertEqual([c["id"] for c in res.conflicts], [self.old])
+
+
+if __name__ == "__main__":
+    unittest.main()
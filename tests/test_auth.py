@@ -0,0 +1,54 @@
+# tests/test_auth.py
+# ------------------------------------------------------------
+# Usuarios y roles (utils/auth.py)
+# - Archivo de usuarios: rol validado contra ROLES al cargar
+# - Secciones de administración de la página sólo para admin
+# ------------------------------------------------------------
+import tempfile
+import unittest
+from pathlib import Path
+
+from support import DATA_DIR
+
+from utils import auth
+
+PAGE = str(Path(__file__).resolve().parents[1] / "pages" / "01_Reservas.py")
+
+
+class UserStoreTest(unittest.TestCase):
+    def test_unknown_role_is_ignored(self):
+        path = Path(tempfile.mkdtemp(dir=DATA_DIR)) / "users.txt"
+        h = auth.hash_password("pw", iterations=1000)
+        path.write_text(f"# comentario\nana:admin:{h}\nbeto:staff:{h}\ncarla::{h}\ndani:Admin:{h}\n")
+        store = auth.UserStore(path)
+        with self.assertLogs("eventosapp.auth", "WARNING"):
+            self.assertIsNone(store.get("dani"))
+        self.assertEqual({u.name: u.role for u in store.users.values()}, {"ana": "admin", "beto": "staff", "carla": "staff"})
+
+
+class PageRolesTest(unittest.TestCase):
+    def _page(self, role):
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(PAGE, default_timeout=60)
+        at.session_state["auth_ok"] = True
+        at.session_state["auth_user"] = role
+        at.session_state["auth_role"] = role
+        return at.run()
+
+    def _toggles(self, at):
+        return {t.key for t in at.toggle}
+
+    @unittest.skipUnless(auth.AUTH_ENABLED, "AUTH_ENABLED=0: todos son admin")
+    def test_admin_sections_hidden_for_staff(self):
+        staff = self._page("staff")
+        self.assertFalse(staff.exception)
+        self.assertNotIn("show_rooms_admin", self._toggles(staff))
+        self.assertNotIn("show_import", self._toggles(staff))
+        self.assertIn("show_availability", self._toggles(staff))
+        admin = self._page("admin")
+        self.assertTrue({"show_rooms_admin", "show_import"} <= self._toggles(admin))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_availability.py
+# ------------------------------------------------------------
+# Huecos libres (utils/availability.py)
+# - free_gaps: barrido de ocupación vs. ventanas de horario
+# - find_free_slots: reservas (canceladas también) y series bloquean,
+#   capacidad mínima, salas preferidas primero, limit
+# ------------------------------------------------------------
+import unittest
+from datetime import date, datetime, time, timedelta
+
+from support import add_room, iso
+
+from utils.availability import find_free_slots, free_gaps
+from utils.bookings import reserve, set_booking_status
+from utils.series import Recurrence, create_series
+
+SMALL = "Sala Huecos Chica"
+BIG = "Sala Huecos Grande"
+DAY = date(2036, 9, 10)
+
+
+def _at(h, m=0, day=DAY):
+    return datetime.combine(day, time(h, m))
+
+
+def _reserve(room, start, hours=1):
+    res = reserve({"room": room, "title": "Ocupada", "organizador": "Org", "start_dt": iso(start),
+                   "end_dt": iso(start + timedelta(hours=hours)), "attendees": 0})
+    assert res.ok, res.reason
+    return res.booking_id
+
+
+def _spans(slots):
+    return [(s.room, s.start.strftime("%H:%M"), s.end.strftime("%H:%M")) for s in slots]
+
+
+class FreeGapsTest(unittest.TestCase):
+    def test_sweep(self):
+        busy = [(10, 20), (15, 30), (40, 50), (90, 120)]
+        self.assertEqual(free_gaps(busy, [(0, 100)], 5), [(0, 10), (30, 40), (50, 90)])
+        self.assertEqual(free_gaps(busy, [(0, 100)], 15), [(50, 90)])
+        # Una reserva que cruza dos ventanas recorta ambas
+        self.assertEqual(free_gaps([(5, 25)], [(0, 10), (20, 30)], 1), [(0, 5), (25, 30)])
+        self.assertEqual(free_gaps([], [(0, 10), (20, 30)], 10), [(0, 10), (20, 30)])
+
+
+class FindFreeSlotsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        add_room(SMALL, capacity=10)
+        add_room(BIG, capacity=200)
+        _reserve(SMALL, _at(10), hours=2)
+        cancelled = _reserve(SMALL, _at(14))
+        set_booking_status(cancelled, "Cancelado")   # mismo criterio que reserve(): también bloquea
+        res = create_series({"room": BIG, "title": "Serie", "organizador": "Org", "start_dt": iso(_at(9)),
+                             "end_dt": iso(_at(11)), "attendees": 0}, Recurrence("daily", count=2))
+        assert res.ok, res.message
+
+    def _find(self, **kw):
+        kw.setdefault("rooms", [SMALL, BIG])
+        return find_free_slots(kw.pop("duration", 60), DAY, DAY, day_start=time(8), day_end=time(18), **kw)
+
+    def test_bookings_and_series_block(self):
+        self.assertEqual(_spans(self._find()), [
+            (SMALL, "08:00", "10:00"), (BIG, "08:00", "09:00"),
+            (BIG, "11:00", "18:00"), (SMALL, "12:00", "14:00"), (SMALL, "15:00", "18:00"),
+        ])
+        self.assertEqual(_spans(self._find(duration=150)), [(BIG, "11:00", "18:00"), (SMALL, "15:00", "18:00")])
+
+    def test_capacity_preferred_and_limit(self):
+        self.assertEqual({s.room for s in self._find(min_capacity=50)}, {BIG})
+        slots = self._find(preferred_rooms=[SMALL])
+        self.assertEqual([s.room for s in slots], [SMALL, SMALL, SMALL, BIG, BIG])
+        self.assertTrue(all(s.preferred for s in slots[:3]))
+        self.assertEqual(_spans(self._find(limit=2)), [(SMALL, "08:00", "10:00"), (BIG, "08:00", "09:00")])
+
+    def test_without_schedule_spans_midnight(self):
+        slots = find_free_slots(60, DAY, DAY + timedelta(days=1), rooms=[SMALL])
+        self.assertEqual((slots[-1].start, slots[-1].end), (_at(15), datetime.combine(DAY + timedelta(days=2), time())))
+
+    def test_invalid_and_past(self):
+        with self.assertRaises(ValueError):
+            find_free_slots(0, DAY, DAY)
+        self.assertEqual(find_free_slots(60, date(2001, 1, 1), date(2001, 1, 2), rooms=[SMALL]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_bulk_import.py
+# ------------------------------------------------------------
+# Importación masiva (utils/bulk_import.py)
+# - Filas válidas en un solo insert; informe por fila de lo rechazado
+# - confirm_token del archivo se ignora (repetido o ya existente no rompe nada)
+# - Cantidades negativas, teléfonos y choques se rechazan con motivo
+# ------------------------------------------------------------
+import unittest
+
+import pandas as pd
+
+from support import add_room
+
+from utils.bulk_import import import_bookings
+from utils.db import get_conn
+
+ROOM = "Sala Import"
+
+
+def _row(day, hour, **kw):
+    return {"room": ROOM, "title": f"Import {day}-{hour}", "organizador": "Org",
+            "start_dt": f"2033-05-{day:02d} {hour:02d}:00", "end_dt": f"2033-05-{day:02d} {hour + 1:02d}:00", **kw}
+
+
+class ImportTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        add_room(ROOM, capacity=40)
+
+    def _motivos(self, rep):
+        return dict(zip(rep.rejected["fila"], rep.rejected["motivo"]))
+
+    def test_tokens_from_file_are_ignored(self):
+        df = pd.DataFrame([
+            _row(1, 9, confirm_token="dup"),
+            _row(1, 11, confirm_token="dup"),
+            _row(1, 13, confirm_token="dup"),
+        ])
+        rep = import_bookings(df)
+        self.assertEqual((rep.inserted, len(rep.rejected)), (3, 0))
+        rep = import_bookings(pd.DataFrame([_row(2, 9, confirm_token="dup")]))   # ya existe en la DB
+        self.assertEqual(rep.inserted, 1)
+        (n,) = get_conn().execute(
+            "SELECT COUNT(*) FROM bookings WHERE room = ? AND confirm_token IS NOT NULL", (ROOM,)
+        ).fetchone()
+        self.assertEqual(n, 0)
+
+    def test_rejections_with_reason(self):
+        df = pd.DataFrame([
+            _row(3, 9, attendees=-1),
+            _row(3, 11, chair_qty="-5"),
+            _row(3, 13, table_qty=2, attendees=41),
+            _row(3, 15, phone="787 555 0100"),
+            _row(3, 17, phone="+1 (787) 555-0100"),
+            _row(3, 17),
+            {**_row(3, 20), "room": "Sala Que No Existe"},
+        ])
+        rep = import_bookings(df)
+        self.assertEqual(rep.inserted, 1)
+        motivos = self._motivos(rep)
+        self.assertIn("negativos", motivos[1])
+        self.assertIn("negativos", motivos[2])
+        self.assertTrue(motivos[3].startswith("Capacidad excedida: 41 > 40"))
+        self.assertIn("E.164", motivos[4])
+        self.assertEqual(motivos[6], "Choca con la fila 5 del archivo")
+        self.assertEqual(motivos[7], "Sala desconocida")
+        (phone,) = get_conn().execute(
+            "SELECT phone FROM bookings WHERE room = ? AND start_dt = '2033-05-03T17:00:00'", (ROOM,)
+        ).fetchone()
+        self.assertEqual(phone, "+17875550100")
+
+    def test_conflict_with_existing_and_dry_run(self):
+        self.assertEqual(import_bookings(pd.DataFrame([_row(4, 9)])).inserted, 1)
+        rep = import_bookings(pd.DataFrame([_row(4, 9), _row(4, 12)]), dry_run=True)
+        self.assertEqual((rep.inserted, rep.dry_run), (0, True))
+        self.assertTrue(self._motivos(rep)[1].startswith("Choca con la reserva #"))
+        (n,) = get_conn().execute(
+            "SELECT COUNT(*) FROM bookings WHERE room = ? AND start_dt LIKE '2033-05-04%'", (ROOM,)
+        ).fetchone()
+        self.assertEqual(n, 1)
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            import_bookings(pd.DataFrame([{"room": ROOM}]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# tests/test_db.py
+# ------------------------------------------------------------
+# utils/db.py: conexiones, versión de datos y esquema
+# - La base de los tests vive en el DATA_DIR temporal
+# - external_version()/get_room_catalog() no esperan al escritor
+# - to_ts coincide con strftime('%s') del backfill (también con offset)
+# - Migraciones: una base antigua (sin user_version ni columnas nuevas) llega
+#   al esquema actual con start_ts/end_ts rellenos, índice FTS y bookings_rev;
+#   repetir ensure_schema no cambia nada
+# ------------------------------------------------------------
+import sqlite3
+import tempfile
+import threading
+import unittest
+from contextlib import closing
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import support
+
+from utils.bookings import get_room_catalog
+from utils import bulk_import
+from utils.db import BACKFILL_CHUNK, DB_PATH, SCHEMA_VERSION, connect, ensure_schema, external_version, to_ts, transaction
+
+
+class VersionTest(unittest.TestCase):
+    def test_uses_temp_data_dir(self):
+        self.assertEqual(str(DB_PATH.parent), support.DATA_DIR)
+
+    def test_catalog_does_not_wait_for_writer(self):
+        held, release = threading.Event(), threading.Event()
+
+        def long_write():
+            with transaction() as w:
+                w.execute("INSERT INTO rooms(room, type, capacity) VALUES ('Sala Lenta', 'Salón', 10)")
+                held.set()
+                release.wait(10)
+
+        t = threading.Thread(target=long_write)
+        t.start()
+        try:
+            self.assertTrue(held.wait(5))
+            done = threading.Event()
+            out = {}
+
+            def render():
+                out["rooms"] = get_room_catalog().names()
+                out["version"] = external_version()
+                done.set()
+
+            threading.Thread(target=render, daemon=True).start()
+            self.assertTrue(done.wait(2), "get_room_catalog() esperó al BEGIN IMMEDIATE")
+            self.assertNotIn("Sala Lenta", out["rooms"])   # aún sin commit
+        finally:
+            release.set()
+            t.join()
+
+    def test_own_commit_changes_version(self):
+        before = external_version()
+        with transaction() as w:
+            w.execute("INSERT INTO rooms(room, type, capacity) VALUES ('Sala Versión', 'Salón', 10)")
+        self.assertNotEqual(external_version(), before)
+        self.assertIn("Sala Versión", get_room_catalog().names())
+
+
+class ToTsTest(unittest.TestCase):
+    VALUES = [
+        "2027-03-14 10:30:00",
+        "2027-03-14T10:30:00",
+        "2027-03-14T10:30",
+        "2027-03-14T10:30:00-04:00",
+        "2027-03-14T23:30:00+05:30",
+        "2027-03-14T10:30:00Z",
+        "1999-12-31T23:59:59+00:00",
+    ]
+
+    def test_matches_sql_backfill(self):
+        mem = sqlite3.connect(":memory:")
+        for v in self.VALUES:
+            (sql,) = mem.execute("SELECT CAST(strftime('%s', ?) AS INTEGER)", (v,)).fetchone()
+            self.assertEqual(to_ts(v), sql, v)
+
+    def test_aware_datetime_is_converted(self):
+        aware = datetime(2027, 3, 14, 10, 30, tzinfo=timezone(timedelta(hours=-4)))
+        self.assertEqual(to_ts(aware), to_ts(datetime(2027, 3, 14, 14, 30)))
+
+    def test_bulk_import_agrees(self):
+        col = pd.Series([v for v in self.VALUES if v.endswith("-04:00")] * 2)
+        got = bulk_import._to_epoch(bulk_import._parse_dt(col))
+        self.assertEqual(list(got), [to_ts(v) for v in col])
+
+
+class MigrationTest(unittest.TestCase):
+    def _old_db(self, n):
+        path = Path(tempfile.mkdtemp(dir=support.DATA_DIR)) / "bookings.db"
+        with closing(sqlite3.connect(path)) as old, old:
+            # Forma de la tabla antes del registro de migraciones (user_version = 0)
+            old.execute(
+                "CREATE TABLE bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, room TEXT NOT NULL, title TEXT NOT NULL, "
+                "organizador TEXT NOT NULL, start_dt TEXT NOT NULL, end_dt TEXT NOT NULL, notes TEXT, "
+                "chair_type TEXT, chair_qty INTEGER, table_type TEXT, table_qty INTEGER)"
+            )
+            old.executemany(
+                "INSERT INTO bookings(room, title, organizador, start_dt, end_dt, notes) VALUES (?, ?, 'Org', ?, ?, ?)",
+                [("Salón A", f"Evento {i}", f"2020-01-{i % 28 + 1:02d}T10:00:00",
+                  f"2020-01-{i % 28 + 1:02d}T12:00:00", "boda" if i == 3 else None) for i in range(n)],
+            )
+        return path
+
+    def test_old_db_reaches_current_schema(self):
+        n = BACKFILL_CHUNK + 5   # el backfill pasa por más de un tramo
+        path = self._old_db(n)
+        with closing(connect(path)) as conn:
+            conn.isolation_level = None
+            ensure_schema(conn)
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(bookings)")}
+            self.assertTrue({"status", "phone", "confirm_token", "start_ts", "end_ts"} <= cols)
+            rows = conn.execute("SELECT start_dt, end_dt, start_ts, end_ts, status FROM bookings").fetchall()
+            self.assertEqual(len(rows), n)
+            for s_dt, e_dt, s_ts, e_ts, status in rows[:50]:
+                self.assertEqual((s_ts, e_ts), (to_ts(s_dt), to_ts(e_dt)))
+                self.assertEqual(status, "Pendiente")
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM bookings WHERE start_ts IS NULL").fetchone()[0], 0)
+            (hit,) = conn.execute("SELECT rowid FROM bookings_fts WHERE bookings_fts MATCH 'boda'").fetchone()
+            self.assertEqual(hit, 4)
+            (rev,) = conn.execute("SELECT rev FROM bookings_rev").fetchone()
+            conn.execute("UPDATE bookings SET status = 'Cancelado' WHERE id = 1")
+            self.assertEqual(conn.execute("SELECT rev FROM bookings_rev").fetchone()[0], rev + 1)
+
+            schema = conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall()
+            ensure_schema(conn)   # ya al día: no toca nada
+            self.assertEqual(conn.execute("SELECT sql FROM sqlite_master ORDER BY name").fetchall(), schema)
+
+
+if __name__ == "__main__":
+    unittest.main()
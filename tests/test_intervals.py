@@ -0,0 +1,116 @@
+# tests/test_intervals.py
+# ------------------------------------------------------------
+# Índice de intervalos en memoria frente al camino SQL de referencia
+# - Paridad aleatoria con has_overlap_sql (canceladas incluidas, ignore_id)
+# - Recarga sólo cuando cambia bookings_rev (no por recordatorios/outbox)
+# - Escrituras propias: se aplican incrementalmente sin recargar
+# ------------------------------------------------------------
+import random
+import unittest
+from contextlib import closing
+from datetime import datetime, timedelta
+from unittest import mock
+
+from support import iso as _iso
+
+from utils import outbox
+from utils.bookings import get_booking_index, has_overlap, has_overlap_sql, list_overlaps, reserve
+from utils.db import connect, get_conn, to_ts
+from utils.intervals import BookingIndex
+
+ROOM = "Sala Paridad"
+DAY0 = datetime(2031, 3, 3, 8, 0)
+STATUSES = ("Pendiente", "Confirmado", "Cancelado")
+
+
+def _random_span(rng):
+    s = DAY0 + timedelta(minutes=15 * rng.randrange(0, 4 * 24 * 3))
+    return s, s + timedelta(minutes=15 * rng.randint(1, 16))
+
+
+def _other_process(sql_fn):
+    # Escritura "de otro proceso": conexión aparte, sin los helpers que sincronizan el índice
+    get_booking_index()
+    with closing(connect()) as c, c:
+        return sql_fn(c)
+
+
+def _insert_raw(w, room, s, e, status):
+    return w.execute(
+        "INSERT INTO bookings(room, title, organizador, start_dt, end_dt, start_ts, end_ts, status) "
+        "VALUES (?, 'x', 'y', ?, ?, ?, ?, ?)",
+        (room, _iso(s), _iso(e), to_ts(s), to_ts(e), status),
+    ).lastrowid
+
+
+class ParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(20310303)
+        cls.ids = _other_process(
+            lambda w: [_insert_raw(w, ROOM, *_random_span(rng), rng.choice(STATUSES)) for _ in range(300)]
+        )
+
+    def test_matches_sql(self):
+        rng = random.Random(7)
+        conn = get_conn()
+        for _ in range(1000):
+            s, e = _random_span(rng)
+            ignore = rng.choice([None, *rng.sample(self.ids, 3)])
+            want = has_overlap_sql(conn, ROOM, _iso(s), _iso(e), ignore_id=ignore)
+            self.assertEqual(has_overlap(conn, ROOM, _iso(s), _iso(e), ignore_id=ignore), want, (s, e, ignore))
+            ids = conn.execute(
+                "SELECT id FROM bookings WHERE room = ? AND start_ts < ? AND end_ts > ? AND id IS NOT ?",
+                (ROOM, to_ts(e), to_ts(s), ignore),
+            ).fetchall()
+            got = list_overlaps(conn, ROOM, _iso(s), _iso(e), ignore_id=ignore)
+            self.assertEqual(sorted(got), sorted(i for (i,) in ids))
+
+    def test_exclude_cancelled(self):
+        rng = random.Random(11)
+        idx = get_booking_index()
+        for _ in range(300):
+            s, e = _random_span(rng)
+            (n,) = get_conn().execute(
+                "SELECT COUNT(*) FROM bookings WHERE room = ? AND start_ts < ? AND end_ts > ? AND status != 'Cancelado'",
+                (ROOM, to_ts(e), to_ts(s)),
+            ).fetchone()
+            self.assertEqual(idx.has_conflict(ROOM, to_ts(s), to_ts(e), include_cancelled=False), n > 0)
+
+
+class SyncTest(unittest.TestCase):
+    room = "Sala Sync"
+
+    def test_external_write_reloads(self):
+        s = datetime(2031, 4, 1, 10)
+        bid = _other_process(lambda w: _insert_raw(w, self.room, s, s + timedelta(hours=1), "Pendiente"))
+        self.assertEqual(list_overlaps(None, self.room, _iso(s), _iso(s + timedelta(minutes=30))), [bid])
+        _other_process(lambda w: w.execute("UPDATE bookings SET status = 'Cancelado' WHERE id = ?", (bid,)))
+        idx = get_booking_index()
+        self.assertFalse(idx.has_conflict(self.room, to_ts(s), to_ts(s) + 60, include_cancelled=False))
+
+    def test_outbox_and_reminder_writes_do_not_reload(self):
+        get_booking_index()
+        with mock.patch.object(BookingIndex, "reload") as reload:
+            def write(w):
+                outbox.enqueue(w, "t:intervals", "status", "+17875550199", "hola")
+                w.execute("UPDATE outbox SET status = 'sent' WHERE idempotency_key = 't:intervals'")
+                w.execute("UPDATE bookings SET reminder_24h_sent = 1 WHERE room = ?", (ROOM,))
+            _other_process(write)
+            get_booking_index()
+            reload.assert_not_called()
+
+    def test_own_write_is_incremental(self):
+        get_booking_index()
+        s = datetime(2031, 4, 2, 10)
+        b = {"room": self.room, "title": "t", "organizador": "o", "start_dt": _iso(s),
+             "end_dt": _iso(s + timedelta(hours=1)), "attendees": 0}
+        with mock.patch.object(BookingIndex, "reload") as reload:
+            res = reserve(b)
+            self.assertTrue(res.ok, res.reason)
+            self.assertTrue(get_booking_index().has_conflict(self.room, to_ts(s), to_ts(s) + 60))
+            reload.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# tests/test_search.py
+# ------------------------------------------------------------
+# Búsqueda de texto (utils/search.py, índice FTS5 de bookings)
+# - Prefijos, sin tildes, varias palabras (AND)
+# - Teléfono completo y por sus últimos 10/7 dígitos
+# - Triggers: editar/borrar mantiene el índice al día
+# - Filtros de sala, estado y fechas
+# ------------------------------------------------------------
+import unittest
+from datetime import date, datetime, timedelta
+
+from support import add_room, iso
+
+from utils.bookings import delete_booking, reserve
+from utils.db import get_conn, transaction
+from utils.search import fts_query, search
+
+ROOM = "Sala Búsqueda"
+OTHER = "Sala Búsqueda Anexo"
+
+
+def _reserve(room, start, title, organizador="Org", phone="", notes=""):
+    res = reserve({"room": room, "title": title, "organizador": organizador, "start_dt": iso(start),
+                   "end_dt": iso(start + timedelta(hours=2)), "attendees": 0, "phone": phone, "notes": notes})
+    assert res.ok, res.reason
+    return res.booking_id
+
+
+def _ids(text, **kw):
+    return sorted(search(get_conn(), text, **kw)["id"])
+
+
+class SearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        add_room(ROOM)
+        add_room(OTHER)
+        s = datetime(2037, 5, 10, 10)
+        cls.a = _reserve(ROOM, s, "Reunión Quetzal", organizador="Íñigo Peñalver", phone="+17875551234")
+        cls.b = _reserve(OTHER, s, "Quetzal anual", notes="montaje temprano")
+        cls.c = _reserve(ROOM, s + timedelta(days=20), "Cena Quetzal", phone="+17875559876")
+
+    def test_query_building(self):
+        self.assertIsNone(fts_query("  ¿? "))
+        self.assertEqual(fts_query('boda "x'), '"boda"* "x"*')
+        self.assertTrue(search(get_conn(), "").empty)
+
+    def test_prefix_and_diacritics(self):
+        self.assertEqual(_ids("quetz"), sorted([self.a, self.b, self.c]))
+        self.assertEqual(_ids("reunion quetzal"), [self.a])
+        self.assertEqual(_ids("inigo penal"), [self.a])
+        self.assertEqual(_ids("montaje"), [self.b])   # notas
+
+    def test_phone_suffixes(self):
+        for q in ("+17875551234", "7875551234", "5551234"):
+            self.assertEqual(_ids(q), [self.a], q)
+        row = search(get_conn(), "5551234").iloc[0]
+        self.assertEqual(row["match"], "«+17875551234»")   # no muestra las variantes indexadas
+
+    def test_filters(self):
+        self.assertEqual(_ids("quetzal", room=ROOM), sorted([self.a, self.c]))
+        self.assertEqual(_ids("quetzal", date_from=date(2037, 5, 20)), [self.c])
+        self.assertEqual(_ids("quetzal", date_to=date(2037, 5, 10)), sorted([self.a, self.b]))
+        self.assertEqual(_ids("quetzal", status="Confirmado"), [])
+        self.assertEqual(len(search(get_conn(), "quetzal", limit=2)), 2)
+
+    def test_triggers_follow_edits(self):
+        bid = _reserve(OTHER, datetime(2037, 6, 1, 9), "Taller Colibrí", phone="+17875550001")
+        self.assertEqual(_ids("colibri"), [bid])
+        with transaction() as w:
+            w.execute("UPDATE bookings SET title = 'Taller Tucán', phone = '+17875550002' WHERE id = ?", (bid,))
+        self.assertEqual(_ids("colibri"), [])
+        self.assertEqual(_ids("5550001"), [])
+        self.assertEqual(_ids("tucan"), [bid])
+        self.assertEqual(_ids("5550002"), [bid])
+        delete_booking(bid)
+        self.assertEqual(_ids("tucan"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
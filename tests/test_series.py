@@ -0,0 +1,144 @@
+# tests/test_series.py
+# ------------------------------------------------------------
+# Series recurrentes (utils/series.py)
+# - Expansión diaria/semanal/mensual (count, until, rango, meses sin el día)
+# - Tope MAX_OCCURRENCES: con fecha final se rechaza, no se recorta
+# - detach_occurrence (una ocurrencia pasa a reserva suelta) y choques del barrido
+# - has_overlap/list_overlaps: ocurrencias incluidas; sin SQL de series
+#   en salas que no tienen ninguna
+# ------------------------------------------------------------
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from support import add_room, iso
+
+from utils import series
+from utils.bookings import get_booking, has_overlap, list_overlaps, reserve
+from utils.db import get_conn, to_ts
+from utils.series import MAX_OCCURRENCES, Recurrence, create_series, detach_occurrence, occurrence_starts
+
+
+def _booking(room, start, hours=1, **kw):
+    return {"room": room, "title": "Serie", "organizador": "Org", "start_dt": iso(start),
+            "end_dt": iso(start + timedelta(hours=hours)), "attendees": 0, **kw}
+
+
+def _days(rec, first, **kw):
+    return [t.date().isoformat() for t in occurrence_starts(rec, first, **kw)]
+
+
+class ExpansionTest(unittest.TestCase):
+    first = datetime(2030, 1, 31, 10)   # jueves, día 31
+
+    def test_daily(self):
+        self.assertEqual(_days(Recurrence("daily", every=2, count=3), self.first),
+                         ["2030-01-31", "2030-02-02", "2030-02-04"])
+        self.assertEqual(_days(Recurrence("daily", until=date(2030, 2, 2)), self.first),
+                         ["2030-01-31", "2030-02-01", "2030-02-02"])
+        # Salta directo al rango y count se cuenta desde el inicio
+        self.assertEqual(_days(Recurrence("daily", count=5), self.first, range_from=datetime(2030, 2, 3)),
+                         ["2030-02-03", "2030-02-04"])
+
+    def test_weekly(self):
+        rec = Recurrence("weekly", byweekday=(0, 3), count=4)   # lunes y jueves
+        self.assertEqual(_days(rec, self.first), ["2030-01-31", "2030-02-04", "2030-02-07", "2030-02-11"])
+        rec = Recurrence("weekly", every=2, until=date(2030, 3, 1))   # día del inicio, cada 2 semanas
+        self.assertEqual(_days(rec, self.first), ["2030-01-31", "2030-02-14", "2030-02-28"])
+        self.assertEqual(_days(Recurrence("weekly", byweekday=(0, 3), count=4), self.first,
+                               range_from=datetime(2030, 2, 5)), ["2030-02-07", "2030-02-11"])
+
+    def test_monthly_skips_short_months(self):
+        self.assertEqual(_days(Recurrence("monthly", count=4), self.first),
+                         ["2030-01-31", "2030-03-31", "2030-05-31", "2030-07-31"])
+        self.assertEqual(_days(Recurrence("monthly", every=3, until=date(2030, 12, 31)), datetime(2030, 1, 15)),
+                         ["2030-01-15", "2030-04-15", "2030-07-15", "2030-10-15"])
+
+    def test_validation(self):
+        self.assertIsNotNone(Recurrence("yearly", count=2).validate())
+        self.assertIsNotNone(Recurrence("daily").validate())
+        self.assertIsNotNone(Recurrence("daily", count=MAX_OCCURRENCES + 1).validate())
+        self.assertIsNone(Recurrence("daily", count=MAX_OCCURRENCES).validate())
+
+
+class CreateTest(unittest.TestCase):
+    room = "Sala Serie Alta"
+
+    @classmethod
+    def setUpClass(cls):
+        add_room(cls.room, capacity=20)
+
+    def test_until_beyond_max_is_rejected(self):
+        first = datetime(2040, 1, 1, 8)
+        rec = Recurrence("daily", until=(first + timedelta(days=MAX_OCCURRENCES + 5)).date())
+        res = create_series(_booking(self.room, first), rec)
+        self.assertFalse(res.ok)
+        self.assertEqual(res.reason, "invalid")
+        self.assertIn(str(MAX_OCCURRENCES), res.message)
+        rec = Recurrence("daily", until=(first + timedelta(days=MAX_OCCURRENCES - 1)).date())
+        res = create_series(_booking(self.room, first), rec)
+        self.assertTrue(res.ok, res.message)
+        self.assertEqual(res.occurrences, MAX_OCCURRENCES)
+
+    def test_sweep_reports_each_conflict(self):
+        first = datetime(2034, 6, 5, 9)   # lunes
+        a = reserve(_booking(self.room, first + timedelta(days=7, minutes=30)))
+        b = reserve(_booking(self.room, first + timedelta(days=21), hours=3))
+        self.assertTrue(a.ok and b.ok)
+        res = create_series(_booking(self.room, first), Recurrence("weekly", count=4))
+        self.assertEqual(res.reason, "conflict")
+        self.assertEqual(res.conflicts, [(first + timedelta(days=7), a.booking_id),
+                                         (first + timedelta(days=21), b.booking_id)])
+        self.assertEqual(create_series(_booking(self.room, first, attendees=21), Recurrence("daily", count=2)).reason,
+                         "capacity")
+
+    def test_detach_occurrence(self):
+        first = datetime(2035, 3, 1, 9)
+        res = create_series(_booking(self.room, first), Recurrence("daily", count=3))
+        self.assertTrue(res.ok, res.message)
+        moved = first + timedelta(days=1, hours=5)
+        out = detach_occurrence(res.series_id, "2035-03-02", _booking(self.room, moved, title="Suelta"))
+        self.assertTrue(out.ok, out.reason)
+        b = get_booking(get_conn(), out.booking_id)
+        self.assertEqual((b["title"], b["start_dt"]), ("Suelta", iso(moved)))
+        occ = series.busy(get_conn(), self.room, to_ts(first), to_ts(first + timedelta(days=3)))
+        self.assertEqual([o[2] for o in occ], [series.occurrence_id(res.series_id, d) for d in ("2035-03-01", "2035-03-03")])
+        # La hora original del día 2 queda libre; la nueva la ocupa la reserva suelta
+        s2 = first + timedelta(days=1)
+        self.assertFalse(has_overlap(None, self.room, iso(s2), iso(s2 + timedelta(hours=1))))
+        self.assertEqual(list_overlaps(None, self.room, iso(moved), iso(moved + timedelta(hours=1))), [out.booking_id])
+        # Una ocurrencia separada que chocaría no deja rastro (ni excepción ni reserva)
+        clash = detach_occurrence(res.series_id, "2035-03-03", _booking(self.room, moved))
+        self.assertEqual(clash.reason, "conflict")
+        self.assertEqual(get_conn().execute(
+            "SELECT COUNT(*) FROM series_exceptions WHERE series_id = ? AND occ_date = '2035-03-03'", (res.series_id,)
+        ).fetchone()[0], 0)
+        self.assertIsNone(detach_occurrence(10**9, "2035-03-03", _booking(self.room, moved)).booking_id)
+
+
+class OverlapTest(unittest.TestCase):
+    room = "Sala Serie Overlap"
+
+    def test_occurrence_counts_as_overlap(self):
+        first = datetime(2032, 1, 5, 9)
+        res = create_series(_booking(self.room, first), Recurrence("daily", count=5))
+        self.assertTrue(res.ok, res.reason)
+        s = first + timedelta(days=3, minutes=30)
+        self.assertTrue(has_overlap(None, self.room, iso(s), iso(s + timedelta(hours=1))))
+        self.assertEqual(
+            list_overlaps(None, self.room, iso(s), iso(s + timedelta(hours=1))),
+            [series.occurrence_id(res.series_id, date(2032, 1, 8).isoformat())],
+        )
+        self.assertFalse(has_overlap(None, self.room, iso(first + timedelta(days=5)), iso(first + timedelta(days=5, hours=1))))
+
+    def test_room_without_series_skips_series_query(self):
+        series.rooms_with_series()
+        with mock.patch.object(series, "busy") as busy:
+            s = datetime(2032, 2, 1, 9)
+            self.assertFalse(has_overlap(None, "Sala Sin Series", iso(s), iso(s + timedelta(hours=1))))
+            list_overlaps(None, "Sala Sin Series", iso(s), iso(s + timedelta(hours=1)))
+            busy.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
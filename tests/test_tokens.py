@@ -0,0 +1,104 @@
+# tests/test_tokens.py
+# ------------------------------------------------------------
+# Enlaces Confirmar/Cancelar (utils/tokens.py + bookings.update_status_by_token)
+# - Firma: ida y vuelta, acción, vencimiento, manipulación, longitud
+# - Enlaces heredados (UUID en confirm_token) y tokens falsos
+# - Aviso de estado por WhatsApp: uno por cambio, también al volver a un estado
+# ------------------------------------------------------------
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+
+from support import add_room, iso
+
+from utils import bookings, tokens
+from utils.db import get_conn, to_ts, transaction
+
+ROOM = "Sala Tokens"
+
+
+def _new_booking(start, phone="+17875550120"):
+    res = bookings.reserve({"room": ROOM, "title": "Evento", "organizador": "Org", "start_dt": iso(start),
+                            "end_dt": iso(start + timedelta(hours=2)), "attendees": 5, "phone": phone})
+    assert res.ok, res.reason
+    return res.booking_id, start + timedelta(hours=2)
+
+
+class SignTest(unittest.TestCase):
+    def test_round_trip(self):
+        exp = to_ts(datetime(2040, 1, 1))
+        tok = tokens.sign(4242, "confirm", exp)
+        self.assertEqual(len(tok), 27)
+        self.assertEqual(tokens.verify(tok, "confirm"), 4242)
+        self.assertIsNone(tokens.verify(tok, "cancel"))            # otra acción
+        self.assertIsNone(tokens.verify(tok, "confirm", now_ts=exp + 1))   # vencido
+        self.assertEqual(tokens.verify(tok, "confirm", now_ts=exp), 4242)
+
+    def test_tampered_or_malformed(self):
+        tok = tokens.sign(7, "cancel", datetime(2040, 1, 1))
+        flipped = tok[:5] + ("A" if tok[5] != "A" else "B") + tok[6:]
+        for bad in (flipped, tok[:-1], tok + "A", "", None, "!" * 27, str(uuid.uuid4())):
+            self.assertIsNone(tokens.verify(bad, "cancel"), bad)
+
+    def test_legacy_detection(self):
+        self.assertTrue(tokens.is_legacy(str(uuid.uuid4())))
+        self.assertFalse(tokens.is_legacy(tokens.sign(1, "confirm", datetime(2040, 1, 1))))
+        with mock.patch.object(tokens, "LEGACY_TOKENS", False):
+            self.assertFalse(tokens.is_legacy(str(uuid.uuid4())))
+
+
+class StatusLinkTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        add_room(ROOM)
+
+    def test_signed_link(self):
+        bid, end = _new_booking(datetime.now() + timedelta(days=40))
+        tok = tokens.sign(bid, "cancel", tokens.link_expiry(end))
+        self.assertEqual(bookings.check_status_token(tok, "Cancelado")[:2], (bid, "Pendiente"))
+        self.assertIsNone(bookings.check_status_token(tok, "Confirmado"))
+        self.assertEqual(bookings.update_status_by_token(tok, "Cancelado"), (True, "updated"))
+        self.assertEqual(bookings.get_booking(get_conn(), bid)["status"], "Cancelado")
+
+    def test_legacy_uuid_link(self):
+        bid, _end = _new_booking(datetime.now() + timedelta(days=41))
+        legacy = str(uuid.uuid4())
+        with transaction() as w:
+            w.execute("UPDATE bookings SET confirm_token = ? WHERE id = ?", (legacy, bid))
+        self.assertEqual(bookings.update_status_by_token(legacy, "Confirmado"), (True, "updated"))
+        self.assertEqual(bookings.update_status_by_token(legacy, "Confirmado"), (True, "already"))
+        self.assertEqual(bookings.update_status_by_token(str(uuid.uuid4()), "Confirmado"), (False, None))
+
+    def test_forged_token_never_writes(self):
+        with mock.patch.object(bookings, "index_transaction") as tx:
+            self.assertEqual(bookings.update_status_by_token("x" * 27, "Confirmado"), (False, None))
+            self.assertEqual(bookings.update_status_by_token("not-a-token", "Cancelado"), (False, None))
+            tx.assert_not_called()
+
+
+class StatusNoticeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        add_room(ROOM)
+
+    def test_notice_per_change(self):
+        bid, end = _new_booking(datetime.now() + timedelta(days=30))
+        exp = tokens.link_expiry(end)
+        confirm, cancel = tokens.sign(bid, "confirm", exp), tokens.sign(bid, "cancel", exp)
+        with mock.patch.object(bookings, "NOTIFY_STATUS_CHANGES", True):
+            self.assertEqual(bookings.update_status_by_token(confirm, "Confirmado"), (True, "updated"))
+            self.assertEqual(bookings.update_status_by_token(confirm, "Confirmado"), (True, "already"))
+            self.assertEqual(bookings.update_status_by_token(cancel, "Cancelado"), (True, "updated"))
+            self.assertEqual(bookings.update_status_by_token(confirm, "Confirmado"), (True, "updated"))
+        bodies = [b for (b,) in get_conn().execute(
+            "SELECT body FROM outbox WHERE booking_id = ? AND kind = 'status' ORDER BY id", (bid,)
+        )]
+        self.assertEqual(len(bodies), 3)
+        self.assertIn("confirmada", bodies[0])
+        self.assertIn("cancelada", bodies[1])
+        self.assertIn("confirmada", bodies[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+# tests/test_whatsapp.py
+# ------------------------------------------------------------
+# send_batch / outbox.drain contra un servidor local que imita la Cloud API
+# (servidor de tests/support.py; no sale nada a internet)
+# - Pool: las peticiones reutilizan conexiones keep-alive (≤ max_workers)
+# - Límite: rate_per_sec se respeta, también entre lotes seguidos
+# - Errores: HTTP >= 300 y credenciales faltantes quedan en la lista de fallos;
+#   en el outbox pasan a reintento con backoff y, agotados, a dead
+# - Recordatorio encolado de una reserva cancelada/reprogramada: no sale
+# Uso: python -m unittest discover tests   (o pytest)
+# ------------------------------------------------------------
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from support import FAIL_400, FAIL_500, add_room, iso, server as _server
+
+from utils import bookings, outbox, whatsapp
+from utils.db import get_conn, to_ts, transaction
+
+
+def _msgs(n, phone="+17875550100"):
+    return [(i, phone, f"hola {i}") for i in range(n)]
+
+
+class SendBatchTest(unittest.TestCase):
+    def setUp(self):
+        with _server.lock:
+            _server.requests.clear()
+
+    def test_pooled_connections(self):
+        ok, fail = whatsapp.send_batch(_msgs(40), max_workers=4, rate_per_sec=1000)
+        self.assertEqual(sorted(ok), list(range(40)))
+        self.assertEqual(fail, [])
+        self.assertEqual(len(_server.requests), 40)
+        self.assertEqual({r[2] for r in _server.requests}, {"/v20.0/123/messages"})
+        self.assertEqual(_server.auth, {"Bearer test-token"})
+        # Conexiones keep-alive de la sesión compartida: una por hilo como mucho
+        self.assertLessEqual(len({r[1] for r in _server.requests}), 4)
+
+    def test_rate_limit(self):
+        rate, n = 20, 30
+        t0 = time.monotonic()
+        ok, _fail = whatsapp.send_batch(_msgs(n), max_workers=8, rate_per_sec=rate)
+        elapsed = time.monotonic() - t0
+        self.assertEqual(len(ok), n)
+        # Ráfaga inicial = rate; el resto sale a `rate` por segundo
+        self.assertGreaterEqual(elapsed, (n - rate) / rate * 0.9)
+        stamps = sorted(r[0] for r in _server.requests)
+        window = max(sum(1 for t in stamps if s <= t < s + 1.0) for s in stamps)
+        self.assertLessEqual(window, 2 * rate)
+
+    def test_rate_shared_across_batches(self):
+        rate, n = 25, 30
+        t0 = time.monotonic()
+        for _ in range(2):
+            ok, _fail = whatsapp.send_batch(_msgs(n), max_workers=8, rate_per_sec=rate)
+            self.assertEqual(len(ok), n)
+        elapsed = time.monotonic() - t0
+        # Una sola ráfaga inicial para los dos lotes: 2n - rate mensajes a `rate` por segundo
+        self.assertGreaterEqual(elapsed, (2 * n - rate) / rate * 0.9)
+        self.assertIs(whatsapp.get_limiter(rate), whatsapp.get_limiter(rate))
+
+    def test_error_mapping(self):
+        msgs = [("a", "+17875550101", "x"), ("b", FAIL_500, "x"), ("c", FAIL_400, "x"), ("d", "+1 787 555 0102", "x")]
+        ok, fail = whatsapp.send_batch(msgs, max_workers=2, rate_per_sec=1000)
+        self.assertEqual(sorted(ok), ["a", "d"])
+        errors = dict(fail)
+        self.assertEqual(sorted(errors), ["b", "c"])
+        self.assertIn("Cloud API error 500", errors["b"])
+        self.assertIn("Cloud API error 400", errors["c"])
+        self.assertIn("+17875550102", {r[3] for r in _server.requests})   # espacios quitados
+
+    def test_missing_credentials_is_a_failure(self):
+        with mock.patch.dict(os.environ, {"WHATSAPP_TOKEN": ""}):
+            ok, fail = whatsapp.send_batch(_msgs(2), rate_per_sec=1000)
+        self.assertEqual(ok, [])
+        self.assertEqual(len(fail), 2)
+        self.assertIn("WHATSAPP_TOKEN", fail[0][1])
+        self.assertEqual(_server.requests, [])
+
+
+class OutboxRetryTest(unittest.TestCase):
+    def setUp(self):
+        # La base es compartida: lo que encolaron otros módulos no cuenta en estos drenajes
+        with transaction() as w:
+            w.execute("UPDATE outbox SET status = 'sent' WHERE status IN ('pending', 'sending')")
+
+    def _status(self, key):
+        return get_conn().execute(
+            "SELECT status, attempts, last_error, next_attempt_at FROM outbox WHERE idempotency_key = ?", (key,)
+        ).fetchone()
+
+    def test_retry_then_dead(self):
+        with transaction() as w:
+            outbox.enqueue(w, "t:ok", "status", "+17875550103", "ok")
+            outbox.enqueue(w, "t:fail", "status", FAIL_500, "falla")
+        with mock.patch.object(outbox, "MAX_ATTEMPTS", 2):
+            res = outbox.drain()
+            self.assertEqual(res, {"sent": 1, "retry": 1, "dead": 0, "skipped": 0})
+            self.assertEqual(self._status("t:ok")[:2], ("sent", 1))
+            status, attempts, error, next_at = self._status("t:fail")
+            self.assertEqual((status, attempts), ("pending", 1))
+            self.assertIn("Cloud API error 500", error)
+            self.assertGreaterEqual(next_at, to_ts(datetime.now()) + outbox.BACKOFF_BASE_S - 1)   # con backoff
+            self.assertEqual(outbox.drain(), {"sent": 0, "retry": 0, "dead": 0, "skipped": 0})
+
+            with transaction() as w:
+                w.execute("UPDATE outbox SET next_attempt_at = 0 WHERE idempotency_key = 't:fail'")
+            self.assertEqual(outbox.drain(), {"sent": 0, "retry": 0, "dead": 1, "skipped": 0})
+        self.assertEqual(self._status("t:fail")[:2], ("dead", 2))
+
+    def test_lease_covers_worst_case_batch(self):
+        n = outbox.OUTBOX_BATCH
+        worst = -(-n // whatsapp.MAX_WORKERS) * whatsapp.TIMEOUT_S + n / whatsapp.RATE_PER_SEC
+        self.assertGreater(outbox.lease_s(n), worst)
+        with transaction() as w:
+            outbox.enqueue(w, "t:lease", "status", "+17875550104", "ok")
+        seen = {}
+
+        def fake_send(messages):
+            seen["n"] = len(messages)
+            seen["row"] = self._status("t:lease")
+            return [m[0] for m in messages], []
+
+        t0 = to_ts(datetime.now())
+        with mock.patch.object(whatsapp, "send_batch", fake_send):
+            outbox.drain()
+        status, _attempts, _error, lease_until = seen["row"]
+        self.assertEqual(status, "sending")
+        self.assertGreaterEqual(lease_until, t0 + outbox.lease_s(seen["n"]))
+
+
+class StaleReminderTest(unittest.TestCase):
+    room = "Sala Recordatorios"
+
+    @classmethod
+    def setUpClass(cls):
+        add_room(cls.room)
+
+    def setUp(self):
+        with transaction() as w:
+            w.execute("UPDATE outbox SET status = 'sent' WHERE status IN ('pending', 'sending')")
+            _server.requests.clear()
+
+    def _queue(self, day):
+        start = datetime.now().replace(microsecond=0) + timedelta(days=day)
+        res = bookings.reserve({"room": self.room, "title": "R", "organizador": "O", "start_dt": iso(start),
+                                "end_dt": iso(start + timedelta(hours=1)), "attendees": 1, "phone": "+17875550130"})
+        self.assertTrue(res.ok, res.reason)
+        with transaction() as w:
+            (rid,) = w.execute("SELECT id FROM reminders WHERE booking_id = ? AND offset_h = 24", (res.booking_id,)).fetchone()
+            outbox.enqueue_reminder(w, res.booking_id, "+17875550130", "hola", reminder_id=rid)
+        return res.booking_id, rid, start
+
+    def _reminder_status(self, rid):
+        row = get_conn().execute("SELECT status FROM reminders WHERE id = ?", (rid,)).fetchone()
+        return row[0] if row else None
+
+    def test_cancelled_and_moved_are_skipped(self):
+        cancelled, rid_c, _ = self._queue(30)
+        moved, rid_m, start = self._queue(31)
+        kept, rid_k, _ = self._queue(32)
+        bookings.set_booking_status(cancelled, "Cancelado")
+        b = bookings.get_booking(get_conn(), moved)
+        new_start = start + timedelta(hours=3)
+        bookings.update_booking(moved, b["room"], b["title"], b["organizador"], iso(new_start),
+                                iso(new_start + timedelta(hours=1)), None, 1, b["phone"], b["status"],
+                                None, None, 0, None, 0)
+        self.assertEqual(outbox.drain(), {"sent": 1, "retry": 0, "dead": 0, "skipped": 2})
+        self.assertEqual(len(_server.requests), 1)
+        self.assertEqual(self._reminder_status(rid_c), "skipped")
+        self.assertIsNone(self._reminder_status(rid_m))   # reschedule la borró (hay una nueva pendiente)
+        self.assertEqual(self._reminder_status(rid_k), "sent")
+        st = dict(get_conn().execute(
+            "SELECT ref_id, status FROM outbox WHERE ref_id IN (?, ?, ?)", (rid_c, rid_m, rid_k)
+        ).fetchall())
+        self.assertEqual(st, {rid_c: "skipped", rid_m: "skipped", rid_k: "sent"})
+
+
+if __name__ == "__main__":
+    unittest.main()
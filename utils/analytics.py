@@ -0,0 +1,126 @@
+# utils/analytics.py
+# ------------------------------------------------------------
+# Ocupación y uso de salas (sección "Ocupación" de Reservas)
+# - Lee los agregados por (sala, hora) de utils/occupancy.py: nunca el historial
+# - Suma al vuelo las ocurrencias de series del rango (son virtuales)
+# - Todo sobre matrices NumPy densas sala × hora del rango:
+#     utilización por hora de la semana, por día y por mes (horario de apertura),
+#     carga de personas frente a rooms.capacity, demanda de sillas y mesas
+# ------------------------------------------------------------
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+
+from utils import series
+from utils.bookings import get_room_catalog
+from utils.db import get_conn, to_ts
+from utils.occupancy import HOUR, explode
+from utils.reminders import ACTIVE_STATUSES
+
+# Horas de apertura para utilización diaria/mensual: "8-22" = de 08:00 a 22:00
+OPEN_HOURS = tuple(int(x) for x in os.getenv("ANALYTICS_OPEN_HOURS", "8-22").split("-"))
+WEEKDAYS = series.WEEKDAYS
+
+
+@dataclass
+class Occupancy:
+    rooms: pd.DataFrame          # resumen por sala
+    hour_of_week: pd.DataFrame   # sala, día, hora, utilización %
+    by_day: pd.DataFrame         # índice fecha, columna por sala (utilización %)
+    by_month: pd.DataFrame       # índice mes, columna por sala (utilización %)
+    demand: pd.DataFrame         # índice fecha: picos y horas de sillas/mesas
+
+
+def _matrices(conn, names: list, h0: int, n_hours: int) -> np.ndarray:
+    """Matriz (4, salas, horas): segundos ocupados, personas·s, sillas·s, mesas·s."""
+    code = {r: i for i, r in enumerate(names)}
+    out = np.zeros((4, len(names), n_hours), dtype=np.int64)
+    rows = conn.execute(
+        "SELECT room, hour, busy_s, people_s, chairs_s, tables_s FROM occupancy_hourly WHERE hour >= ? AND hour < ?",
+        (h0, h0 + n_hours),
+    ).fetchall()
+    occ = series.load_rows(conn, h0 * HOUR, (h0 + n_hours) * HOUR, statuses=ACTIVE_STATUSES)
+    if occ:
+        room, hour, *vals = explode(*zip(*occ))
+        inside = (hour >= h0) & (hour < h0 + n_hours)
+        rows += list(zip(room[inside], hour[inside], *(v[inside] for v in vals)))
+    rows = [r for r in rows if r[0] in code]
+    if not rows:
+        return out
+    room, hour, *vals = zip(*rows)
+    r_idx = np.fromiter((code[r] for r in room), dtype=np.int64, count=len(room))
+    h_idx = np.asarray(hour, dtype=np.int64) - h0
+    for k, v in enumerate(vals):
+        np.add.at(out[k], (r_idx, h_idx), np.asarray(v, dtype=np.int64))
+    return out
+
+
+def occupancy(date_from: date, date_to: date, rooms=None, open_hours=OPEN_HOURS) -> Occupancy:
+    """Ocupación entre date_from y date_to (inclusive) de `rooms` (todas si None)."""
+    catalog = get_room_catalog()
+    names = list(rooms or catalog.names())
+    day0 = to_ts(datetime.combine(date_from, time())) // HOUR
+    n_days = max((date_to - date_from).days + 1, 0)
+    m = _matrices(get_conn(), names, day0, n_days * 24)
+    busy, people, chairs, tables = (x.reshape(len(names), n_days, 24) for x in m)
+    # Horas solapadas (datos heredados) no cuentan doble para la utilización
+    used = np.minimum(busy, HOUR)
+
+    days = pd.date_range(date_from, periods=n_days, freq="D")
+    a, b = open_hours
+    open_s = max(b - a, 1) * HOUR
+    day_used = used[:, :, a:b].sum(axis=2)
+    by_day = pd.DataFrame((day_used / open_s * 100).T, index=days.date, columns=names)
+    month = days.to_period("M")
+    by_month = pd.DataFrame(day_used.T, index=month).groupby(level=0).sum()
+    open_days = pd.Series(1, index=month).groupby(level=0).sum().to_numpy()
+    by_month = by_month.div(open_days * open_s / 100, axis=0)
+    by_month.index = by_month.index.astype(str)
+    by_month.columns = names
+
+    # Hora de la semana: promedio sobre los días del rango que caen en cada día de la semana
+    wd = days.weekday.to_numpy()
+    how = np.zeros((len(names), 7, 24))
+    for k in range(7):
+        sel = wd == k
+        if sel.any():
+            how[:, k, :] = used[:, sel, :].sum(axis=1) / (sel.sum() * HOUR) * 100
+    r_i, d_i, h_i = np.indices(how.shape)
+    hour_of_week = pd.DataFrame({
+        "room": np.asarray(names, dtype=object)[r_i.ravel()],
+        "dia": np.asarray(WEEKDAYS, dtype=object)[d_i.ravel()],
+        "hora": h_i.ravel(),
+        "uso": how.ravel(),
+    })
+
+    cap = np.array([catalog.capacity(r) or 0 for r in names], dtype=float)
+    busy_tot = busy.sum(axis=(1, 2))
+    people_tot = people.sum(axis=(1, 2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_people = np.where(busy_tot > 0, people_tot / busy_tot, 0.0)
+        peak_people = (people / HOUR).max(axis=(1, 2), initial=0)
+        load = np.where(cap > 0, avg_people / cap * 100, np.nan)
+    summary = pd.DataFrame({
+        "room": names,
+        "capacity": pd.array([catalog.capacity(r) for r in names], dtype="Int64"),
+        "horas": busy_tot / HOUR,
+        "uso": day_used.sum(axis=1) / max(n_days * open_s, 1) * 100,
+        "personas_media": avg_people,
+        "personas_pico": peak_people,
+        "carga": load,
+    })
+
+    # Demanda de sillas/mesas: promedio en uso por hora, sumado entre salas
+    chairs_h = chairs.sum(axis=0) / HOUR
+    tables_h = tables.sum(axis=0) / HOUR
+    demand = pd.DataFrame({
+        "sillas_pico": chairs_h.max(axis=1, initial=0),
+        "mesas_pico": tables_h.max(axis=1, initial=0),
+        "sillas_horas": chairs_h.sum(axis=1),
+        "mesas_horas": tables_h.sum(axis=1),
+    }, index=days.date)
+    return Occupancy(summary, hour_of_week, by_day, by_month, demand)
+
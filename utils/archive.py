@@ -0,0 +1,239 @@
+# utils/archive.py
+# ------------------------------------------------------------
+# Archivo frío de reservas terminadas: <DATA_DIR>/bookings_archive.db
+# - Cada conexión de utils.db lo adjunta como "archive" (mismas columnas que bookings,
+#   sus propios índices e índice FTS; esquema sincronizado por su user_version)
+# - archive_old(): mueve por lotes lo que terminó hace más de ARCHIVE_AFTER_MONTHS meses
+#     1) copia el lote al archivo   2) lo borra del caliente
+#   En transacciones separadas: con WAL un commit que toca dos archivos no es atómico
+#   entre ellos. Así una fila puede estar un instante en ambos (las lecturas del archivo
+#   excluyen los ids que siguen en el caliente), pero nunca en ninguno.
+# - Lecturas: source()/schemas() suman el archivo sólo si el rango pedido llega a lo
+#   archivado (archive_meta.max_end_ts, en la misma transacción que la copia); lo
+#   reciente no lo toca
+# - Los agregados de ocupación se quedan en el caliente: analytics no lee el archivo
+# - Tras mover: optimize del FTS, incremental_vacuum del caliente por transacciones cortas
+#   y checkpoint del WAL. Los DB nuevos nacen con auto_vacuum=INCREMENTAL; uno anterior se
+#   pasa una vez con --enable-incremental-vacuum (VACUUM completo, en mantenimiento)
+# Uso: python -m utils.archive [--months 12]   (el scheduler lo corre cada ARCHIVE_EVERY_H)
+# ------------------------------------------------------------
+import argparse
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+ARCHIVE_NAME = "bookings_archive.db"
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))   # 0 = no archivar
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "2000"))
+VACUUM_PAGES = 2000   # páginas liberadas por transacción de incremental_vacuum
+
+log = logging.getLogger("eventosapp.archive")
+_columns = None
+
+
+def archive_path(db_path) -> Path:
+    """El archivo frío vive junto al DB caliente (DATA_DIR en la app)."""
+    return Path(db_path).with_name(ARCHIVE_NAME)
+
+
+def attach(conn: sqlite3.Connection, db_path):
+    conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path(db_path)),))
+    conn.execute("PRAGMA archive.synchronous = NORMAL")
+
+
+def archive_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA archive.user_version").fetchone()[0]
+
+
+def ensure_archive_schema(conn: sqlite3.Connection):
+    """Crea archive.bookings con las columnas actuales de bookings (o añade las que falten)."""
+    hot = [(r[1], r[2]) for r in conn.execute("PRAGMA main.table_info(bookings)")]
+    have = {r[1] for r in conn.execute("PRAGMA archive.table_info(bookings)")}
+    if not have:
+        # Sin DEFAULT/NOT NULL: el archivo sólo recibe filas ya completas del caliente
+        decl = ", ".join("id INTEGER PRIMARY KEY" if name == "id" else f"{name} {typ}" for name, typ in hot)
+        conn.execute(f"CREATE TABLE archive.bookings ({decl})")
+    else:
+        for name, typ in hot:
+            if name not in have:
+                conn.execute(f"ALTER TABLE archive.bookings ADD COLUMN {name} {typ}")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_bookings_room_span ON bookings(room, start_ts, end_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_bookings_start ON bookings(start_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_bookings_status_start ON bookings(status, start_ts)")
+    # Sin índice por end_ts: el planificador lo preferiría para "end_ts >= desde", que en el
+    # archivo casi no filtra; el límite de lo archivado se guarda aparte
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS archive.archive_meta (id INTEGER PRIMARY KEY CHECK (id = 1), max_end_ts INTEGER)"
+    )
+
+
+# ======================= LECTURA =======================
+
+def columns(conn) -> list:
+    """Columnas de bookings (en el orden del caliente; el archivo tiene las mismas)."""
+    global _columns
+    if _columns is None:
+        _columns = [r[1] for r in conn.execute("PRAGMA main.table_info(bookings)")]
+    return _columns
+
+
+def boundary(conn) -> int | None:
+    """Mayor end_ts archivado (None si el archivo está vacío)."""
+    row = conn.execute("SELECT max_end_ts FROM archive.archive_meta").fetchone()
+    return row[0] if row else None
+
+
+def reaches(conn, ts_from=None) -> bool:
+    """¿Un rango que empieza en ts_from (None = sin límite) puede tener filas archivadas?"""
+    b = boundary(conn)
+    return b is not None and (ts_from is None or ts_from < b)
+
+
+def not_hot(alias: str) -> str:
+    # Condición para filas del archivo: excluye las que siguen en el caliente (lote a medio mover)
+    return f"NOT EXISTS (SELECT 1 FROM main.bookings m WHERE m.id = {alias}.id)"
+
+
+def schemas(conn, ts_from=None) -> list:
+    """["main"] o ["main", "archive"] según si el rango llega al archivo."""
+    return ["main", "archive"] if reaches(conn, ts_from) else ["main"]
+
+
+def source(conn, ts_from=None) -> str:
+    """FROM para consultas por rango: `bookings` o la unión con el archivo.
+
+    Los WHERE sobre la unión se empujan a cada lado (usan sus índices); para
+    ORDER BY ... LIMIT conviene una subconsulta por esquema (ver schemas())."""
+    if not reaches(conn, ts_from):
+        return "bookings"
+    cols = ", ".join(columns(conn))
+    return (
+        f"(SELECT {cols} FROM main.bookings UNION ALL "
+        f"SELECT {cols} FROM archive.bookings a WHERE {not_hot('a')})"
+    )
+
+
+# ======================= MOVER AL ARCHIVO =======================
+
+def cutoff(months: int, now: datetime | None = None) -> datetime:
+    """Primer día del mes de hace `months` meses: se archiva lo que terminó antes."""
+    now = now or datetime.now()
+    y, m = divmod(now.year * 12 + now.month - 1 - months, 12)
+    return datetime(y, m + 1, 1)
+
+
+def archive_old(months: int = ARCHIVE_AFTER_MONTHS, batch: int = ARCHIVE_BATCH, now: datetime | None = None) -> dict:
+    """Mueve al archivo, por lotes, las reservas terminadas antes de cutoff(months)."""
+    from utils.db import to_ts, transaction   # tarde: utils.db importa este módulo
+
+    limit = cutoff(months, now)
+    limit_ts = to_ts(limit)
+    moved = 0
+    while True:
+        with transaction() as w:
+            rows = w.execute(
+                "SELECT id, end_ts FROM main.bookings WHERE start_ts < ? AND end_ts < ? ORDER BY start_ts LIMIT ?",
+                (limit_ts, limit_ts, batch),
+            ).fetchall()
+            ids = [r[0] for r in rows]
+            if ids:
+                cols = ", ".join(columns(w))
+                marks = ",".join("?" * len(ids))
+                # 1) Copia: sólo escribe en el archivo (se saltan las que quedaron de una corrida cortada)
+                w.execute(
+                    f"INSERT INTO archive.bookings({cols}) SELECT {cols} FROM main.bookings "
+                    f"WHERE id IN ({marks}) AND id NOT IN (SELECT id FROM archive.bookings)",
+                    ids,
+                )
+                w.execute(
+                    "INSERT INTO archive.archive_meta(id, max_end_ts) VALUES (1, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET max_end_ts = MAX(max_end_ts, excluded.max_end_ts)",
+                    (max(r[1] for r in rows),),
+                )
+        if not ids:
+            break
+        with transaction() as w:
+            # 2) Borrado del caliente, sólo de lo que ya está en el archivo.
+            # El aporte a occupancy_hourly se conserva: sólo se olvida lo aplicado por reserva.
+            w.execute(
+                f"DELETE FROM main.bookings WHERE id IN ({marks}) AND id IN (SELECT id FROM archive.bookings)", ids
+            )
+            w.execute(f"DELETE FROM occupancy_applied WHERE booking_id IN ({marks})", ids)
+            w.execute(f"DELETE FROM reminders WHERE booking_id IN ({marks})", ids)
+        moved += len(ids)
+        log.info("Archivadas %s reservas (total %s)", len(ids), moved)
+    freed = 0
+    if moved:
+        with transaction() as w:
+            w.execute("INSERT INTO main.bookings_fts(bookings_fts) VALUES ('optimize')")
+        freed = vacuum_hot()
+    return {"moved": moved, "cutoff": limit.isoformat(), "freed_pages": freed}
+
+
+def vacuum_hot(pages: int = VACUUM_PAGES) -> int:
+    """Devuelve al sistema las páginas libres del DB caliente (con auto_vacuum=INCREMENTAL). Páginas liberadas."""
+    from utils.db import connect, transaction
+
+    with transaction() as w:
+        mode = w.execute("PRAGMA main.auto_vacuum").fetchone()[0]
+        free = left = w.execute("PRAGMA main.freelist_count").fetchone()[0]
+    if mode != 2:
+        # Sin INCREMENTAL las páginas libres se reutilizan pero no se devuelven; pasar a
+        # INCREMENTAL reescribe el archivo (VACUUM): es un comando aparte, no del job
+        if free:
+            log.info("%s páginas libres; para devolverlas: python -m utils.archive --enable-incremental-vacuum", free)
+        free = left = 0
+    while left > 0:
+        # Por transacciones cortas: entre una y otra pueden escribir los demás
+        with transaction() as w:
+            w.execute(f"PRAGMA main.incremental_vacuum({int(pages)})").fetchall()
+            now = w.execute("PRAGMA main.freelist_count").fetchone()[0]
+        if now >= left:
+            break   # no avanza (otro escritor reutiliza las páginas)
+        left = now
+    # El WAL creció con el movimiento: se recorta (si hay lectores activos queda para después)
+    conn = connect()
+    try:
+        for schema in ("main", "archive"):
+            conn.execute(f"PRAGMA {schema}.wal_checkpoint(TRUNCATE)").fetchall()
+    finally:
+        conn.close()
+    return free - left
+
+
+def enable_incremental_vacuum() -> bool:
+    """Pasa el DB caliente a auto_vacuum=INCREMENTAL (una vez; los DB nuevos ya nacen así).
+
+    Reescribe todo el archivo con VACUUM: correrlo en una ventana de mantenimiento. Los
+    escritores de este proceso esperan; los de otros procesos reciben "database is locked"
+    tras busy_timeout, o este comando falla sin haber cambiado nada."""
+    from utils.db import exclusive
+
+    with exclusive() as conn:
+        if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM main")
+    return True
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    ap = argparse.ArgumentParser(description="Mueve reservas terminadas al archivo frío")
+    ap.add_argument("--months", type=int, default=ARCHIVE_AFTER_MONTHS, help="antigüedad mínima (meses)")
+    ap.add_argument("--batch", type=int, default=ARCHIVE_BATCH)
+    ap.add_argument("--enable-incremental-vacuum", action="store_true",
+                    help="sólo pasar el DB caliente a auto_vacuum=INCREMENTAL (VACUUM completo, una vez)")
+    args = ap.parse_args(argv)
+    if args.enable_incremental_vacuum:
+        log.info("auto_vacuum=INCREMENTAL: %s", "aplicado" if enable_incremental_vacuum() else "ya estaba")
+        return
+    if args.months <= 0:
+        ap.error("--months debe ser > 0")
+    log.info("Archivo: %s", archive_old(args.months, args.batch))
+
+
+if __name__ == "__main__":
+    main()
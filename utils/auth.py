@@ -1,8 +1,23 @@
 # utils/auth.py
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import logging
 import os
-import streamlit as st
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
 
+import streamlit as st
+
+from utils.db import DATA_DIR
+
 
 ROOT = Path(__file__).resolve().parents[1] if Path(__file__).parent.name in ("pages","utils") else Path(__file__).resolve().parent
 LOGO = ROOT / "img" / "logo.png"   # tu archivo está en /img/logo.png
@@ -13,6 +28,21 @@ LOGO = ROOT / "img" / "logo.png"   # tu archivo está en /img/logo.png
 # ON/OFF global
 AUTH_ENABLED = os.getenv("AUTH_ENABLED", "1") == "1"
 
+# --- Archivo de usuarios (RECOMENDADO; tiene prioridad si existe y tiene usuarios) ---
+# DATA_DIR/users.txt (o APP_USERS_FILE), una línea por usuario:
+#   usuario:rol:pbkdf2_sha256$iteraciones$sal$hash
+# Se edita en caliente (se relee al cambiar su mtime) con:
+#   python -m utils.auth set <usuario> [--role admin|staff]   /   del <usuario>   /   list
+USERS_FILE = Path(os.getenv("APP_USERS_FILE", DATA_DIR / "users.txt"))
+ROLES = ("admin", "staff")
+PBKDF2_ITERATIONS = int(os.getenv("AUTH_PBKDF2_ITERATIONS", "310000"))   # sólo para hashes nuevos
+VERIFY_CACHE_MAX = 512        # verificaciones correctas recordadas (sin guardar la contraseña)
+LOCKOUT_MAX = int(os.getenv("AUTH_LOCKOUT_MAX", "5"))             # fallos seguidos por usuario
+LOCKOUT_S = int(os.getenv("AUTH_LOCKOUT_MIN", "15")) * 60
+LOCKOUT_TRACK_MAX = 10000     # usuarios con contador (también los que no existen)
+
+log = logging.getLogger("eventosapp.auth")
+
 # --- Modo legacy (1 usuario) ---
 LOGIN_USER = os.getenv("APP_LOGIN_USER", "admin")
 LOGIN_PASS = os.getenv("APP_LOGIN_PASS", "1234")
@@ -23,7 +53,7 @@ LOGIN_PASS = os.getenv("APP_LOGIN_PASS", "1234")
 LOGIN_USERS = {u.strip() for u in os.getenv("APP_LOGIN_USERS", "").split(",") if u.strip()}
 LOGIN_PASSWORD = os.getenv("APP_LOGIN_PASSWORD", "")
 
-# --- Modo multi-usuario con credenciales dedicadas (RECOMENDADO) ---
+# --- Modo multi-usuario con credenciales dedicadas ---
 # APP_LOGIN_CREDENTIALS="admin:1234,miguel:s3cr3t,joan:abcd"
 LOGIN_CREDENTIALS = os.getenv("APP_LOGIN_CREDENTIALS", "")
 
@@ -40,20 +70,208 @@ def _parse_credentials_map(raw: str) -> dict:
             creds[u] = p
     return creds
 
-def _check(user: str, pwd: str) -> bool:
-    """Prioridad: mapa credenciales > lista + pass compartida > legacy 1 usuario."""
+# Se parsea una vez: el entorno no cambia sin reiniciar el proceso
+CREDENTIALS_MAP = _parse_credentials_map(LOGIN_CREDENTIALS)
+
+
+def _same(a: str, b: str) -> bool:
+    # Comparación en tiempo constante (no filtra cuántos caracteres coinciden)
+    return hmac.compare_digest(a.encode(), b.encode())
+
+
+# ======================= HASHES =======================
+
+def hash_password(pwd: str, iterations: int = PBKDF2_ITERATIONS) -> str:
+    salt = secrets.token_bytes(16)
+    dk = hashlib.pbkdf2_hmac("sha256", pwd.encode(), salt, iterations)
+    b64 = lambda b: base64.b64encode(b).decode()
+    return f"pbkdf2_sha256${iterations}${b64(salt)}${b64(dk)}"
+
+
+def _verify_hash(pwd: str, encoded: str) -> bool:
+    try:
+        algo, iterations, salt, dk = encoded.split("$")
+        if algo != "pbkdf2_sha256":
+            return False
+        got = hashlib.pbkdf2_hmac("sha256", pwd.encode(), base64.b64decode(salt), int(iterations))
+        return hmac.compare_digest(got, base64.b64decode(dk))
+    except ValueError:
+        return False
+
+
+# ======================= ARCHIVO DE USUARIOS =======================
+
+@dataclass(frozen=True)
+class User:
+    name: str
+    role: str
+    pw_hash: str
+
+
+class UserStore:
+    """Índice en memoria del archivo de usuarios; se relee sólo si cambió su mtime/tamaño."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.users = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> dict:
+        try:
+            st_ = self.path.stat()
+            stamp = (st_.st_mtime_ns, st_.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self.users = self._parse() if stamp else {}
+                    self._stamp = stamp
+        return self.users
+
+    def _parse(self) -> dict:
+        users = {}
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split(":", 2)
+            if len(parts) == 3 and parts[0].strip() and parts[2].strip():
+                name, role = parts[0].strip(), parts[1].strip() or "staff"
+                if role not in ROLES:
+                    # Un rol mal escrito no entra (ni como staff ni como admin)
+                    log.warning("%s: rol desconocido %r para %s; usuario ignorado", self.path, role, name)
+                    continue
+                users[name] = User(name, role, parts[2].strip())
+        return users
+
+    def get(self, name: str) -> User | None:
+        return self._current().get(name)
+
+    def active(self) -> bool:
+        return bool(self._current())
+
+    # --- Escritura (CLI): reemplazo atómico, conserva comentarios y el orden ---
+    def save(self, user: User | None, name: str):
+        lines = self.path.read_text(encoding="utf-8").splitlines() if self.path.exists() else []
+        out, done = [], False
+        for line in lines:
+            if not line.strip().startswith("#") and line.split(":", 1)[0].strip() == name:
+                if user and not done:
+                    out.append(f"{user.name}:{user.role}:{user.pw_hash}")
+                done = True
+                continue
+            out.append(line)
+        if user and not done:
+            out.append(f"{user.name}:{user.role}:{user.pw_hash}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp, self.path)
+
+
+_store = UserStore(USERS_FILE)
+
+
+# ======================= CACHÉ DE VERIFICACIÓN + BLOQUEO =======================
+# La caché guarda HMAC(secreto del proceso, usuario+contraseña) -> hash vigente del usuario:
+# no guarda contraseñas y se invalida sola si el hash del archivo cambia.
+
+_cache_key = secrets.token_bytes(32)
+_verified = OrderedDict()
+_failures = OrderedDict()     # usuario -> (fallos seguidos, bloqueado hasta)
+_state_lock = threading.Lock()
+
+
+def _fingerprint(user: str, pwd: str) -> bytes:
+    return hmac.new(_cache_key, f"{user}\0{pwd}".encode(), hashlib.sha256).digest()
+
+
+def _verify_user(u: User, pwd: str) -> bool:
+    fp = _fingerprint(u.name, pwd)
+    with _state_lock:
+        if _verified.get(fp) == u.pw_hash:
+            _verified.move_to_end(fp)
+            return True
+    if not _verify_hash(pwd, u.pw_hash):
+        return False
+    with _state_lock:
+        _verified[fp] = u.pw_hash
+        while len(_verified) > VERIFY_CACHE_MAX:
+            _verified.popitem(last=False)
+    return True
+
+
+def locked_for(user: str) -> int:
+    """Segundos que le quedan de bloqueo al usuario (0 si puede intentar)."""
+    with _state_lock:
+        _fails, until = _failures.get(user, (0, 0.0))
+    return max(int(until - time.monotonic()), 0)
+
+
+def _record(user: str, ok: bool):
+    with _state_lock:
+        if ok:
+            _failures.pop(user, None)
+            return
+        fails, _until = _failures.pop(user, (0, 0.0))
+        fails += 1
+        _failures[user] = (fails, time.monotonic() + LOCKOUT_S if fails >= LOCKOUT_MAX else 0.0)
+        while len(_failures) > LOCKOUT_TRACK_MAX:
+            _failures.popitem(last=False)
+
+
+# ======================= VERIFICACIÓN =======================
+
+def _check(user: str, pwd: str) -> str | None:
+    """Rol si las credenciales son válidas, None si no.
+
+    Prioridad: archivo de usuarios > mapa credenciales > lista + pass compartida > legacy 1 usuario.
+    Los modos por variables de entorno no tienen roles: entran como admin (como antes)."""
+    if not user or not pwd:
+        return None
+    # 0) Archivo de usuarios (hashes con sal + rol)
+    if _store.active():
+        u = _store.get(user)
+        return u.role if u and _verify_user(u, pwd) else None
     # 1) Mapa usuario:contraseña
-    if LOGIN_CREDENTIALS.strip():
-        creds = _parse_credentials_map(LOGIN_CREDENTIALS)
-        return user in creds and pwd == creds[user]
+    if CREDENTIALS_MAP:
+        return "admin" if user in CREDENTIALS_MAP and _same(pwd, CREDENTIALS_MAP[user]) else None
     # 2) Lista de usuarios + password compartida
     if LOGIN_USERS:
-        return (user in LOGIN_USERS) and (LOGIN_PASSWORD and pwd == LOGIN_PASSWORD)
+        return "admin" if user in LOGIN_USERS and LOGIN_PASSWORD and _same(pwd, LOGIN_PASSWORD) else None
     # 3) Legacy single user
     if LOGIN_USER and LOGIN_PASS:
-        return (user == LOGIN_USER) and (pwd == LOGIN_PASS)
+        return "admin" if _same(user, LOGIN_USER) and _same(pwd, LOGIN_PASS) else None
     # 4) Nada configurado
-    return False
+    return None
+
+
+def login(user: str, pwd: str) -> tuple[str | None, int]:
+    """(rol o None, segundos de bloqueo). Cuenta fallos por usuario; bloqueado no verifica."""
+    user = (user or "").strip()
+    wait = locked_for(user)
+    if wait:
+        return None, wait
+    role = _check(user, pwd)
+    _record(user, role is not None)
+    return role, locked_for(user)
+
+
+def current_role() -> str | None:
+    """Rol de la sesión ("admin" si la autenticación está desactivada)."""
+    if not AUTH_ENABLED:
+        return "admin"
+    return st.session_state.get("auth_role") if st.session_state.get("auth_ok") else None
+
+
+def is_admin() -> bool:
+    """Secciones de administración (salas, importación): sólo el rol admin."""
+    return current_role() == "admin"
+
 
 def gate() -> bool:
     if not AUTH_ENABLED:
@@ -61,9 +279,9 @@ def gate() -> bool:
 
     if st.session_state.get("auth_ok"):
         with st.sidebar:
-            st.success(f"Sesión: {st.session_state.get('auth_user','')}")
+            st.success(f"Sesión: {st.session_state.get('auth_user','')} ({st.session_state.get('auth_role','')})")
             if st.button("Cerrar sesión", use_container_width=True, key="logout_btn"):
-                for k in ("auth_ok", "auth_user", "login_user", "login_pass"):
+                for k in ("auth_ok", "auth_user", "auth_role", "login_user", "login_pass"):
                     st.session_state.pop(k, None)
                 st.rerun()
         return True
@@ -75,11 +293,55 @@ def gate() -> bool:
     u = st.text_input("Usuario", key="login_user")
     p = st.text_input("Contraseña", type="password", key="login_pass")
     if st.button("Entrar", type="primary"):
-        if _check(u, p):
+        role, wait = login(u, p)
+        if role:
             st.session_state["auth_ok"] = True
-            st.session_state["auth_user"] = u
+            st.session_state["auth_user"] = u.strip()
+            st.session_state["auth_role"] = role
             st.success("Autenticación correcta.")
             st.rerun()
+        elif wait:
+            st.error(f"Demasiados intentos fallidos. Prueba de nuevo en {wait // 60 + 1} min.")
         else:
             st.error("Credenciales inválidas o no configuradas.")
     return False
+
+
+# ======================= CLI =======================
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=f"Usuarios de la app ({USERS_FILE})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_set = sub.add_parser("set", help="crear usuario o cambiar su contraseña/rol")
+    p_set.add_argument("user")
+    p_set.add_argument("--role", choices=ROLES, help="por defecto: el actual, o staff si es nuevo")
+    p_del = sub.add_parser("del", help="borrar usuario")
+    p_del.add_argument("user")
+    sub.add_parser("list", help="usuarios y roles")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "list":
+        for u in _store._current().values():
+            print(f"{u.name}\t{u.role}")
+        return 0
+    if ":" in args.user or not args.user.strip():
+        ap.error("usuario inválido")
+    if args.cmd == "del":
+        if not _store.get(args.user):
+            print(f"No existe: {args.user}", file=sys.stderr)
+            return 1
+        _store.save(None, args.user)
+        return 0
+    existing = _store.get(args.user)
+    role = args.role or (existing.role if existing else "staff")
+    pwd = getpass.getpass("Contraseña: ")
+    if not pwd or pwd != getpass.getpass("Repite la contraseña: "):
+        print("Las contraseñas no coinciden (o están vacías).", file=sys.stderr)
+        return 1
+    _store.save(User(args.user, role, hash_password(pwd)), args.user)
+    print(f"{'Actualizado' if existing else 'Creado'}: {args.user} ({role})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# utils/availability.py
+# ------------------------------------------------------------
+# Búsqueda de huecos libres en todas las salas
+# - Ocupación desde el índice de intervalos en memoria + ocurrencias de series
+# - Por sala, UN barrido que mezcla reservas ordenadas y ventanas de horario
+# - Mismo criterio de choque que reserve(): las canceladas también bloquean
+# - Ranking: salas preferidas, inicio más temprano, capacidad más ajustada
+# ------------------------------------------------------------
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from utils import series
+from utils.bookings import get_booking_index, get_room_catalog
+from utils.db import EPOCH, get_conn, to_ts
+
+DAY_S = 86400
+
+
+@dataclass
+class FreeSlot:
+    room: str
+    start: datetime          # primer inicio posible
+    end: datetime            # fin del hueco (cabe cualquier inicio hasta end - duración)
+    capacity: int | None
+    preferred: bool = False
+
+    @property
+    def hours(self) -> float:
+        return (self.end - self.start).total_seconds() / 3600
+
+
+def _windows(ts_from: int, ts_to: int, day_start: time | None, day_end: time | None):
+    """Ventanas [a, b) permitidas dentro del rango, una por día si hay horario."""
+    if day_start is None and day_end is None:
+        yield ts_from, ts_to
+        return
+    a_off = (day_start.hour * 3600 + day_start.minute * 60) if day_start else 0
+    b_off = (day_end.hour * 3600 + day_end.minute * 60) if day_end else DAY_S
+    day = ts_from - ts_from % DAY_S
+    while day < ts_to:
+        a, b = max(day + a_off, ts_from), min(day + b_off, ts_to)
+        if a < b:
+            yield a, b
+        day += DAY_S
+
+
+def free_gaps(busy, windows, min_len: int) -> list:
+    """Huecos [a, b) de al menos min_len dentro de las ventanas; busy y windows ordenados por inicio."""
+    out = []
+    i, n = 0, len(busy)
+    for w_a, w_b in windows:
+        cur = w_a
+        # Las reservas que terminan antes de la ventana no vuelven a mirarse
+        while i < n and busy[i][1] <= cur:
+            i += 1
+        j = i
+        while j < n and busy[j][0] < w_b:
+            s, e = busy[j]
+            if s - cur >= min_len:
+                out.append((cur, s))
+            if e > cur:
+                cur = e
+            j += 1
+        if w_b - cur >= min_len:
+            out.append((cur, w_b))
+    return out
+
+
+def find_free_slots(
+    duration_min: int,
+    date_from: date,
+    date_to: date,
+    min_capacity: int = 0,
+    day_start: time | None = None,
+    day_end: time | None = None,
+    preferred_rooms=None,
+    rooms=None,
+    limit: int | None = None,
+) -> list[FreeSlot]:
+    """Huecos libres de al menos `duration_min` minutos entre date_from y date_to (inclusive).
+
+    Sólo salas con capacidad >= min_capacity (sin capacidad definida = sin límite).
+    Todos los huecos salvo que se pida `limit` (los primeros según el ranking)."""
+    min_len = int(duration_min) * 60
+    if min_len <= 0:
+        raise ValueError("La duración debe ser mayor que 0.")
+    ts_from = to_ts(datetime.combine(date_from, time()))
+    ts_to = to_ts(datetime.combine(date_to, time())) + DAY_S
+    now_ts = to_ts(datetime.now())
+    ts_from = max(ts_from, now_ts - now_ts % 60)   # no proponer huecos en el pasado
+    if ts_from >= ts_to:
+        return []
+    windows = list(_windows(ts_from, ts_to, day_start, day_end))
+    preferred = set(preferred_rooms or ())
+
+    catalog = get_room_catalog()
+    idx = get_booking_index()
+    conn = get_conn()
+    with_series = series.rooms_with_series()
+    slots = []
+    for room in rooms or catalog.names():
+        cap = catalog.capacity(room)
+        if min_capacity and cap is not None and cap < min_capacity:
+            continue
+        busy = idx.busy(room, ts_from, ts_to)
+        occ = series.busy(conn, room, ts_from, ts_to) if room in with_series else []
+        if occ:
+            busy = sorted(busy + [(s, e) for s, e, _id in occ])
+        for a, b in free_gaps(busy, windows, min_len):
+            slots.append(
+                FreeSlot(
+                    room,
+                    EPOCH + timedelta(seconds=a),
+                    EPOCH + timedelta(seconds=b),
+                    cap,
+                    room in preferred,
+                )
+            )
+    slots.sort(key=lambda s: (not s.preferred, s.start, s.capacity if s.capacity is not None else float("inf"), s.room))
+    return slots[:limit] if limit else slots
@@ -0,0 +1,598 @@
+# utils/bookings.py
+# ------------------------------------------------------------
+# Acceso a datos de reservas y salas
+# - Salas servidas desde un catálogo en memoria (tabla rooms)
+# - Lecturas con la conexión del hilo (utils.db.get_conn)
+# - Escrituras en utils.db.transaction() + sincronización del índice en memoria
+# - reserve(): validación de capacidad + choque + escritura en una sola transacción
+# ------------------------------------------------------------
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, time
+
+import pandas as pd
+
+from utils import archive, occupancy, outbox, reminders, series, tokens
+from utils.db import external_version, get_conn, to_ts, transaction
+from utils.intervals import BookingIndex
+from utils.search import fts_query
+
+# Aviso por WhatsApp al cliente cuando confirma/cancela con su enlace (vía outbox)
+NOTIFY_STATUS_CHANGES = os.getenv("NOTIFY_STATUS_CHANGES", "0") == "1"
+
+
+# ======================= SALAS (catálogo en memoria) =======================
+# La tabla rooms es la única fuente de salas: añadir una sala es un cambio de datos.
+
+class RoomCatalog:
+    """Salas en orden de alta (rowid) con tipo y capacidad; se recarga sólo si cambió la DB."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rooms = {}             # room -> (type, capacity)
+        self.synced_version = None   # PRAGMA data_version del último reload
+
+    def reload(self, conn):
+        rows = conn.execute("SELECT room, type, capacity FROM rooms ORDER BY rowid").fetchall()
+        with self._lock:
+            self._rooms = {r: (t, int(c) if c is not None else None) for r, t, c in rows}
+
+    def names(self) -> list:
+        return list(self._rooms)
+
+    def capacity(self, room: str) -> int | None:
+        return self._rooms.get(room, (None, None))[1]
+
+    def frame(self) -> pd.DataFrame:
+        rooms = self._rooms
+        return pd.DataFrame(
+            {
+                "room": list(rooms),
+                "type": [t for t, _c in rooms.values()],
+                "capacity": pd.array([c for _t, c in rooms.values()], dtype="Int64"),
+            }
+        )
+
+
+_rooms = RoomCatalog()
+
+
+def get_room_catalog() -> RoomCatalog:
+    # Tabla pequeña: se relee con cualquier commit (la versión se lee sin el lock de escritura)
+    cat = _rooms
+    ext = external_version()
+    if cat.synced_version != ext:
+        cat.reload(get_conn())
+        cat.synced_version = ext
+    return cat
+
+
+def get_room_capacity(conn, room: str) -> int | None:
+    return get_room_catalog().capacity(room)
+
+
+def read_rooms(conn) -> pd.DataFrame:
+    return get_room_catalog().frame()
+
+
+def _room_row(row) -> tuple:
+    tipo = row["type"] if pd.notna(row["type"]) and str(row["type"]).strip() else None
+    cap = int(row["capacity"]) if pd.notna(row["capacity"]) else None
+    return tipo, cap
+
+
+def save_rooms(df_rooms: pd.DataFrame) -> dict:
+    """Guarda sólo las filas que cambiaron respecto al catálogo (un executemany por tipo de cambio).
+
+    Filas nuevas = salas nuevas; las salas quitadas se borran sólo si no tienen reservas.
+    Devuelve {'updated', 'added', 'deleted', 'kept'} (kept = salas con reservas que no se borraron)."""
+    current = get_room_catalog()._rooms
+    wanted = {}
+    for row in df_rooms.to_dict("records"):
+        name = str(row.get("room") or "").strip()
+        if name:
+            wanted[name] = _room_row(row)
+    updates = [(t, c, r) for r, (t, c) in wanted.items() if r in current and current[r] != (t, c)]
+    inserts = [(r, t, c) for r, (t, c) in wanted.items() if r not in current]
+    removed = [r for r in current if r not in wanted]
+    kept = []
+    with transaction() as w:
+        if removed:
+            marks = ",".join("?" * len(removed))
+            kept = [r for (r,) in w.execute(f"SELECT DISTINCT room FROM bookings WHERE room IN ({marks})", removed)]
+        w.executemany("UPDATE rooms SET type = ?, capacity = ? WHERE room = ?", updates)
+        w.executemany("INSERT INTO rooms(room, type, capacity) VALUES (?,?,?)", inserts)
+        w.executemany("DELETE FROM rooms WHERE room = ?", [(r,) for r in removed if r not in kept])
+    if updates or inserts or len(removed) > len(kept):
+        _rooms.reload(get_conn())
+    return {"updated": len(updates), "added": len(inserts), "deleted": len(removed) - len(kept), "kept": kept}
+
+
+def read_bookings(conn, room_filter=None, date_from=None, date_to=None, include_series=True):
+    """Reservas del rango + (por defecto) ocurrencias de series expandidas sólo para ese rango.
+
+    Lee también el archivo frío si el rango llega a lo archivado."""
+    ts_from = to_ts(datetime.combine(date_from, time())) if date_from else None
+    q = (
+        "SELECT id, room, title, organizador, start_dt, end_dt, color, "
+        "attendees, phone, status, confirm_token, reminder_24h_sent, reminder_24h_sent_at, "
+        "notes, chair_type, chair_qty, table_type, table_qty "
+        f"FROM {archive.source(conn, ts_from)}"
+    )
+    conds, params = [], []
+    if room_filter:
+        conds.append("room = ?"); params.append(room_filter)
+    if ts_from is not None:
+        conds.append("end_ts >= ?"); params.append(ts_from)
+    if date_to:
+        conds.append("start_ts <= ?"); params.append(to_ts(datetime.combine(date_to, time(23, 59, 59))))
+    if conds:
+        q += " WHERE " + " AND ".join(conds)
+    q += " ORDER BY start_ts"
+    df = pd.read_sql_query(q, conn, params=params)
+    df["series_id"] = None
+    if include_series:
+        occ = series.read_occurrences(conn, room_filter, date_from, date_to)
+        if not occ.empty:
+            df = pd.concat([df.astype({"id": object}), occ[[*df.columns]]], ignore_index=True)
+            key = pd.to_datetime(df["start_dt"], format="ISO8601")
+            df = df.iloc[key.argsort(kind="stable")].reset_index(drop=True)
+    return df
+
+
+LIST_COLUMNS = [
+    "id", "room", "title", "organizador", "start", "end", "attendees", "phone",
+    "chair_type", "chair_qty", "table_type", "table_qty", "status", "color", "notes",
+    "confirm_token", "reminder_24h_sent", "reminder_24h_sent_at",
+]
+# Orden de la lista -> columnas de la clave keyset (+ id); cada una tiene índice que la cubre
+LIST_SORTS = {
+    "start": ("start_ts",),
+    "room": ("room", "start_ts"),
+    "status": ("status", "start_ts"),
+    "id": (),
+}
+LIST_PAGE_SIZE = 50
+_BOOKING_COLS = (
+    "id, room, title, organizador, start_dt, end_dt, start_ts, end_ts, color, attendees, phone, status, "
+    "confirm_token, reminder_24h_sent, reminder_24h_sent_at, notes, chair_type, chair_qty, table_type, table_qty"
+)
+
+
+def list_view(df: pd.DataFrame) -> pd.DataFrame:
+    """Filas de la lista de reservaciones con inicio/fin legibles."""
+    return df.assign(
+        start=lambda x: pd.to_datetime(x["start_dt"], format="ISO8601").dt.strftime("%Y-%m-%d %I:%M %p"),
+        end=lambda x: pd.to_datetime(x["end_dt"], format="ISO8601").dt.strftime("%Y-%m-%d %I:%M %p"),
+    )[LIST_COLUMNS]
+
+
+def list_page(
+    conn,
+    sort="start",
+    desc=False,
+    after=None,
+    limit=LIST_PAGE_SIZE,
+    room=None,
+    status=None,
+    date_from=None,
+    date_to=None,
+    text=None,
+) -> tuple[pd.DataFrame, tuple | None]:
+    """Una página de reservas por keyset: (filas de la lista, cursor de la siguiente o None).
+
+    `after` es el cursor devuelto por la página anterior; filtros y orden se resuelven en SQL.
+    Sin fecha "Desde" (o si llega a lo archivado) también pagina el archivo frío."""
+    keys = [*LIST_SORTS[sort], "id"]
+    conds, params = [], []
+    if room:
+        conds.append("room = ?"); params.append(room)
+    if status:
+        conds.append("status = ?"); params.append(status)
+    ts_from = to_ts(datetime.combine(date_from, time())) if date_from else None
+    if ts_from is not None:
+        conds.append("end_ts >= ?"); params.append(ts_from)
+    if date_to:
+        conds.append("start_ts <= ?"); params.append(to_ts(datetime.combine(date_to, time(23, 59, 59))))
+    if after is not None:
+        conds.append(f"({', '.join(keys)}) {'<' if desc else '>'} ({', '.join('?' * len(keys))})")
+        params += list(after)
+    order = " ORDER BY " + ", ".join(f"{k} {'DESC' if desc else 'ASC'}" for k in keys) + " LIMIT ?"
+    match = fts_query(text)
+    # Una subconsulta ordenada por esquema (caliente y, si el rango llega, archivo) y se mezclan
+    arms, arm_params = [], []
+    for schema in archive.schemas(conn, ts_from):
+        where = list(conds)
+        if match:
+            where.append(f"id IN (SELECT rowid FROM {schema}.bookings_fts WHERE bookings_fts MATCH ?)")
+        if schema == "archive":
+            where.append(archive.not_hot("b"))
+        q = f"SELECT {_BOOKING_COLS} FROM {schema}.bookings b"
+        if where:
+            q += " WHERE " + " AND ".join(where)
+        arms.append(f"SELECT * FROM ({q}{order})")
+        arm_params += [*params, *([match] if match else []), limit + 1]
+    df = pd.read_sql_query(" UNION ALL ".join(arms) + order, conn, params=[*arm_params, limit + 1])
+    nxt = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        nxt = next(df[keys].iloc[-1:].itertuples(index=False, name=None))
+    return list_view(df), nxt
+
+
+def get_booking(conn, booking_id) -> dict | None:
+    """Reserva por id (búsqueda por clave primaria). Si está archivada: archived=True (sólo lectura)."""
+    for schema in ("main", "archive"):
+        cur = conn.execute(f"SELECT {_BOOKING_COLS} FROM {schema}.bookings WHERE id = ?", (int(booking_id),))
+        row = cur.fetchone()
+        if row:
+            return dict(zip([c[0] for c in cur.description], row), archived=schema == "archive")
+    return None
+
+
+def read_reminder_window(conn, ts_from: int, ts_to: int) -> pd.DataFrame:
+    """Reservas activas con teléfono que empiezan en [ts_from, ts_to] (sección Recordatorios)."""
+    return pd.read_sql_query(
+        """
+        SELECT id, room, title, organizador, start_dt, end_dt, attendees, phone, status, reminder_24h_sent
+          FROM bookings
+         WHERE phone IS NOT NULL AND phone != ''
+           AND start_ts BETWEEN ? AND ?
+           AND (status = 'Confirmado' OR status = 'Pendiente')
+        """,
+        conn,
+        params=(ts_from, ts_to),
+    )
+
+
+# Índice de intervalos por sala, compartido por todo el proceso y sincronizado por los helpers de escritura.
+# Sirve a disponibilidad y has_overlap/list_overlaps; reserve() decide con SQL bajo el lock de escritura.
+_index = BookingIndex()
+
+
+def _bookings_rev(conn) -> int:
+    return conn.execute("SELECT rev FROM bookings_rev").fetchone()[0]
+
+
+def get_booking_index() -> BookingIndex:
+    # data_version avisa de que alguien escribió; sólo se recarga si cambió bookings_rev
+    # (sala/horario/estado), no por recordatorios u outbox. Las escrituras propias ya se aplicaron.
+    idx = _index
+    ext = external_version()
+    if idx.synced_version != ext:
+        conn = get_conn()
+        if idx.synced_rev != _bookings_rev(conn):
+            idx.reload(conn)
+        idx.synced_version = ext
+    return idx
+
+
+@contextmanager
+def index_transaction():
+    """transaction() que entrega también rev=[antes, después] para sincronizar el índice al salir."""
+    rev = [None, None]
+    with transaction() as w:
+        rev[0] = _bookings_rev(w)
+        yield w, rev
+        rev[1] = _bookings_rev(w)
+
+
+def _series_busy(conn, room, s_ts, e_ts) -> list:
+    # Sin SQL en el caso común: sólo se expanden series si la sala tiene alguna
+    if room not in series.rooms_with_series():
+        return []
+    return series.busy(conn or get_conn(), room, s_ts, e_ts)
+
+
+def has_overlap(conn, room, start_dt_iso, end_dt_iso, ignore_id=None, include_cancelled=True):
+    s_ts, e_ts = to_ts(start_dt_iso), to_ts(end_dt_iso)
+    return get_booking_index().has_conflict(
+        room, s_ts, e_ts, ignore_id=ignore_id, include_cancelled=include_cancelled
+    ) or bool(_series_busy(conn, room, s_ts, e_ts))
+
+
+def list_overlaps(conn, room, start_dt_iso, end_dt_iso, ignore_id=None, include_cancelled=True) -> list:
+    # IDs de reservas + ids de ocurrencia ('S<serie>:<fecha>') de las series de la sala
+    s_ts, e_ts = to_ts(start_dt_iso), to_ts(end_dt_iso)
+    return get_booking_index().conflicts(
+        room, s_ts, e_ts, ignore_id=ignore_id, include_cancelled=include_cancelled
+    ) + [o[2] for o in _series_busy(conn, room, s_ts, e_ts)]
+
+
+def has_overlap_sql(conn, room, start_dt_iso, end_dt_iso, ignore_id=None):
+    # Camino SQL de referencia (mismo resultado que el índice con include_cancelled=True)
+    q = (
+        """
+    SELECT COUNT(*) FROM bookings
+    WHERE room = ?
+      AND start_ts < ?
+      AND end_ts > ?
+    """
+    )
+    params = [room, to_ts(end_dt_iso), to_ts(start_dt_iso)]
+    if ignore_id is not None:
+        q += " AND id != ?"
+        params.append(ignore_id)
+    cur = conn.execute(q, params)
+    return cur.fetchone()[0] > 0
+
+
+BOOKING_FIELDS = (
+    "room",
+    "title",
+    "organizador",
+    "start_dt",
+    "end_dt",
+    "color",
+    "attendees",
+    "phone",
+    "status",
+    "confirm_token",
+    "notes",
+    "chair_type",
+    "chair_qty",
+    "table_type",
+    "table_qty",
+)
+
+
+def _insert_row(w, b: dict, idempotency_key=None) -> int:
+    cur = w.execute(
+        "INSERT INTO bookings("
+        " room, title, organizador, start_dt, end_dt, start_ts, end_ts, color, attendees, phone, status, confirm_token,"
+        " notes, chair_type, chair_qty, table_type, table_qty, idempotency_key"
+        ") VALUES (?,?,?,?,?,?,?,?,?,?,?,?, ?,?,?,?,?,?)",
+        (
+            b["room"],
+            b["title"],
+            b["organizador"],
+            b["start_dt"],
+            b["end_dt"],
+            to_ts(b["start_dt"]),
+            to_ts(b["end_dt"]),
+            b.get("color"),
+            b.get("attendees") or 0,
+            b.get("phone"),
+            b.get("status") or "Pendiente",
+            b.get("confirm_token"),
+            b.get("notes"),
+            b.get("chair_type"),
+            b.get("chair_qty") or 0,
+            b.get("table_type"),
+            b.get("table_qty") or 0,
+            idempotency_key,
+        ),
+    )
+    return cur.lastrowid
+
+
+def _update_row(w, booking_id, b: dict):
+    w.execute(
+        """
+        UPDATE bookings
+           SET room=?, title=?, organizador=?, start_dt=?, end_dt=?, start_ts=?, end_ts=?,
+               color=?, attendees=?, phone=?, status=?,
+               notes=?, chair_type=?, chair_qty=?, table_type=?, table_qty=?
+         WHERE id=?
+    """,
+        (
+            b["room"],
+            b["title"],
+            b["organizador"],
+            b["start_dt"],
+            b["end_dt"],
+            to_ts(b["start_dt"]),
+            to_ts(b["end_dt"]),
+            b.get("color"),
+            b.get("attendees") or 0,
+            b.get("phone"),
+            b.get("status") or "Pendiente",
+            b.get("notes"),
+            b.get("chair_type"),
+            b.get("chair_qty") or 0,
+            b.get("table_type"),
+            b.get("table_qty") or 0,
+            booking_id,
+        ),
+    )
+
+
+def insert_booking(
+    room,
+    title,
+    organizador,
+    start_dt_iso,
+    end_dt_iso,
+    color,
+    attendees,
+    phone,
+    token,
+    notes,
+    chair_type,
+    chair_qty,
+    table_type,
+    table_qty,
+):
+    b = dict(zip(BOOKING_FIELDS, (
+        room, title, organizador, start_dt_iso, end_dt_iso, color, attendees, phone,
+        "Pendiente", token, notes, chair_type, chair_qty, table_type, table_qty,
+    )))
+    with index_transaction() as (w, rev):
+        booking_id = _insert_row(w, b)
+        reminders.reschedule(w, booking_id)
+        occupancy.refresh(w, booking_id)
+    _index.upsert(booking_id, room, to_ts(start_dt_iso), to_ts(end_dt_iso), "Pendiente", rev=rev)
+    return booking_id
+
+
+def update_booking(
+    booking_id,
+    room,
+    title,
+    organizador,
+    start_dt_iso,
+    end_dt_iso,
+    color,
+    attendees,
+    phone,
+    status,
+    notes,
+    chair_type,
+    chair_qty,
+    table_type,
+    table_qty,
+):
+    b = dict(zip(BOOKING_FIELDS, (
+        room, title, organizador, start_dt_iso, end_dt_iso, color, attendees, phone,
+        status, None, notes, chair_type, chair_qty, table_type, table_qty,
+    )))
+    with index_transaction() as (w, rev):
+        _update_row(w, booking_id, b)
+        reminders.reschedule(w, booking_id)
+        occupancy.refresh(w, booking_id)
+    _index.upsert(booking_id, room, to_ts(start_dt_iso), to_ts(end_dt_iso), status, rev=rev)
+
+
+# ======================= RESERVA ATÓMICA =======================
+
+@dataclass
+class ReserveResult:
+    ok: bool
+    booking_id: int | None = None
+    reason: str | None = None          # "invalid_range" | "capacity" | "conflict" | "not_found"
+    duplicate: bool = False            # True si la idempotency_key ya se había usado
+    capacity: int | None = None
+    conflicts: list = field(default_factory=list)   # [{id, title, organizador, start_dt, end_dt, status}]
+
+
+def _conflict_rows(w, room, start_ts, end_ts, ignore_id=None) -> list:
+    q = (
+        f"SELECT id, title, organizador, start_dt, end_dt, status FROM {archive.source(w, start_ts)} "
+        "WHERE room = ? AND start_ts < ? AND end_ts > ?"
+    )
+    params = [room, end_ts, start_ts]
+    if ignore_id is not None:
+        q += " AND id != ?"
+        params.append(ignore_id)
+    q += " ORDER BY start_ts"
+    cols = ("id", "title", "organizador", "start_dt", "end_dt", "status")
+    rows = [dict(zip(cols, r)) for r in w.execute(q, params).fetchall()]
+    occ = series.conflict_rows(w, room, start_ts, end_ts)
+    return sorted(rows + occ, key=lambda c: c["start_dt"]) if occ else rows
+
+
+def _reserve_in(w, booking: dict, booking_id=None, idempotency_key=None) -> ReserveResult:
+    # Cuerpo de reserve() dentro de una transacción ya abierta (también lo usa utils.series)
+    s_ts, e_ts = to_ts(booking["start_dt"]), to_ts(booking["end_dt"])
+    if e_ts <= s_ts:
+        return ReserveResult(False, booking_id, reason="invalid_range")
+    room = booking["room"]
+    if idempotency_key and booking_id is None:
+        row = w.execute("SELECT id FROM bookings WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+        if row:
+            return ReserveResult(True, row[0], duplicate=True)
+    if booking_id is not None and not w.execute("SELECT 1 FROM bookings WHERE id = ?", (booking_id,)).fetchone():
+        return ReserveResult(False, booking_id, reason="not_found")
+    cap = get_room_catalog().capacity(room)
+    if cap is not None and int(booking.get("attendees") or 0) > cap:
+        return ReserveResult(False, booking_id, reason="capacity", capacity=cap)
+    conflicts = _conflict_rows(w, room, s_ts, e_ts, ignore_id=booking_id)
+    if conflicts:
+        return ReserveResult(False, booking_id, reason="conflict", capacity=cap, conflicts=conflicts)
+    if booking_id is None:
+        booking_id = _insert_row(w, booking, idempotency_key)
+    else:
+        _update_row(w, booking_id, booking)
+    reminders.reschedule(w, booking_id)
+    occupancy.refresh(w, booking_id)
+    return ReserveResult(True, booking_id, capacity=cap)
+
+
+def reserve(booking: dict, booking_id=None, idempotency_key=None) -> ReserveResult:
+    """Crea (o edita si booking_id) una reserva validando capacidad y choques en un solo BEGIN IMMEDIATE.
+
+    booking usa las claves de BOOKING_FIELDS (start_dt/end_dt en ISO). Si idempotency_key ya existe,
+    devuelve la reserva original sin volver a escribir."""
+    with index_transaction() as (w, rev):
+        res = _reserve_in(w, booking, booking_id, idempotency_key)
+    if res.ok and not res.duplicate:
+        _index.upsert(
+            res.booking_id, booking["room"], to_ts(booking["start_dt"]), to_ts(booking["end_dt"]),
+            booking.get("status") or "Pendiente", rev=rev,
+        )
+    return res
+
+
+def delete_booking(booking_id):
+    with index_transaction() as (w, rev):
+        w.execute("DELETE FROM bookings WHERE id = ?", (booking_id,))
+        reminders.drop(w, booking_id)
+        occupancy.drop(w, booking_id)
+    _index.remove(booking_id, rev=rev)
+
+
+def set_booking_status(booking_id, to_status):
+    with index_transaction() as (w, rev):
+        w.execute("UPDATE bookings SET status = ? WHERE id = ?", (to_status, booking_id))
+        reminders.reschedule(w, booking_id)
+        occupancy.refresh(w, booking_id)
+    _index.set_status(booking_id, to_status, rev=rev)
+
+
+def _enqueue_status_notice(w, booking_id, to_status):
+    b = w.execute("SELECT title, room, start_dt, phone FROM bookings WHERE id = ?", (booking_id,)).fetchone()
+    if not b or not b[3]:
+        return
+    start = datetime.fromisoformat(b[2]).strftime("%Y-%m-%d %I:%M %p")
+    verbo = "confirmada ✅" if to_status == "Confirmado" else "cancelada ❌"
+    # Una clave por cambio: Confirmado→Cancelado→Confirmado avisa las dos veces
+    changed_at = datetime.now().isoformat(timespec="microseconds")
+    outbox.enqueue(
+        w,
+        f"status:{booking_id}:{to_status}:{changed_at}",
+        "status",
+        b[3],
+        f"Tu reserva «{b[0]}» en {b[1]} ({start}) quedó {verbo}.",
+        booking_id=booking_id,
+    )
+
+
+def _token_key(token, to_status):
+    # Token firmado (validado sin DB) o UUID heredado -> (WHERE, valor); None si es falso/vencido
+    action = next((a for a, st in tokens.ACTION_STATUS.items() if st == to_status), None)
+    booking_id = tokens.verify(token, action) if action else None
+    if booking_id is not None:
+        return "id = ?", booking_id
+    return ("confirm_token = ?", token) if tokens.is_legacy(token) else None
+
+
+def _token_row(conn, key):
+    return conn.execute(f"SELECT id, status, title, room, start_dt FROM bookings WHERE {key[0]}", (key[1],)).fetchone()
+
+
+def check_status_token(token, to_status):
+    """Valida un enlace Confirmar/Cancelar sin aplicarlo: (id, status, title, room, start_dt) o None."""
+    key = _token_key(token, to_status)
+    return _token_row(get_conn(), key) if key else None
+
+
+def update_status_by_token(token, to_status):
+    """Aplica un enlace Confirmar/Cancelar (idempotente: repetirlo devuelve "already")."""
+    key = _token_key(token, to_status)
+    if key is None:
+        return False, None
+    with index_transaction() as (w, rev):
+        row = _token_row(w, key)
+        if not row:
+            return False, None
+        if row[1] == to_status:
+            return True, "already"
+        w.execute("UPDATE bookings SET status = ? WHERE id = ?", (to_status, row[0]))
+        reminders.reschedule(w, row[0])
+        occupancy.refresh(w, row[0])
+        if NOTIFY_STATUS_CHANGES:
+            _enqueue_status_notice(w, row[0], to_status)
+    _index.set_status(row[0], to_status, rev=rev)
+    return True, "updated"
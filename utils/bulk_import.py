@@ -0,0 +1,200 @@
+# utils/bulk_import.py
+# ------------------------------------------------------------
+# Importación masiva de reservas (CSV o Parquet con las columnas de bookings)
+# - Validación vectorizada: fechas, rango, sala, capacidad, estado, cantidades >= 0,
+#   teléfono E.164 (se quitan espacios, guiones, puntos y paréntesis; sin "+país" se rechaza)
+# - confirm_token del archivo se ignora: los enlaces son firmados (utils/tokens.py) y un
+#   token repetido rompería el índice único en mitad del executemany
+# - Choques por sala con sort-and-sweep, O(n log n):
+#     contra la DB (reservas + series): búsqueda binaria sobre inicios + máximo acumulado de fines
+#     entre filas del archivo: barrido por inicio (gana la que empieza antes)
+# - Filas válidas en UN executemany dentro de una transacción
+# - Informe por fila de lo rechazado
+# ------------------------------------------------------------
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import archive, occupancy, reminders, series
+from utils.bookings import BOOKING_FIELDS, get_booking_index, get_room_catalog
+from utils.db import EPOCH, get_conn, transaction
+from utils.whatsapp import E164_RE
+
+REQUIRED = ("room", "title", "organizador", "start_dt", "end_dt")
+STATUSES = ("Pendiente", "Confirmado", "Cancelado")
+INT_FIELDS = ("attendees", "chair_qty", "table_qty")
+IMPORT_FIELDS = tuple(c for c in BOOKING_FIELDS if c != "confirm_token")
+
+
+@dataclass
+class ImportReport:
+    inserted: int = 0
+    total: int = 0
+    rejected: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=["fila", "motivo"]))
+    dry_run: bool = False
+
+
+def read_table(source, name: str | None = None) -> pd.DataFrame:
+    """DataFrame desde ruta, archivo subido (UploadedFile) o DataFrame; el formato sale de la extensión."""
+    if isinstance(source, pd.DataFrame):
+        return source.copy()
+    name = name or getattr(source, "name", None) or str(source)
+    if Path(name).suffix.lower() in (".parquet", ".pq"):
+        return pd.read_parquet(source)
+    return pd.read_csv(source, dtype=str, keep_default_na=False)
+
+
+def _parse_dt(col: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(col):
+        out = col
+    else:
+        col = col.astype(str).str.strip()
+        out = pd.to_datetime(col, errors="coerce", format="ISO8601")
+        bad = out.isna() & col.ne("")
+        if bad.any():
+            # Formatos de hoja de cálculo (p. ej. 1/2/2027 10:00): más lento, sólo para lo que falló
+            out[bad] = pd.to_datetime(col[bad], errors="coerce", format="mixed")
+    if getattr(out.dt, "tz", None) is not None:
+        out = out.dt.tz_convert("UTC").dt.tz_localize(None)   # como utils.db.to_ts
+    return out
+
+
+def _to_epoch(dt: pd.Series) -> np.ndarray:
+    # Igual que utils.db.to_ts (hora sin offset tratada como UTC), vectorizado
+    return ((dt - pd.Timestamp(EPOCH)) // pd.Timedelta(seconds=1)).to_numpy(dtype=np.int64)
+
+
+def _existing_conflicts(room, s, e, conn) -> np.ndarray:
+    """Para cada candidato de `room`: id de una reserva (u ocurrencia de serie) existente que choca, o None."""
+    lo, hi = int(s.min()), int(e.max())
+    rows = conn.execute(
+        f"SELECT start_ts, end_ts, id FROM {archive.source(conn, lo)} "
+        "WHERE room = ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts",
+        (room, hi, lo),
+    ).fetchall()
+    occ = series.busy(conn, room, lo, hi)
+    if occ:
+        rows = sorted(rows + occ)
+    out = np.full(len(s), None, dtype=object)
+    if not rows:
+        return out
+    ex_s = np.array([r[0] for r in rows], dtype=np.int64)
+    ex_e = np.array([r[1] for r in rows], dtype=np.int64)
+    refs = np.array([r[2] for r in rows], dtype=object)
+    # Máximo acumulado de fines (y quién lo tiene) sobre las existentes ordenadas por inicio
+    run_max = np.maximum.accumulate(ex_e)
+    holder = np.maximum.accumulate(np.where(ex_e == run_max, np.arange(len(rows)), 0))
+    k = np.searchsorted(ex_s, e, side="left")   # existentes con inicio < fin del candidato
+    km = np.maximum(k - 1, 0)
+    hit = (k > 0) & (run_max[km] > s)
+    out[hit] = refs[holder[km[hit]]]
+    return out
+
+
+def _sweep(s, e, order) -> np.ndarray:
+    """Barrido por inicio: índice (posicional) de la fila aceptada con la que choca, o -1."""
+    out = np.full(len(s), -1, dtype=np.int64)
+    last_end, last_pos = None, -1
+    for pos in order:
+        if last_end is not None and s[pos] < last_end:
+            out[pos] = last_pos
+        else:
+            last_end, last_pos = e[pos], pos
+    return out
+
+
+def validate(df: pd.DataFrame, conn=None) -> tuple[pd.DataFrame, pd.Series]:
+    """Normaliza columnas y devuelve (filas normalizadas, motivo de rechazo por fila o '')."""
+    missing = [c for c in REQUIRED if c not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+    conn = conn or get_conn()
+    df = df.reset_index(drop=True)
+    out = pd.DataFrame(index=df.index)
+    for c in IMPORT_FIELDS:
+        out[c] = df[c] if c in df.columns else None
+    for c in ("room", "title", "organizador", "status"):
+        out[c] = out[c].fillna("").astype(str).str.strip()
+    out["status"] = out["status"].replace("", "Pendiente")
+    out["phone"] = out["phone"].fillna("").astype(str).str.replace(r"[\s\-().]", "", regex=True)
+    for c in INT_FIELDS:
+        out[c] = pd.to_numeric(out[c], errors="coerce").fillna(0).astype(np.int64)
+    start, end = _parse_dt(out["start_dt"]), _parse_dt(out["end_dt"])
+
+    reason = pd.Series("", index=df.index, dtype=object)
+
+    def reject(mask, msg):
+        reason[mask & reason.eq("")] = msg
+
+    reject(out["room"].eq("") | out["title"].eq("") | out["organizador"].eq(""), "Faltan sala, título u organizador")
+    reject(start.isna() | end.isna(), "Fecha inválida")
+    reject(end <= start, "El fin debe ser posterior al inicio")
+    catalog = get_room_catalog()
+    reject(~out["room"].isin(catalog.names()), "Sala desconocida")
+    reject(~out["status"].isin(STATUSES), "Estado inválido")
+    reject((out[list(INT_FIELDS)] < 0).any(axis=1), "Asistentes, sillas y mesas no pueden ser negativos")
+    reject(out["phone"].ne("") & ~out["phone"].str.fullmatch(E164_RE.pattern), "Teléfono inválido (E.164, ej. +1787XXXXXXX)")
+    cap = out["room"].map(catalog.capacity)
+    over = cap.notna() & (out["attendees"] > cap.fillna(0))
+    reason[over & reason.eq("")] = "Capacidad excedida: " + out["attendees"].astype(str) + " > " + cap.astype("Int64").astype(str)
+
+    ok = reason.eq("")
+    # ISO "YYYY-MM-DDTHH:MM:SS" como guarda el formulario (NaT sólo queda en filas rechazadas)
+    out["start_dt"] = np.datetime_as_string(start.to_numpy(dtype="datetime64[s]"), unit="s")
+    out["end_dt"] = np.datetime_as_string(end.to_numpy(dtype="datetime64[s]"), unit="s")
+    s_all = np.zeros(len(out), dtype=np.int64)
+    e_all = np.zeros(len(out), dtype=np.int64)
+    s_all[ok.to_numpy()] = _to_epoch(start[ok])
+    e_all[ok.to_numpy()] = _to_epoch(end[ok])
+    out["start_ts"], out["end_ts"] = s_all, e_all
+
+    clash_pos, clash_msg = [], []
+    for room, pos in out.index[ok].groupby(out.loc[ok, "room"]).items():
+        pos = np.asarray(pos)
+        ex = _existing_conflicts(room, s_all[pos], e_all[pos], conn)
+        taken = pd.notna(ex)
+        clash_pos.append(pos[taken])
+        clash_msg.append("Choca con la reserva #" + ex[taken].astype(str).astype(object))
+        free = pos[~taken]
+        if len(free) > 1:
+            fs, fe = s_all[free], e_all[free]
+            other = _sweep(fs, fe, np.lexsort((free, fs)))
+            hit = other >= 0
+            clash_pos.append(free[hit])
+            clash_msg.append("Choca con la fila " + (free[other[hit]] + 1).astype(str).astype(object) + " del archivo")
+    if clash_pos:
+        reason.iloc[np.concatenate(clash_pos)] = np.concatenate(clash_msg)
+    return out, reason
+
+
+def import_bookings(source, name: str | None = None, dry_run: bool = False) -> ImportReport:
+    """Importa reservas desde CSV/Parquet/DataFrame. Las filas rechazadas no se guardan.
+
+    `fila` en el informe es la posición 1-based de la fila de datos (sin contar la cabecera)."""
+    raw = read_table(source, name)
+    with transaction() as w:
+        # Validar y escribir bajo el mismo BEGIN IMMEDIATE: nadie reserva en medio
+        rows, reason = validate(raw, conn=w)
+        good = rows[reason.eq("")]
+        if not dry_run and len(good):
+            first_id = (w.execute("SELECT seq FROM sqlite_sequence WHERE name = 'bookings'").fetchone() or (0,))[0] + 1
+            cols = [*IMPORT_FIELDS, "start_ts", "end_ts"]
+            vals = good[cols].astype(object)
+            recs = vals.where(vals.notna() & vals.ne(""), None).itertuples(index=False, name=None)
+            w.executemany(
+                f"INSERT INTO bookings({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                recs,
+            )
+            reminders.schedule_new(w, first_id)
+            occupancy.apply_new(w, first_id)
+    if not dry_run and len(good):
+        get_booking_index().reload(get_conn())
+    bad = reason.ne("")
+    rejected = raw.reset_index(drop=True)[bad.to_numpy()].copy()
+    rejected.insert(0, "motivo", reason[bad].to_numpy())
+    rejected.insert(0, "fila", np.flatnonzero(bad.to_numpy()) + 1)
+    return ImportReport(
+        inserted=0 if dry_run else len(good), total=len(raw), rejected=rejected.reset_index(drop=True), dry_run=dry_run
+    )
@@ -0,0 +1,123 @@
+# utils/calendar_events.py
+# ------------------------------------------------------------
+# Eventos para FullCalendar (streamlit-calendar) construidos por columnas
+# + rango visible y caché de segmentos mensuales para la carga perezosa
+# ------------------------------------------------------------
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+COLOR_CONFIRMED = "#16a34a"
+COLOR_CANCELLED = "#6b7280"
+COLOR_DEFAULT = "#f59e0b"
+
+
+def status_color(row):
+    """Color de una fila suelta (mismo criterio que status_colors)."""
+    stt = (row.get("status") or "").strip()
+    if stt == "Confirmado":
+        return COLOR_CONFIRMED
+    if stt == "Cancelado":
+        return COLOR_CANCELLED
+    color = row.get("color")
+    return color if isinstance(color, str) and color else COLOR_DEFAULT
+
+
+def status_colors(df: pd.DataFrame) -> np.ndarray:
+    """Versión vectorizada de status_color sobre todo el DataFrame."""
+    stt = df["status"].fillna("").astype(str).str.strip().to_numpy()
+    color = df["color"].where(df["color"].notna() & df["color"].ne(""), COLOR_DEFAULT).astype(str).to_numpy()
+    return np.select([stt == "Confirmado", stt == "Cancelado"], [COLOR_CONFIRMED, COLOR_CANCELLED], default=color)
+
+
+def build_events(df: pd.DataFrame) -> list[dict]:
+    """df de read_bookings -> lista de eventos {id, title, start, end, color}."""
+    if df.empty:
+        return []
+    org = df["organizador"].fillna("").astype(str)
+    title = df["room"].astype(str) + ": " + df["title"].astype(str)
+    title = title.where(org.str.strip().eq(""), title + " (" + org + ")")
+    cols = (
+        df["id"].astype(str).tolist(),
+        title.tolist(),
+        df["start_dt"].tolist(),
+        df["end_dt"].tolist(),
+        status_colors(df).tolist(),
+    )
+    keys = ("id", "title", "start", "end", "color")
+    return [dict(zip(keys, vals)) for vals in zip(*cols)]
+
+
+# ======================= RANGO VISIBLE + SEGMENTOS =======================
+# FullCalendar con locale "es" empieza la semana en lunes (firstDay=1) y la
+# vista de mes muestra siempre 6 semanas (fixedWeekCount).
+
+VIEW_DAYS = {"timeGridWeek": 7, "listWeek": 7, "timeGridDay": 1}
+
+
+def _week_start(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def visible_range(view: str, anchor: date) -> tuple[date, date]:
+    """Días (inclusive) que pinta FullCalendar para `view` centrado en `anchor`."""
+    if view == "dayGridMonth":
+        first = _week_start(anchor.replace(day=1))
+        return first, first + timedelta(days=41)
+    if view == "timeGridDay":
+        return anchor, anchor
+    first = _week_start(anchor)
+    return first, first + timedelta(days=VIEW_DAYS.get(view, 7) - 1)
+
+
+def shift_anchor(view: str, anchor: date, step: int) -> date:
+    """Fecha ancla tras pulsar anterior (-1) / siguiente (+1)."""
+    if view == "dayGridMonth":
+        m = anchor.month - 1 + step
+        return date(anchor.year + m // 12, m % 12 + 1, 1)
+    return anchor + timedelta(days=step * VIEW_DAYS.get(view, 7))
+
+
+def month_segments(date_from: date, date_to: date) -> list[tuple[date, date]]:
+    """Meses naturales [(primer día, último día)] que cubren el rango."""
+    out = []
+    m = date_from.replace(day=1)
+    while m <= date_to:
+        nxt = date(m.year + (m.month == 12), m.month % 12 + 1, 1)
+        out.append((m, nxt - timedelta(days=1)))
+        m = nxt
+    return out
+
+
+class SegmentCache:
+    """Eventos por (filtro, versión de datos, mes) con expulsión LRU; uno por sesión."""
+
+    def __init__(self, max_segments: int = 24):
+        self.max_segments = max_segments
+        self._segments = OrderedDict()
+
+    def ensure(self, room_filter, version, date_from: date, date_to: date, load) -> list:
+        """Carga los meses que faltan de [date_from, date_to] con `load(desde, hasta)`; devuelve sus claves."""
+        for k in [k for k in self._segments if k[1] != version]:
+            del self._segments[k]
+        keys = []
+        for m_from, m_to in month_segments(date_from, date_to):
+            key = (room_filter, version, m_from)
+            if key in self._segments:
+                self._segments.move_to_end(key)
+            else:
+                self._segments[key] = load(m_from, m_to)
+            keys.append(key)
+        while len(self._segments) > self.max_segments:
+            self._segments.popitem(last=False)
+        return keys
+
+    def events(self, room_filter, version, date_from: date, date_to: date, load) -> list[dict]:
+        """Eventos que tocan [date_from, date_to] (sin duplicar reservas que cruzan de mes)."""
+        by_id = {}
+        for key in self.ensure(room_filter, version, date_from, date_to, load):
+            for ev in self._segments.get(key, []):
+                by_id[ev["id"]] = ev
+        return list(by_id.values())
@@ -0,0 +1,155 @@
+# utils/confirm_server.py
+# ------------------------------------------------------------
+# Endpoint HTTP mínimo para los enlaces Confirmar/Cancelar
+#   python -m utils.confirm_server          (CONFIRM_PORT, por defecto 8502)
+# - Atiende ?confirm=<token> / ?cancel=<token> sin cargar Streamlit
+# - GET sólo valida el token y muestra un botón: vistas previas (WhatsApp), crawlers y
+#   escáneres hacen GET. El cambio se aplica con el POST de ese botón (idempotente)
+# - Servidor con hilos (stdlib); las escrituras pasan por utils.db.transaction()
+# - Búsqueda por índice único en bookings.confirm_token
+# - Los enlaces apuntan aquí cuando CONFIRM_BASE_URL está definido
+# ------------------------------------------------------------
+import html
+import logging
+import os
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils.bookings import check_status_token, update_status_by_token
+from utils.db import get_conn
+
+HOST = os.getenv("CONFIRM_HOST", "0.0.0.0")
+PORT = int(os.getenv("CONFIRM_PORT", "8502"))
+BACKLOG = int(os.getenv("CONFIRM_BACKLOG", "128"))   # cola de conexiones para ráfagas de clics
+MAX_BODY = 4096
+
+log = logging.getLogger("eventosapp.confirm")
+
+ACTIONS = {
+    "confirm": ("Confirmado", "✅ Reserva confirmada.", "Esta reserva ya estaba confirmada.", "Token de confirmación inválido."),
+    "cancel": ("Cancelado", "❌ Reserva cancelada.", "Esta reserva ya estaba cancelada.", "Token de cancelación inválido."),
+}
+BUTTONS = {"confirm": "Confirmar", "cancel": "Cancelar reserva"}
+
+PAGE = """<!doctype html>
+<html lang="es"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width,initial-scale=1">
+<title>Reservas</title>
+<style>body{{font-family:system-ui,sans-serif;margin:0;display:flex;min-height:100vh;align-items:center;justify-content:center;background:#f8fafc}}
+main{{font-size:1.25rem;padding:2rem;border-radius:12px;background:#fff;box-shadow:0 1px 4px #0002}}
+button{{font-size:1.1rem;padding:.6rem 1.4rem;border:0;border-radius:8px;background:#2563eb;color:#fff;cursor:pointer}}</style>
+</head><body><main><p>{message}</p>{form}</main></body></html>"""
+
+FORM = """<form method="post"><input type="hidden" name="{action}" value="{token}">
+<button type="submit">{label}</button></form>"""
+
+
+def _action(params: dict):
+    """(acción, token) del primer parámetro confirm/cancel presente."""
+    for action in ACTIONS:
+        if action in params:
+            return action, params[action][0].strip()
+    return None, None
+
+
+def preview(query: str) -> tuple[int, str, str]:
+    """GET: (código HTTP, mensaje, formulario) — valida el token sin cambiar la reserva."""
+    action, token = _action(parse_qs(query))
+    if action is None:
+        return 400, "Enlace incompleto.", ""
+    status, _done, already, invalid = ACTIONS[action]
+    row = check_status_token(token, status) if token else None
+    if not row:
+        return 404, invalid, ""
+    if row[1] == status:
+        return 200, already, ""
+    _id, _status, title, room, start_dt = row
+    start = datetime.fromisoformat(start_dt).strftime("%Y-%m-%d %I:%M %p")
+    message = f"«{title}» en {room} ({start})"
+    form = FORM.format(action=action, token=html.escape(token, quote=True), label=BUTTONS[action])
+    return 200, message, form
+
+
+def handle(form: str) -> tuple[int, str]:
+    """POST: (código HTTP, mensaje) tras aplicar el enlace; repetirlo no vuelve a escribir."""
+    action, token = _action(parse_qs(form))
+    if action is None:
+        return 400, "Enlace incompleto."
+    status, done, already, invalid = ACTIONS[action]
+    if not token:
+        return 400, invalid
+    ok, state = update_status_by_token(token, status)
+    if not ok:
+        return 404, invalid
+    return 200, done if state == "updated" else already
+
+
+class ConfirmHandler(BaseHTTPRequestHandler):
+    server_version = "EventosConfirm/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/healthz":
+            return self._send(200, "ok", content_type="text/plain; charset=utf-8")
+        try:
+            code, message, form = preview(url.query)
+        except Exception:
+            log.exception("Error procesando %s", self.path)
+            code, message, form = 500, "No se pudo procesar el enlace. Intenta de nuevo en unos minutos.", ""
+        self._send(code, PAGE.format(message=html.escape(message), form=form))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY:
+            return self._send(413, PAGE.format(message="Solicitud inválida.", form=""))
+        body = self.rfile.read(length).decode("utf-8", "replace") if length else ""
+        try:
+            # El formulario manda el token en el cuerpo; sin cuerpo vale el del query string
+            code, message = handle(body or url.query)
+        except Exception:
+            log.exception("Error procesando POST %s", url.path)
+            code, message = 500, "No se pudo procesar el enlace. Intenta de nuevo en unos minutos."
+        self._send(code, PAGE.format(message=html.escape(message), form=""))
+
+    def do_HEAD(self):
+        # Vistas previas de enlaces (WhatsApp) usan HEAD/GET: HEAD no toca la DB
+        self._send(200, "", content_type="text/html; charset=utf-8")
+
+    def _send(self, code, body, content_type="text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        log.info("%s %s", self.address_string(), fmt % args)
+
+
+class ConfirmServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = BACKLOG
+
+
+def serve(host=HOST, port=PORT):
+    get_conn()   # aplica esquema/migración antes de aceptar peticiones
+    with ConfirmServer((host, port), ConfirmHandler) as httpd:
+        log.info("Confirmaciones escuchando en %s:%s", host, port)
+        httpd.serve_forever()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+# utils/db.py
+# ------------------------------------------------------------
+# Conexiones SQLite compartidas por la app y los procesos auxiliares
+# - Una conexión de lectura por hilo (cada sesión/rerun de Streamlit)
+# - Un único escritor por proceso, serializado con lock (BEGIN IMMEDIATE)
+# - WAL + synchronous=NORMAL + busy_timeout configurable
+# - Esquema/migración una sola vez por proceso (versionada con PRAGMA user_version)
+# ------------------------------------------------------------
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from utils.archive import archive_version, attach as attach_archive, ensure_archive_schema
+from utils.occupancy import ensure_occupancy_schema
+from utils.outbox import ensure_outbox_schema
+from utils.profiling import connection_factory
+from utils.reminders import ensure_reminders_schema
+from utils.search import ensure_search_schema
+
+ROOT = Path(__file__).resolve().parents[1]
+# Misma ubicación por defecto que antes (pages/data); en Render DATA_DIR=/var/data
+DATA_DIR = Path(os.getenv("DATA_DIR", ROOT / "pages" / "data"))
+DB_PATH = DATA_DIR / "bookings.db"
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Salas iniciales: sólo siembran la tabla rooms de una DB nueva (luego se editan como datos)
+ROOMS = [
+    "Glass Room 1",
+    "Glass Room 2",
+    "Glass Room 3",
+    "Glass Room 4",
+    "Winners",
+    "Ballito Area"
+]
+ROOM_CAPACITY_DEFAULTS = {
+    "Glass Room 1": 30,
+    "Glass Room 2": 30,
+    "Glass Room 3": 30,
+    "Glass Room 4": 60,
+    "Winners": 500,
+    "Ballito Area": 1000,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_ts(value) -> int:
+    """Fecha (datetime o texto ISO con 'T' o espacio) -> segundos epoch (hora local tratada como UTC).
+
+    Coincide con strftime('%s', ...) de SQLite, que se usa en el backfill: con offset
+    ('...-04:00') se pasa a UTC antes de quitarlo, sin offset se toma tal cual."""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).strip())
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return int((value.replace(tzinfo=None) - EPOCH).total_seconds())
+
+
+# ======================= CONEXIONES =======================
+
+def connect(db_path=None) -> sqlite3.Connection:
+    """Conexión nueva con los PRAGMA por conexión (el modo WAL queda guardado en el archivo)."""
+    path = Path(db_path) if db_path else DB_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        str(path), timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=connection_factory()
+    )
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    attach_archive(conn, path)   # reservas archivadas (utils/archive.py) como "archive"
+    return conn
+
+
+_local = threading.local()
+_writer_lock = threading.RLock()
+_writer = None
+_writes = 0
+_schema_ready = False
+_version_conn = None
+_version_lock = threading.Lock()
+
+
+def _writer_conn() -> sqlite3.Connection:
+    global _writer, _schema_ready
+    with _writer_lock:
+        if _writer is None:
+            _writer = connect()
+            _writer.isolation_level = None   # transacciones explícitas
+        if not _schema_ready:
+            if _writer.execute("PRAGMA main.page_count").fetchone()[0] == 0:
+                # DB nuevo: INCREMENTAL sólo se puede fijar antes de crear tablas (utils/archive.py)
+                _writer.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+            _writer.execute("PRAGMA journal_mode = WAL")
+            ensure_schema(_writer)
+            ensure_archive(_writer)
+            _schema_ready = True
+        return _writer
+
+
+def get_conn() -> sqlite3.Connection:
+    """Conexión de lectura del hilo actual (se cierra sola al terminar el hilo)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        if not _schema_ready:
+            _writer_conn()   # garantiza el esquema antes de la primera lectura
+        conn = _local.conn = connect()
+    return conn
+
+
+@contextmanager
+def transaction():
+    """Transacción de escritura: BEGIN IMMEDIATE en el escritor del proceso, commit/rollback al salir."""
+    global _writes
+    with _writer_lock:
+        conn = _writer_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        _writes += 1
+
+
+@contextmanager
+def exclusive():
+    """Escritor del proceso fuera de transacción (VACUUM y otros PRAGMA de mantenimiento);
+    los demás escritores del proceso esperan a que termine."""
+    with _writer_lock:
+        yield _writer_conn()
+
+
+def _version_read() -> int:
+    # Conexión propia, no la del escritor: una transacción larga (importación, lote del archivo)
+    # no frena a quien sólo pregunta si cambió algo. No vale la del lector de cada hilo:
+    # data_version es un contador por conexión y el valor se comparte entre sesiones.
+    global _version_conn
+    if not _schema_ready:
+        _writer_conn()   # esquema listo (sólo espera al escritor la primera vez, fuera de _version_lock)
+    with _version_lock:
+        if _version_conn is None:
+            _version_conn = connect()
+        return _version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+
+def external_version() -> int:
+    """PRAGMA data_version sin el lock de escritura: cambia con cada commit (de este u otro proceso)."""
+    return _version_read()
+
+
+def data_version() -> tuple[int, int]:
+    """(commits vistos por la conexión de versión, escrituras propias): cambia si cambió algo en la DB."""
+    return _version_read(), _writes
+
+
+# ======================= ESQUEMA + MIGRACIÓN =======================
+# Registro ordenado de migraciones; la versión aplicada queda en PRAGMA user_version.
+# Con la DB al día el arranque sólo lee user_version (sin table_info ni ALTERs).
+# Las migraciones normales van juntas en UNA transacción; las de backfill
+# ("chunked") hacen commit cada BACKFILL_CHUNK filas para no bloquear la DB.
+
+BACKFILL_CHUNK = int(os.getenv("SQLITE_BACKFILL_CHUNK", "2000"))
+
+
+def _m001_base(conn: sqlite3.Connection):
+    # Tabla principal (mínimo)
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room TEXT NOT NULL,
+        title TEXT NOT NULL,
+        organizador TEXT NOT NULL,
+        start_dt TEXT NOT NULL,
+        end_dt TEXT NOT NULL,
+        notes TEXT,
+        chair_type TEXT,
+        chair_qty INTEGER,
+        table_type TEXT,
+        table_qty INTEGER
+    )
+    """
+    )
+    # Tabla rooms (capacidad por sala)
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS rooms (
+        room TEXT PRIMARY KEY,
+        type TEXT,
+        capacity INTEGER
+    )
+    """
+    )
+    # DBs anteriores al registro (user_version = 0) pueden tener cualquier subconjunto de columnas
+    cur = conn.execute("PRAGMA table_info(bookings)")
+    cols = {row[1] for row in cur.fetchall()}
+
+    # base + extras
+    if "notes" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN notes TEXT")
+    if "color" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN color TEXT")
+    if "organizador" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN organizador TEXT")
+    if "attendees" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN attendees INTEGER DEFAULT 0")
+        conn.execute("UPDATE bookings SET attendees = 0 WHERE attendees IS NULL")
+    if "phone" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN phone TEXT")
+    if "status" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN status TEXT DEFAULT 'Pendiente'")
+        conn.execute("UPDATE bookings SET status = 'Pendiente' WHERE status IS NULL OR status = ''")
+    if "confirm_token" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN confirm_token TEXT")
+    # Recordatorios 24h
+    if "reminder_24h_sent" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN reminder_24h_sent INTEGER DEFAULT 0")
+    if "reminder_24h_sent_at" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN reminder_24h_sent_at TEXT")
+    # Sillas/Mesas
+    if "chair_type" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN chair_type TEXT")
+    if "chair_qty" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN chair_qty INTEGER DEFAULT 0")
+    if "table_type" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN table_type TEXT")
+    if "table_qty" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN table_qty INTEGER DEFAULT 0")
+    # Epoch canónico (segundos) para comparar rangos con índice
+    if "start_ts" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN start_ts INTEGER")
+    if "end_ts" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN end_ts INTEGER")
+    # Clave de idempotencia del cliente (doble clic / reenvío del formulario)
+    if "idempotency_key" not in cols:
+        conn.execute("ALTER TABLE bookings ADD COLUMN idempotency_key TEXT")
+
+
+def _m002_backfill_ts(conn: sqlite3.Connection):
+    # Por tramos de id: cada tramo es su propia transacción (reanudable si se corta)
+    last_id = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM bookings WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, BACKFILL_CHUNK),
+            ).fetchone()
+            if row[0] is not None:
+                conn.execute(
+                    "UPDATE bookings SET start_ts = CAST(strftime('%s', start_dt) AS INTEGER), "
+                    "end_ts = CAST(strftime('%s', end_dt) AS INTEGER) "
+                    "WHERE id > ? AND id <= ? AND (start_ts IS NULL OR end_ts IS NULL)",
+                    (last_id, row[0]),
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if row[0] is None:
+            return
+        last_id = row[0]
+
+
+def _m003_indexes_and_aux(conn: sqlite3.Connection):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_room_span ON bookings(room, start_ts, end_ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_start ON bookings(start_ts)")
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_idem ON bookings(idempotency_key) "
+        "WHERE idempotency_key IS NOT NULL"
+    )
+    # Los recordatorios se calculan desde start_ts: van después del backfill
+    ensure_reminders_schema(conn)
+    ensure_outbox_schema(conn)
+    ensure_rooms_seed(conn)
+
+
+def _m004_token_index(conn: sqlite3.Connection):
+    # Enlaces Confirmar/Cancelar: búsqueda por token con índice (y sin tokens repetidos)
+    conn.execute("UPDATE bookings SET confirm_token = NULL WHERE confirm_token = ''")
+    conn.execute(
+        "UPDATE bookings SET confirm_token = lower(hex(randomblob(16))) "
+        "WHERE confirm_token IS NOT NULL AND id NOT IN "
+        "(SELECT MIN(id) FROM bookings WHERE confirm_token IS NOT NULL GROUP BY confirm_token)"
+    )
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_token ON bookings(confirm_token) "
+        "WHERE confirm_token IS NOT NULL"
+    )
+
+
+def _m005_series(conn: sqlite3.Connection):
+    # Series recurrentes: definición + excepciones por fecha (utils/series.py)
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS series (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room TEXT NOT NULL,
+        title TEXT NOT NULL,
+        organizador TEXT NOT NULL,
+        start_dt TEXT NOT NULL,
+        duration_s INTEGER NOT NULL,
+        freq TEXT NOT NULL,
+        every INTEGER NOT NULL DEFAULT 1,
+        byweekday TEXT,
+        until TEXT,
+        count INTEGER,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        color TEXT,
+        attendees INTEGER DEFAULT 0,
+        phone TEXT,
+        status TEXT DEFAULT 'Pendiente',
+        notes TEXT,
+        chair_type TEXT,
+        chair_qty INTEGER DEFAULT 0,
+        table_type TEXT,
+        table_qty INTEGER DEFAULT 0,
+        created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+    )
+    """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_series_room_span ON series(room, start_ts, end_ts)")
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS series_exceptions (
+        series_id INTEGER NOT NULL,
+        occ_date TEXT NOT NULL,
+        booking_id INTEGER,
+        PRIMARY KEY (series_id, occ_date)
+    )
+    """
+    )
+
+
+def _m006_occupancy(conn: sqlite3.Connection):
+    # Agregados de ocupación por (sala, hora); se llenan una vez con lo existente
+    ensure_occupancy_schema(conn)
+
+
+def _m007_list_indexes(conn: sqlite3.Connection):
+    # Lista paginada: orden por estado sin ordenar en memoria (room/start ya usan idx_bookings_room_span)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_status_start ON bookings(status, start_ts)")
+
+
+def _m008_search(conn: sqlite3.Connection):
+    # Índice FTS5 + triggers; se llena una vez con el historial existente
+    ensure_search_schema(conn)
+
+
+def _m009_bookings_rev(conn: sqlite3.Connection):
+    # Contador que sólo sube con cambios que afectan al índice de intervalos
+    # (alta/baja o cambio de sala, horario o estado); recordatorios y outbox no lo tocan
+    conn.execute("CREATE TABLE IF NOT EXISTS bookings_rev (id INTEGER PRIMARY KEY CHECK (id = 1), rev INTEGER NOT NULL)")
+    conn.execute("INSERT OR IGNORE INTO bookings_rev (id, rev) VALUES (1, 0)")
+    for name, event in (
+        ("trg_bookings_rev_ins", "AFTER INSERT"),
+        ("trg_bookings_rev_del", "AFTER DELETE"),
+        ("trg_bookings_rev_upd", "AFTER UPDATE OF room, start_ts, end_ts, status"),
+    ):
+        conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {event} ON bookings "
+            "BEGIN UPDATE bookings_rev SET rev = rev + 1 WHERE id = 1; END"
+        )
+
+
+# (versión, función, chunked): nunca reordenar ni editar una ya publicada; añadir al final
+MIGRATIONS = [
+    (1, _m001_base, False),
+    (2, _m002_backfill_ts, True),
+    (3, _m003_indexes_and_aux, False),
+    (4, _m004_token_index, False),
+    (5, _m005_series, False),
+    (6, _m006_occupancy, False),
+    (7, _m007_list_indexes, False),
+    (8, _m008_search, False),
+    (9, _m009_bookings_rev, False),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _set_version(conn: sqlite3.Connection, version: int):
+    conn.execute(f"PRAGMA user_version = {int(version)}")
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """Aplica las migraciones pendientes. `conn` en modo autocommit (el escritor)."""
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return
+    i = 0
+    while i < len(MIGRATIONS):
+        version, fn, chunked = MIGRATIONS[i]
+        if chunked:
+            # Se relee dentro de cada paso: otro proceso pudo migrar a la vez
+            if schema_version(conn) < version:
+                fn(conn)
+                conn.execute("BEGIN IMMEDIATE")
+                if schema_version(conn) < version:
+                    _set_version(conn, version)
+                conn.execute("COMMIT")
+            i += 1
+            continue
+        # Tramo de migraciones normales consecutivas: una sola transacción
+        j = i
+        while j < len(MIGRATIONS) and not MIGRATIONS[j][2]:
+            j += 1
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = schema_version(conn)
+            for version, fn, _chunked in MIGRATIONS[i:j]:
+                if version > current:
+                    fn(conn)
+                    _set_version(conn, version)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        i = j
+
+
+def ensure_archive(conn: sqlite3.Connection):
+    """Esquema del archivo frío al día con el caliente (su user_version guarda SCHEMA_VERSION)."""
+    if archive_version(conn) >= SCHEMA_VERSION:
+        return
+    conn.execute("PRAGMA archive.journal_mode = WAL")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if archive_version(conn) < SCHEMA_VERSION:
+            ensure_archive_schema(conn)
+            ensure_search_schema(conn, "archive")
+            conn.execute(f"PRAGMA archive.user_version = {int(SCHEMA_VERSION)}")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def ensure_rooms_seed(conn: sqlite3.Connection):
+    # Defaults por prefijo si no hay override exacto
+    default_by_prefix = {
+        "Glass Room": ("Sala Acristalada", 12),
+        "Winners": ("Salón Conferencias", 60),
+        "Ballito": ("Área Abierta", 100),
+    }
+
+    for r in ROOMS:
+        cur = conn.execute("SELECT room, type, capacity FROM rooms WHERE room = ?", (r,))
+        row = cur.fetchone()
+
+        if not row:
+            # 1) Override exacto por nombre
+            if r in ROOM_CAPACITY_DEFAULTS:
+                tipo = None
+                cap = ROOM_CAPACITY_DEFAULTS[r]
+            else:
+                # 2) Fallback por prefijo
+                tipo, cap = None, 30
+                for pref, (t, c) in default_by_prefix.items():
+                    if r.startswith(pref):
+                        tipo, cap = t, c
+                        break
+            conn.execute("INSERT INTO rooms(room, type, capacity) VALUES(?,?,?)", (r, tipo, cap))
+        else:
+            # Si ya existe y capacity es NULL, completa
+            _, tipo, cap_actual = row
+            if cap_actual is None:
+                if r in ROOM_CAPACITY_DEFAULTS:
+                    cap = ROOM_CAPACITY_DEFAULTS[r]
+                else:
+                    cap = 30
+                    for pref, (_t, _c) in default_by_prefix.items():
+                        if r.startswith(pref):
+                            cap = _c
+                            break
+                conn.execute("UPDATE rooms SET capacity=? WHERE room=?", (cap, r))
@@ -0,0 +1,248 @@
+# utils/intervals.py
+# ------------------------------------------------------------
+# Índice de intervalos en memoria por sala (treap aumentado con max_end)
+# - Misma semántica que has_overlap en SQL: [start, end) choca si
+#   start < otro.end y end > otro.start
+# - Consultas O(log n + k) sin tocar SQLite
+# - Las reservas canceladas van en un árbol aparte para poder ignorarlas
+# - Sirve a las lecturas (disponibilidad, has_overlap/list_overlaps); reserve()
+#   valida el choque en SQL dentro de su BEGIN IMMEDIATE, que es la fuente de verdad
+# ------------------------------------------------------------
+import random
+import threading
+
+CANCELLED = "Cancelado"
+
+
+class _Node:
+    __slots__ = ("key", "end", "prio", "left", "right", "max_end")
+
+    def __init__(self, key, end):
+        self.key = key          # (start_ts, booking_id)
+        self.end = end
+        self.prio = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _pull(n):
+    m = n.end
+    if n.left is not None and n.left.max_end > m:
+        m = n.left.max_end
+    if n.right is not None and n.right.max_end > m:
+        m = n.right.max_end
+    n.max_end = m
+
+
+def _split(n, key):
+    """Divide en (< key, >= key)."""
+    if n is None:
+        return None, None
+    if n.key < key:
+        l, r = _split(n.right, key)
+        n.right = l
+        _pull(n)
+        return n, r
+    l, r = _split(n.left, key)
+    n.left = r
+    _pull(n)
+    return l, n
+
+
+def _merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b)
+        _pull(a)
+        return a
+    b.left = _merge(a, b.left)
+    _pull(b)
+    return b
+
+
+def _build(items):
+    """Treap desde [(start, id, end)] ya ordenado, en O(n) (pila del borde derecho)."""
+    stack = []
+    for s, bid, e in items:
+        node = _Node((s, bid), e)
+        last = None
+        while stack and stack[-1].prio < node.prio:
+            last = stack.pop()
+            _pull(last)
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    for n in reversed(stack):
+        _pull(n)
+    return stack[0] if stack else None
+
+
+class IntervalTree:
+    """Intervalos [start, end) de una sala, identificados por booking id."""
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    @classmethod
+    def from_sorted(cls, items):
+        """items: [(start, booking_id, end)] ordenado por (start, booking_id)."""
+        t = cls()
+        t._root = _build(items)
+        t._size = len(items)
+        return t
+
+    def __len__(self):
+        return self._size
+
+    def insert(self, booking_id: int, start: int, end: int):
+        node = _Node((start, booking_id), end)
+        l, r = _split(self._root, node.key)
+        self._root = _merge(_merge(l, node), r)
+        self._size += 1
+
+    def remove(self, booking_id: int, start: int):
+        key = (start, booking_id)
+        l, r = _split(self._root, key)
+        mid, r = _split(r, (start, booking_id + 1))
+        if mid is not None:
+            self._size -= 1
+        self._root = _merge(l, r)
+
+    def overlaps(self, start: int, end: int, ignore_id=None, first_only=False) -> list:
+        """IDs cuyo intervalo choca con [start, end), ordenados por inicio."""
+        out = []
+        stack = []
+        n = self._root
+        # Recorrido in-order podando subárboles con max_end <= start
+        # y subárboles derechos cuyo inicio ya es >= end.
+        while stack or n is not None:
+            while n is not None and n.max_end > start:
+                stack.append(n)
+                n = n.left
+            if not stack:
+                break
+            n = stack.pop()
+            s, bid = n.key
+            if s >= end:
+                break
+            if n.end > start and bid != ignore_id:
+                out.append(bid)
+                if first_only:
+                    break
+            n = n.right
+        return out
+
+
+class BookingIndex:
+    """Árboles de intervalos por sala + mapa id -> (room, start, end, status)."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._trees = {}    # (room, cancelled: bool) -> IntervalTree
+        self._by_id = {}
+        self.synced_version = None   # PRAGMA data_version de la última comprobación
+        self.synced_rev = None       # bookings_rev.rev que reflejan los árboles
+
+    @classmethod
+    def from_conn(cls, conn):
+        idx = cls()
+        idx.reload(conn)
+        return idx
+
+    def reload(self, conn):
+        # rev antes que las filas: si alguien escribe entre medias, el rev queda viejo y se recarga otra vez
+        rev = conn.execute("SELECT rev FROM bookings_rev").fetchone()[0]
+        rows = conn.execute("SELECT id, room, start_ts, end_ts, status FROM bookings").fetchall()
+        by_id, groups = {}, {}
+        for bid, room, s, e, status in rows:
+            if s is None or e is None:
+                continue
+            by_id[bid] = (room, s, e, status)
+            groups.setdefault((room, status == CANCELLED), []).append((s, bid, e))
+        # Carga en bloque (ordenar + construir) en vez de n inserciones
+        trees = {k: IntervalTree.from_sorted(sorted(v)) for k, v in groups.items()}
+        with self._lock:
+            self._trees = trees
+            self._by_id = by_id
+            self.synced_rev = rev
+
+    def _tree(self, room, cancelled):
+        key = (room, cancelled)
+        t = self._trees.get(key)
+        if t is None:
+            t = self._trees[key] = IntervalTree()
+        return t
+
+    def _add(self, bid, room, s, e, status):
+        self._by_id[bid] = (room, s, e, status)
+        self._tree(room, status == CANCELLED).insert(bid, s, e)
+
+    def _drop(self, bid):
+        prev = self._by_id.pop(bid, None)
+        if prev is not None:
+            room, s, _e, status = prev
+            self._tree(room, status == CANCELLED).remove(bid, s)
+
+    # ---- sincronización con las escrituras ----
+    # rev=(antes, después) de la escritura propia, leídos dentro de su transacción. Si el índice
+    # no estaba en `antes` (otro escritor se coló) no se aplica: el próximo reload lo pone al día.
+    def _follows(self, rev) -> bool:
+        if rev is None:
+            return True
+        if self.synced_rev != rev[0]:
+            return False
+        self.synced_rev = rev[1]
+        return True
+
+    def upsert(self, booking_id: int, room: str, start_ts: int, end_ts: int, status: str | None = None, rev=None):
+        with self._lock:
+            if not self._follows(rev):
+                return
+            bid = int(booking_id)
+            self._drop(bid)
+            self._add(bid, room, int(start_ts), int(end_ts), status)
+
+    def remove(self, booking_id: int, rev=None):
+        with self._lock:
+            if self._follows(rev):
+                self._drop(int(booking_id))
+
+    def set_status(self, booking_id: int, status: str, rev=None):
+        with self._lock:
+            if not self._follows(rev):
+                return
+            prev = self._by_id.get(int(booking_id))
+            if prev is not None:
+                room, s, e, _old = prev
+                self.upsert(booking_id, room, s, e, status)
+
+    # ---- consultas ----
+    def conflicts(self, room, start_ts, end_ts, ignore_id=None, include_cancelled=True) -> list:
+        with self._lock:
+            out = []
+            for cancelled in ((False, True) if include_cancelled else (False,)):
+                t = self._trees.get((room, cancelled))
+                if t is not None:
+                    out.extend(t.overlaps(int(start_ts), int(end_ts), ignore_id))
+            if include_cancelled:
+                out.sort(key=lambda b: (self._by_id[b][1], b))
+            return out
+
+    def busy(self, room, start_ts, end_ts, include_cancelled=True) -> list:
+        """[(start, end)] ordenado por inicio de las reservas de `room` que tocan [start_ts, end_ts)."""
+        with self._lock:
+            return [self._by_id[b][1:3] for b in self.conflicts(room, start_ts, end_ts, include_cancelled=include_cancelled)]
+
+    def has_conflict(self, room, start_ts, end_ts, ignore_id=None, include_cancelled=True) -> bool:
+        with self._lock:
+            for cancelled in ((False, True) if include_cancelled else (False,)):
+                t = self._trees.get((room, cancelled))
+                if t is not None and t.overlaps(int(start_ts), int(end_ts), ignore_id, first_only=True):
+                    return True
+            return False
@@ -0,0 +1,149 @@
+# utils/occupancy.py
+# ------------------------------------------------------------
+# Agregados de ocupación por (sala, hora): base de utils/analytics.py
+# - occupancy_hourly: segundos ocupados, personas·s, sillas·s, mesas·s por hora epoch
+# - occupancy_applied: lo que cada reserva aportó (para restarlo al editar/borrar)
+# - refresh()/drop()/apply_new() se llaman dentro de la misma transacción que la
+#   escritura de la reserva: nada se recalcula re-escaneando el historial
+# - Sólo reservas activas (las canceladas no ocupan); las series se suman al leer
+# ------------------------------------------------------------
+import sqlite3
+
+import numpy as np
+
+from utils.reminders import ACTIVE_STATUSES
+
+HOUR = 3600
+# Columnas de la reserva que determinan su aporte
+_SRC = "room, start_ts, end_ts, COALESCE(attendees, 0), COALESCE(chair_qty, 0), COALESCE(table_qty, 0)"
+_UPSERT = (
+    "INSERT INTO occupancy_hourly(room, hour, busy_s, people_s, chairs_s, tables_s) VALUES (?,?,?,?,?,?) "
+    "ON CONFLICT(room, hour) DO UPDATE SET busy_s = busy_s + excluded.busy_s, "
+    "people_s = people_s + excluded.people_s, chairs_s = chairs_s + excluded.chairs_s, "
+    "tables_s = tables_s + excluded.tables_s"
+)
+
+
+def ensure_occupancy_schema(conn: sqlite3.Connection):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'occupancy_hourly'"
+    ).fetchone()
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS occupancy_hourly (
+        room TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        busy_s INTEGER NOT NULL DEFAULT 0,
+        people_s INTEGER NOT NULL DEFAULT 0,
+        chairs_s INTEGER NOT NULL DEFAULT 0,
+        tables_s INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (room, hour)
+    ) WITHOUT ROWID
+    """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_occupancy_hour ON occupancy_hourly(hour)")
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS occupancy_applied (
+        booking_id INTEGER PRIMARY KEY,
+        room TEXT NOT NULL,
+        start_ts INTEGER NOT NULL,
+        end_ts INTEGER NOT NULL,
+        attendees INTEGER NOT NULL,
+        chair_qty INTEGER NOT NULL,
+        table_qty INTEGER NOT NULL
+    )
+    """
+    )
+    if not exists:
+        apply_new(conn, 0)
+
+
+def explode(rooms, s, e, people, chairs, tables):
+    """Reparte intervalos [s, e) en horas epoch y suma por (sala, hora). Vectorizado.
+
+    Devuelve (room, hour, busy_s, people_s, chairs_s, tables_s) como arrays."""
+    s = np.asarray(s, dtype=np.int64)
+    e = np.asarray(e, dtype=np.int64)
+    keep = e > s
+    rooms = np.asarray(rooms, dtype=object)[keep]
+    s, e = s[keep], e[keep]
+    weights = np.column_stack([
+        np.asarray(people, dtype=np.int64)[keep],
+        np.asarray(chairs, dtype=np.int64)[keep],
+        np.asarray(tables, dtype=np.int64)[keep],
+    ])
+    if not len(s):
+        empty = np.array([], dtype=np.int64)
+        return np.array([], dtype=object), empty, empty, empty, empty, empty
+    h0 = s // HOUR
+    n_h = (e - 1) // HOUR - h0 + 1
+    owner = np.repeat(np.arange(len(s)), n_h)
+    offset = np.arange(len(owner)) - np.repeat(np.cumsum(n_h) - n_h, n_h)
+    hour = h0[owner] + offset
+    secs = np.minimum(e[owner], (hour + 1) * HOUR) - np.maximum(s[owner], hour * HOUR)
+    room_names, room_code = np.unique(rooms, return_inverse=True)
+    # Suma por (sala, hora) con una clave entera combinada
+    key = room_code[owner].astype(np.int64) * (1 << 40) + hour
+    uniq, inv = np.unique(key, return_inverse=True)
+    busy = np.bincount(inv, weights=secs).astype(np.int64)
+    w = [np.bincount(inv, weights=secs * weights[owner, k]).astype(np.int64) for k in range(3)]
+    return room_names[uniq >> 40], uniq & ((1 << 40) - 1), busy, *w
+
+
+def _apply(w, rows, sign: int):
+    # rows: [(room, start_ts, end_ts, attendees, chair_qty, table_qty)]
+    if not rows:
+        return
+    cols = list(zip(*rows))
+    room, hour, *vals = explode(*cols)
+    vals = [v * sign for v in vals]
+    w.executemany(_UPSERT, zip(room.tolist(), hour.tolist(), *(v.tolist() for v in vals)))
+    if sign < 0:
+        w.executemany(
+            "DELETE FROM occupancy_hourly WHERE room = ? AND hour = ? AND busy_s <= 0",
+            zip(room.tolist(), hour.tolist()),
+        )
+
+
+def _current(w, where: str, params) -> list:
+    return w.execute(
+        f"SELECT id, {_SRC} FROM bookings WHERE status IN (?, ?) AND start_ts IS NOT NULL "
+        f"AND end_ts > start_ts{where}",
+        [*ACTIVE_STATUSES, *params],
+    ).fetchall()
+
+
+def apply_new(w, first_id):
+    """Suma de una vez las reservas insertadas en bloque (ids >= first_id)."""
+    rows = _current(w, " AND id >= ?", [first_id])
+    _apply(w, [r[1:] for r in rows], 1)
+    w.executemany("INSERT OR REPLACE INTO occupancy_applied VALUES (?,?,?,?,?,?,?)", rows)
+
+
+def refresh(w, booking_id):
+    """Rehace el aporte de una reserva tras crearla/editarla/cambiar estado (resta el anterior)."""
+    old = w.execute(
+        "SELECT room, start_ts, end_ts, attendees, chair_qty, table_qty FROM occupancy_applied WHERE booking_id = ?",
+        (booking_id,),
+    ).fetchone()
+    new = _current(w, " AND id = ?", [booking_id])
+    new = new[0][1:] if new else None
+    if old == new:
+        return
+    if old:
+        _apply(w, [old], -1)
+        w.execute("DELETE FROM occupancy_applied WHERE booking_id = ?", (booking_id,))
+    if new:
+        _apply(w, [new], 1)
+        w.execute("INSERT INTO occupancy_applied VALUES (?,?,?,?,?,?,?)", (booking_id, *new))
+
+
+def drop(w, booking_id):
+    old = w.execute(
+        "SELECT room, start_ts, end_ts, attendees, chair_qty, table_qty FROM occupancy_applied WHERE booking_id = ?",
+        (booking_id,),
+    ).fetchone()
+    if old:
+        _apply(w, [old], -1)
+        w.execute("DELETE FROM occupancy_applied WHERE booking_id = ?", (booking_id,))
@@ -0,0 +1,201 @@
+# utils/outbox.py
+# ------------------------------------------------------------
+# Outbox durable de notificaciones salientes (WhatsApp Cloud API)
+# - enqueue() se llama dentro de la transacción que cambia la reserva
+# - drain() envía en lotes con backoff exponencial y dead-letter
+# - Cada mensaje tiene una idempotency_key única (INSERT OR IGNORE)
+# - Un recordatorio cuya reserva se canceló/reprogramó después de encolarlo
+#   no sale: se marca 'skipped' al tomar el lote
+# ------------------------------------------------------------
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "50"))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_S = int(os.getenv("OUTBOX_BACKOFF_S", "30"))
+BACKOFF_MAX_S = int(os.getenv("OUTBOX_BACKOFF_MAX_S", "3600"))
+LEASE_MARGIN_S = int(os.getenv("OUTBOX_LEASE_MARGIN_S", "60"))
+STATUSES = ("pending", "sending", "sent", "dead", "skipped")
+
+_NOW_SQL = "CAST(strftime('%s', 'now', 'localtime') AS INTEGER)"
+
+
+def ensure_outbox_schema(conn: sqlite3.Connection):
+    conn.execute(
+        f"""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        kind TEXT NOT NULL,
+        booking_id INTEGER,
+        ref_id INTEGER,
+        phone TEXT NOT NULL,
+        body TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at INTEGER NOT NULL DEFAULT ({_NOW_SQL}),
+        last_error TEXT,
+        created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+        sent_at TEXT
+    )
+    """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_next ON outbox(next_attempt_at) "
+        "WHERE status IN ('pending', 'sending')"
+    )
+
+
+def enqueue(w, key: str, kind: str, phone: str, body: str, booking_id=None, ref_id=None) -> bool:
+    """Encola un mensaje en la transacción `w`. False si la clave ya existía."""
+    cur = w.execute(
+        "INSERT OR IGNORE INTO outbox(idempotency_key, kind, booking_id, ref_id, phone, body) VALUES (?,?,?,?,?,?)",
+        (key, kind, booking_id, ref_id, phone, body),
+    )
+    return cur.rowcount > 0
+
+
+def enqueue_reminder(w, booking_id, phone, body, reminder_id=None, fallback_key=None) -> bool:
+    # Con fila en `reminders` la clave es la misma que usa el scheduler (no se duplica)
+    key = f"reminder:{reminder_id}" if reminder_id is not None else fallback_key
+    ok = enqueue(w, key, "reminder", phone, body, booking_id=booking_id, ref_id=reminder_id)
+    if reminder_id is not None:
+        w.execute("UPDATE reminders SET status = 'queued' WHERE id = ? AND status = 'pending'", (reminder_id,))
+    return ok
+
+
+def backoff_s(attempts: int) -> int:
+    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** max(0, attempts - 1)))
+    return int(delay * random.uniform(1.0, 1.1))
+
+
+def lease_s(n: int) -> int:
+    """Segundos que se reservan n filas 'sending': el peor caso del lote (tandas de MAX_WORKERS que
+    agotan TIMEOUT_S + el ritmo de RATE_PER_SEC) más un margen. Si el worker muere, vencen y se reintentan."""
+    from utils.whatsapp import MAX_WORKERS, RATE_PER_SEC, TIMEOUT_S
+
+    waves = -(-n // max(1, MAX_WORKERS))
+    pacing = n / RATE_PER_SEC if RATE_PER_SEC > 0 else 0
+    return int(waves * TIMEOUT_S + pacing) + LEASE_MARGIN_S
+
+
+def counts(conn) -> dict:
+    """{status: n} para todos los estados (0 si no hay filas)."""
+    out = dict.fromkeys(STATUSES, 0)
+    out.update(dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()))
+    return out
+
+
+def next_attempt_at(conn) -> int | None:
+    row = conn.execute(
+        "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN ('pending', 'sending')"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _on_sent(w, ids, sent_at):
+    # Efectos de dominio al confirmar el envío
+    marks = ",".join("?" * len(ids))
+    w.execute(
+        f"UPDATE reminders SET status = 'sent', sent_at = ? WHERE id IN "
+        f"(SELECT ref_id FROM outbox WHERE id IN ({marks}) AND kind = 'reminder' AND ref_id IS NOT NULL)",
+        [sent_at, *ids],
+    )
+    # Columna reminder_24h_sent que muestra la página (envío manual o offset de 24 h)
+    w.execute(
+        f"""
+        UPDATE bookings SET reminder_24h_sent = 1, reminder_24h_sent_at = ?
+         WHERE id IN (
+            SELECT o.booking_id FROM outbox o LEFT JOIN reminders r ON r.id = o.ref_id
+             WHERE o.id IN ({marks}) AND o.kind = 'reminder' AND (o.ref_id IS NULL OR r.offset_h = 24)
+         )
+        """,
+        [sent_at, *ids],
+    )
+
+
+def _stale_reminders(w, ids) -> list:
+    # Recordatorios que ya no tocan: reserva borrada/archivada o no activa, o su fila de
+    # reminders desapareció o es de otra hora de inicio (reschedule la borra al mover la reserva)
+    if not ids:
+        return []
+    from utils.reminders import ACTIVE_STATUSES
+
+    marks = ",".join("?" * len(ids))
+    return [i for (i,) in w.execute(
+        f"""
+        SELECT o.id FROM outbox o
+          LEFT JOIN bookings b ON b.id = o.booking_id
+          LEFT JOIN reminders r ON r.id = o.ref_id
+         WHERE o.id IN ({marks}) AND o.kind = 'reminder'
+           AND (b.id IS NULL OR b.status NOT IN (?, ?)
+                OR (o.ref_id IS NOT NULL AND (r.id IS NULL OR r.start_ts != b.start_ts)))
+        """,
+        [*ids, *ACTIVE_STATUSES],
+    )]
+
+
+def drain(limit: int = OUTBOX_BATCH) -> dict:
+    """Envía un lote de mensajes vencidos. Devuelve {'sent': n, 'retry': n, 'dead': n, 'skipped': n}."""
+    from utils.db import transaction, to_ts
+    from utils.whatsapp import send_batch
+
+    now = to_ts(datetime.now())
+    with transaction() as w:
+        rows = w.execute(
+            "SELECT id, phone, body, attempts, kind FROM outbox "
+            "WHERE status IN ('pending', 'sending') AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, id LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        # Se revalida aquí, bajo el mismo BEGIN IMMEDIATE que toma el lote
+        stale = _stale_reminders(w, [r[0] for r in rows if r[4] == "reminder"])
+        if stale:
+            marks = ",".join("?" * len(stale))
+            w.execute(
+                f"UPDATE reminders SET status = 'skipped' WHERE id IN "
+                f"(SELECT ref_id FROM outbox WHERE id IN ({marks}) AND ref_id IS NOT NULL)",
+                stale,
+            )
+            w.execute(
+                "UPDATE outbox SET status = 'skipped', last_error = 'Reserva cancelada o reprogramada' "
+                f"WHERE id IN ({marks})",
+                stale,
+            )
+            skipped = set(stale)
+            rows = [r for r in rows if r[0] not in skipped]
+        w.executemany(
+            "UPDATE outbox SET status = 'sending', next_attempt_at = ? WHERE id = ?",
+            [(now + lease_s(len(rows)), r[0]) for r in rows],
+        )
+    if not rows:
+        return {"sent": 0, "retry": 0, "dead": 0, "skipped": len(stale)}
+
+    sent, failed = send_batch([(r[0], r[1], r[2]) for r in rows])
+    attempts = {r[0]: r[3] + 1 for r in rows}
+    sent_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    now = to_ts(datetime.now())
+    retry = [(e[:500], attempts[i], now + backoff_s(attempts[i]), i) for i, e in failed if attempts[i] < MAX_ATTEMPTS]
+    dead = [(e[:500], attempts[i], i) for i, e in failed if attempts[i] >= MAX_ATTEMPTS]
+    with transaction() as w:
+        w.executemany(
+            "UPDATE outbox SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL WHERE id = ?",
+            [(sent_at, i) for i in sent],
+        )
+        w.executemany(
+            "UPDATE outbox SET status = 'pending', last_error = ?, attempts = ?, next_attempt_at = ? WHERE id = ?",
+            retry,
+        )
+        w.executemany("UPDATE outbox SET status = 'dead', last_error = ?, attempts = ? WHERE id = ?", dead)
+        if sent:
+            _on_sent(w, sent, sent_at)
+        if dead:
+            marks = ",".join("?" * len(dead))
+            w.execute(
+                f"UPDATE reminders SET status = 'failed' WHERE id IN "
+                f"(SELECT ref_id FROM outbox WHERE id IN ({marks}) AND kind = 'reminder')",
+                [d[2] for d in dead],
+            )
+    return {"sent": len(sent), "retry": len(retry), "dead": len(dead), "skipped": len(stale)}
@@ -0,0 +1,268 @@
+# utils/profiling.py
+# ------------------------------------------------------------
+# Perfil por rerun (opcional): PROFILE_RERUNS=1
+# - Tiempo de cada sección de la página (y de cada rerun de fragmento)
+# - Cada sentencia SQL vía el trace callback de sqlite3, con duración y filas
+#   (las conexiones de utils.db usan ProfiledConnection sólo si está activo)
+# - Un registro JSON por rerun en DATA_DIR/profile.jsonl (PROFILE_LOG para cambiarlo)
+#   OJO: el SQL va con los valores enlazados (teléfonos, nombres): sólo para depurar
+# - Desactivado: section()/timed() devuelven un no-op/la función tal cual
+#   y las conexiones son sqlite3.Connection normales
+# ------------------------------------------------------------
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+ENABLED = os.getenv("PROFILE_RERUNS", "0") == "1"
+SQL_TEXT_MAX = 500
+SQL_MAX = int(os.getenv("PROFILE_MAX_SQL", "2000"))   # por rerun; el resto sólo se cuenta
+
+_local = threading.local()
+_log_lock = threading.Lock()
+_history = {}                          # sesión -> últimos registros (reruns de fragmento incluidos)
+HISTORY_MAX = 20
+_NOOP = nullcontext()
+
+
+class _Run:
+    def __init__(self, page: str, kind: str):
+        self.page = page
+        self.kind = kind               # "run" (script completo) | "fragment"
+        self.started = time.perf_counter()
+        self.ts = datetime.now().isoformat(timespec="milliseconds")
+        self.sections = []             # {name, depth, ms}
+        self.sql = []                  # {sql, section, ms, rows}
+        self.sql_dropped = 0
+        self.stack = []
+
+    def record(self) -> dict:
+        sql_ms = sum(s["ms"] or 0 for s in self.sql)
+        return {
+            "ts": self.ts,
+            "page": self.page,
+            "kind": self.kind,
+            "session": _session_id(),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "sections": self.sections,
+            "sql_count": len(self.sql),
+            "sql_ms": round(sql_ms, 3),
+            "sql_dropped": self.sql_dropped,
+            "sql": self.sql,
+        }
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx()
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+def _log_path():
+    if os.getenv("PROFILE_LOG"):
+        return os.getenv("PROFILE_LOG")
+    from utils.db import DATA_DIR   # tarde: utils.db importa este módulo
+
+    return DATA_DIR / "profile.jsonl"
+
+
+def current():
+    return getattr(_local, "run", None)
+
+
+# ======================= RERUNS Y SECCIONES =======================
+
+def start_run(page: str, kind: str = "run"):
+    """Abre el registro del rerun del hilo actual (cierra uno que quedó abierto por st.stop)."""
+    if not ENABLED:
+        return
+    if current() is not None:
+        finish_run()
+    _local.run = _Run(page, kind)
+
+
+def finish_run() -> dict | None:
+    """Cierra el rerun actual, lo escribe en el JSONL y lo devuelve."""
+    run = current()
+    if run is None:
+        return None
+    _local.run = None
+    rec = run.record()
+    line = json.dumps(rec, ensure_ascii=False, default=str)
+    with _log_lock:
+        with open(_log_path(), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        hist = _history.setdefault(rec["session"], deque(maxlen=HISTORY_MAX))
+        hist.append({k: rec[k] for k in ("ts", "kind", "total_ms", "sql_count", "sql_ms")}
+                    | {"sections": ", ".join(s["name"] for s in rec["sections"] if s["depth"] == 0)})
+    return rec
+
+
+def recent(session) -> list:
+    """Resumen de los últimos registros de la sesión (el más reciente al final)."""
+    with _log_lock:
+        return list(_history.get(session, ()))
+
+
+@contextmanager
+def _section(name: str):
+    run = current()
+    if run is None:
+        yield
+        return
+    entry = {"name": name, "depth": len(run.stack), "ms": None}
+    run.sections.append(entry)
+    run.stack.append(name)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        run.stack.pop()
+
+
+def section(name: str):
+    """`with section("lista"): ...` — no-op si el perfil está apagado."""
+    return _section(name) if ENABLED else _NOOP
+
+
+def timed(name: str, page: str = "Reservas"):
+    """Decorador de sección. Llamada fuera de un rerun (fragmento que se re-ejecuta solo):
+    abre y cierra su propio registro. Apagado devuelve la función sin envolver."""
+
+    def deco(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current() is not None:
+                with _section(name):
+                    return fn(*args, **kwargs)
+            start_run(page, kind="fragment")
+            try:
+                with _section(name):
+                    return fn(*args, **kwargs)
+            finally:
+                finish_run()
+
+        return wrapper
+
+    return deco
+
+
+# ======================= SQL =======================
+
+def _on_statement(stmt: str):
+    # Trace callback de sqlite3: una llamada por sentencia ejecutada (también cada fila de executemany)
+    run = current()
+    if run is None:
+        return
+    if len(run.sql) >= SQL_MAX:
+        run.sql_dropped += 1
+        return
+    run.sql.append({
+        "sql": " ".join(stmt.split())[:SQL_TEXT_MAX],
+        "section": run.stack[-1] if run.stack else None,
+        "ms": None,
+        "rows": None,
+    })
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Pone duración y filas a las sentencias que el trace callback registró durante cada llamada."""
+
+    _entries = ()
+
+    def _timed_call(self, method, *args):
+        run = current()
+        if run is None:
+            return method(self, *args)
+        first = len(run.sql)
+        t0 = time.perf_counter()
+        try:
+            return method(self, *args)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self._entries = run.sql[first:]
+            for e in self._entries:
+                e["ms"] = round(ms / len(self._entries), 3)
+                e["rows"] = 0
+            if self._entries:
+                self._entries[-1]["rows"] = max(self.rowcount, 0)
+
+    def _fetched(self, method, *args):
+        run = current()
+        if run is None or not self._entries:
+            return method(self, *args)
+        t0 = time.perf_counter()
+        rows = method(self, *args)
+        e = self._entries[-1]
+        e["ms"] = round(e["ms"] + (time.perf_counter() - t0) * 1000, 3)
+        e["rows"] += len(rows) if isinstance(rows, list) else int(rows is not None)
+        return rows
+
+    def execute(self, *args):
+        return self._timed_call(sqlite3.Cursor.execute, *args)
+
+    def executemany(self, *args):
+        return self._timed_call(sqlite3.Cursor.executemany, *args)
+
+    def executescript(self, *args):
+        return self._timed_call(sqlite3.Cursor.executescript, *args)
+
+    def fetchone(self):
+        return self._fetched(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetched(sqlite3.Cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetched(sqlite3.Cursor.fetchall)
+
+    def __iter__(self):
+        # Iterar (for row in conn.execute(...)) pasa por fetchone para contar filas
+        return iter(self.fetchone, None)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_on_statement)
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # Connection.execute de C no pasa por Cursor.execute: se redirige para medirlo
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+
+def connection_factory():
+    """Factory para sqlite3.connect(): ProfiledConnection si el perfil está activo."""
+    return ProfiledConnection if ENABLED else sqlite3.Connection
+
+
+# ======================= LECTURA =======================
+
+def slow_statements(rec: dict, limit: int = 15) -> list:
+    """Sentencias más lentas del registro (agrupadas por texto)."""
+    agg = {}
+    for s in rec["sql"]:
+        a = agg.setdefault(s["sql"], {"sql": s["sql"], "section": s["section"], "count": 0, "ms": 0.0, "rows": 0})
+        a["count"] += 1
+        a["ms"] += s["ms"] or 0
+        a["rows"] += s["rows"] or 0
+    return sorted(agg.values(), key=lambda a: a["ms"], reverse=True)[:limit]
@@ -0,0 +1,93 @@
+# utils/reminders.py
+# ------------------------------------------------------------
+# Agenda de recordatorios: una fila por (reserva, offset) con due_at indexado
+# - Offsets configurables: REMINDER_OFFSETS_H="72,24,2"
+# - reschedule()/drop() se llaman dentro de la misma transacción que la
+#   escritura de la reserva (sin re-escaneos periódicos)
+# - Los tiempos son epoch "hora local como UTC", igual que bookings.start_ts
+# ------------------------------------------------------------
+import os
+import sqlite3
+from datetime import datetime
+
+OFFSETS_H = sorted(
+    {int(x) for x in os.getenv("REMINDER_OFFSETS_H", "72,24,2").split(",") if x.strip()},
+    reverse=True,
+)
+ACTIVE_STATUSES = ("Pendiente", "Confirmado")
+
+# "ahora" en la misma convención que to_ts(datetime.now())
+_NOW_SQL = "CAST(strftime('%s', 'now', 'localtime') AS INTEGER)"
+
+
+def ensure_reminders_schema(conn: sqlite3.Connection):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reminders'"
+    ).fetchone()
+    conn.execute(
+        """
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id INTEGER NOT NULL,
+        offset_h INTEGER NOT NULL,
+        start_ts INTEGER NOT NULL,
+        due_at INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        sent_at TEXT,
+        error TEXT,
+        UNIQUE (booking_id, offset_h)
+    )
+    """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_due ON reminders(due_at) WHERE status = 'pending'")
+    if not exists:
+        _schedule(conn, None)
+
+
+def _schedule(w, booking_id, min_id=None):
+    # Inserta los offsets futuros de una reserva (de todas si booking_id es None, o de id >= min_id)
+    if booking_id is not None:
+        where, extra = " AND id = ?", [booking_id]
+    elif min_id is not None:
+        where, extra = " AND id >= ?", [min_id]
+    else:
+        where, extra = "", []
+    for off in OFFSETS_H:
+        w.execute(
+            "INSERT OR IGNORE INTO reminders(booking_id, offset_h, start_ts, due_at) "
+            "SELECT id, ?, start_ts, start_ts - ? FROM bookings "
+            "WHERE status IN (?, ?) AND phone IS NOT NULL AND phone != '' "
+            f"AND start_ts - ? > {_NOW_SQL}" + where,
+            [off, off * 3600, *ACTIVE_STATUSES, off * 3600, *extra],
+        )
+
+
+def schedule_new(w, first_id):
+    """Agenda de una vez las reservas insertadas en bloque (ids >= first_id)."""
+    _schedule(w, None, min_id=first_id)
+
+
+def reschedule(w, booking_id):
+    """Rehace los recordatorios pendientes de una reserva tras crearla/editarla/cambiar estado.
+
+    Los ya enviados se conservan salvo que la hora de inicio haya cambiado."""
+    w.execute(
+        "DELETE FROM reminders WHERE booking_id = ? AND (status = 'pending' OR start_ts != "
+        "(SELECT start_ts FROM bookings WHERE id = ?))",
+        (booking_id, booking_id),
+    )
+    _schedule(w, booking_id)
+
+
+def drop(w, booking_id):
+    w.execute("DELETE FROM reminders WHERE booking_id = ?", (booking_id,))
+
+
+def reminder_text(title, organizador, room, start_dt, attendees) -> str:
+    start = start_dt if isinstance(start_dt, datetime) else datetime.fromisoformat(str(start_dt))
+    return (
+        f"🔔 Recordatorio: {title} ({organizador}) en {room}\n"
+        f"Inicio: {start.strftime('%Y-%m-%d %I:%M %p')}\n"
+        f"Personas: {int(attendees or 0)}\n"
+        f"¡Te esperamos!"
+    )
@@ -0,0 +1,124 @@
+# utils/scheduler.py
+# ------------------------------------------------------------
+# Proceso de recordatorios que corre junto a `streamlit run Home.py`
+#   python -m utils.scheduler
+# - Cola de prioridad (heapq) por due_at; duerme hasta el próximo vencimiento
+# - Nuevas filas se leen por id > último visto cuando cambia PRAGMA data_version
+# - Filas borradas/reprogramadas se descartan al vencer (se revalida en SQL)
+# - Lo vencido se encola en el outbox; el mismo proceso drena el outbox
+# - Cada ARCHIVE_EVERY_H horas mueve al archivo frío lo ya terminado (utils/archive.py)
+# ------------------------------------------------------------
+import heapq
+import logging
+import os
+import time
+from datetime import datetime
+
+from utils import archive, outbox
+from utils.db import connect, get_conn, to_ts, transaction
+from utils.reminders import ACTIVE_STATUSES, reminder_text
+from utils.whatsapp import is_configured
+
+POLL_S = float(os.getenv("REMINDER_POLL_S", "5"))
+GRACE_S = int(os.getenv("REMINDER_GRACE_MIN", "60")) * 60   # tolerancia si el proceso estuvo caído
+ARCHIVE_EVERY_S = float(os.getenv("ARCHIVE_EVERY_H", "24")) * 3600
+
+log = logging.getLogger("eventosapp.scheduler")
+
+
+class ReminderScheduler:
+    def __init__(self):
+        self.heap = []          # (due_at, reminder_id)
+        self.last_id = 0
+        self.version = None
+        self.conn = connect()   # conexión propia: data_version detecta escrituras de la app
+        self.next_archive = 0.0  # monotonic; la primera pasada corre al arrancar
+
+    def load_new(self):
+        v = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if v == self.version:
+            return
+        self.version = v
+        rows = self.conn.execute(
+            "SELECT id, due_at FROM reminders WHERE status = 'pending' AND id > ? ORDER BY id",
+            (self.last_id,),
+        ).fetchall()
+        for rid, due in rows:
+            heapq.heappush(self.heap, (due, rid))
+            self.last_id = max(self.last_id, rid)
+
+    def pop_due(self, now_ts: int) -> list:
+        due = []
+        while self.heap and self.heap[0][0] <= now_ts:
+            due.append(heapq.heappop(self.heap)[1])
+        return due
+
+    def process(self, reminder_ids: list, now_ts: int) -> int:
+        """Encola en el outbox los recordatorios vencidos que siguen vigentes."""
+        marks = ",".join("?" * len(reminder_ids))
+        rows = self.conn.execute(
+            f"""
+            SELECT r.id, r.booking_id, r.offset_h, r.due_at,
+                   b.title, b.organizador, b.room, b.start_dt, b.attendees, b.phone
+              FROM reminders r JOIN bookings b ON b.id = r.booking_id
+             WHERE r.id IN ({marks}) AND r.status = 'pending'
+               AND b.status IN (?, ?) AND b.phone IS NOT NULL AND b.phone != ''
+            """,
+            [*reminder_ids, *ACTIVE_STATUSES],
+        ).fetchall()
+        stale = [r[0] for r in rows if r[3] < now_ts - GRACE_S]
+        live = [r for r in rows if r[3] >= now_ts - GRACE_S]
+        with transaction() as w:
+            for r in live:
+                outbox.enqueue_reminder(w, r[1], r[9], reminder_text(r[4], r[5], r[6], r[7], r[8]), reminder_id=r[0])
+            w.executemany("UPDATE reminders SET status = 'skipped' WHERE id = ?", [(i,) for i in stale])
+        return len(live)
+
+    def maybe_archive(self):
+        if archive.ARCHIVE_AFTER_MONTHS <= 0 or time.monotonic() < self.next_archive:
+            return
+        self.next_archive = time.monotonic() + ARCHIVE_EVERY_S   # un fallo no se reintenta en cada vuelta
+        res = archive.archive_old()
+        if res["moved"]:
+            log.info("Archivo frío: %s", res)
+
+    def run_once(self) -> float:
+        """Procesa lo vencido y devuelve cuántos segundos dormir."""
+        self.maybe_archive()
+        self.load_new()
+        now_ts = to_ts(datetime.now())
+        due = self.pop_due(now_ts)
+        if due:
+            n = self.process(due, now_ts)
+            log.info("Recordatorios encolados: %s/%s", n, len(due))
+        # Sin credenciales los mensajes quedan encolados (no se gastan intentos)
+        res = outbox.drain() if is_configured() else {}
+        if any(res.values()):
+            log.info("Outbox: %s", res)
+        if sum(res.values()) >= outbox.OUTBOX_BATCH:
+            return 0.0   # quedan más vencidos
+        wake = [self.heap[0][0]] if self.heap else []
+        nxt = outbox.next_attempt_at(self.conn) if is_configured() else None
+        if nxt is not None:
+            wake.append(nxt)
+        if not wake:
+            return POLL_S
+        return max(0.0, min(POLL_S, min(wake) - now_ts))
+
+    def run_forever(self):
+        while True:
+            try:
+                time.sleep(self.run_once())
+            except Exception:
+                log.exception("Error en el scheduler de recordatorios")
+                time.sleep(POLL_S)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    get_conn()   # aplica esquema/migración antes de empezar
+    ReminderScheduler().run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# utils/search.py
+# ------------------------------------------------------------
+# Búsqueda de texto completo sobre todo el historial de reservas (SQLite FTS5)
+# - bookings_fts: índice de título, organizador, notas y teléfono
+#   (contenido externo: el texto se lee de la vista bookings_search_src, no se duplica)
+# - Triggers en bookings lo mantienen al día en la misma transacción que la escritura
+# - unicode61 + remove_diacritics: "colon" encuentra "Colón", "reunion" encuentra "Reunión"
+# - Cada palabra busca por prefijo ("riv bod" → "Rivera" + "Boda"); resultados por bm25
+# - El teléfono se indexa entero y por sus últimos 10 y 7 dígitos (sin +1/787)
+# - El archivo frío tiene su propio bookings_fts; search() lo suma si el rango llega a él
+# ------------------------------------------------------------
+import re
+import sqlite3
+from datetime import datetime, time
+
+import pandas as pd
+
+from utils import archive
+
+SEARCH_LIMIT = 50
+# Pesos bm25 por columna (título, organizador, notas, teléfono)
+RANK = "bm25(10.0, 8.0, 2.0, 4.0)"
+_COLS = "title, organizador, notes, phone"
+_PHONE = (
+    "CASE WHEN COALESCE({p}, '') = '' THEN NULL "
+    "ELSE {p} || ' ' || substr({p}, -10) || ' ' || substr({p}, -7) END"
+)
+
+
+def _values(ref: str) -> str:
+    return f"{ref}.title, {ref}.organizador, {ref}.notes, {_PHONE.format(p=f'{ref}.phone')}"
+
+
+def ensure_search_schema(conn: sqlite3.Connection, schema: str = "main"):
+    """Índice, vista y triggers en `schema` (también el archivo frío, ver utils/archive.py).
+
+    Dentro de la vista y los triggers los nombres se resuelven en su propio esquema."""
+    exists = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'bookings_fts'"
+    ).fetchone()
+    conn.execute(
+        f"CREATE VIEW IF NOT EXISTS {schema}.bookings_search_src AS "
+        f"SELECT id, {_values('bookings')} AS phone FROM bookings"
+    )
+    conn.execute(
+        f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {schema}.bookings_fts USING fts5(
+        {_COLS},
+        content = 'bookings_search_src',
+        content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """
+    )
+    # La fila borrada se le pasa al índice con los mismos valores con que se indexó
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {schema}.bookings_fts_ai AFTER INSERT ON bookings BEGIN
+        INSERT INTO bookings_fts(rowid, {_COLS}) VALUES (new.id, {_values('new')});
+    END
+    """
+    )
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {schema}.bookings_fts_ad AFTER DELETE ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, {_COLS}) VALUES ('delete', old.id, {_values('old')});
+    END
+    """
+    )
+    conn.execute(
+        f"""
+    CREATE TRIGGER IF NOT EXISTS {schema}.bookings_fts_au AFTER UPDATE OF {_COLS} ON bookings BEGIN
+        INSERT INTO bookings_fts(bookings_fts, rowid, {_COLS}) VALUES ('delete', old.id, {_values('old')});
+        INSERT INTO bookings_fts(rowid, {_COLS}) VALUES (new.id, {_values('new')});
+    END
+    """
+    )
+    if not exists:
+        conn.execute(f"INSERT INTO {schema}.bookings_fts(bookings_fts, rank) VALUES ('rank', ?)", (RANK,))
+        conn.execute(f"INSERT INTO {schema}.bookings_fts(bookings_fts) VALUES ('rebuild')")
+
+
+def fts_query(text) -> str | None:
+    """Texto libre → consulta FTS5: cada palabra entre comillas y por prefijo (AND implícito)."""
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"*' for w in words) or None
+
+
+def search(conn, text, limit=SEARCH_LIMIT, room=None, status=None, date_from=None, date_to=None) -> pd.DataFrame:
+    """Reservas que coinciden con `text` (más relevantes y luego más recientes) con un fragmento resaltado.
+
+    Incluye el archivo frío si el rango llega a lo archivado (cada índice aporta sus mejores `limit`)."""
+    q = fts_query(text)
+    if q is None:
+        return pd.DataFrame(columns=["id", "start_dt", "room", "title", "organizador", "phone", "status", "match"])
+    from utils.db import to_ts   # tarde: utils.db importa este módulo
+
+    conds, params = ["bookings_fts MATCH ?"], [q]
+    if room:
+        conds.append("b.room = ?"); params.append(room)
+    if status:
+        conds.append("b.status = ?"); params.append(status)
+    ts_from = to_ts(datetime.combine(date_from, time())) if date_from else None
+    if ts_from is not None:
+        conds.append("b.end_ts >= ?"); params.append(ts_from)
+    if date_to:
+        conds.append("b.start_ts <= ?"); params.append(to_ts(datetime.combine(date_to, time(23, 59, 59))))
+    arms, arm_params = [], []
+    for schema in archive.schemas(conn, ts_from):
+        where = " AND ".join(conds + ([archive.not_hot("b")] if schema == "archive" else []))
+        arms.append(
+            f"""
+            SELECT * FROM (
+                SELECT b.id, b.start_dt, b.room, b.title, b.organizador, b.phone, b.status,
+                       CASE WHEN instr(highlight(bookings_fts, 0, '«', '»') || highlight(bookings_fts, 1, '«', '»')
+                                       || highlight(bookings_fts, 2, '«', '»'), '«') = 0
+                            THEN '«' || b.phone || '»'   -- sólo coincidió el teléfono: no mostrar sus variantes
+                            ELSE snippet(bookings_fts, -1, '«', '»', '…', 12) END AS match,
+                       rank AS score, b.start_ts
+                  FROM {schema}.bookings_fts
+                  JOIN {schema}.bookings b ON b.id = bookings_fts.rowid
+                 WHERE {where}
+                 ORDER BY rank, b.start_ts DESC
+                 LIMIT ?
+            )
+            """
+        )
+        arm_params += [*params, int(limit)]
+    df = pd.read_sql_query(
+        " UNION ALL ".join(arms) + " ORDER BY score, start_ts DESC LIMIT ?",   # a igual relevancia, lo más reciente
+        conn,
+        params=[*arm_params, int(limit)],
+    )
+    return df.drop(columns=["score", "start_ts"])
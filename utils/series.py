@@ -0,0 +1,454 @@
+# utils/series.py
+# ------------------------------------------------------------
+# Series recurrentes (estilo RRULE): diaria, semanal con días, mensual
+# - Se guarda la definición (tabla series) + excepciones por fecha
+#   (series_exceptions: ocurrencia borrada o separada en una reserva suelta)
+# - Las ocurrencias se expanden sólo para el rango pedido
+# - Choques de todas las ocurrencias en un barrido contra las reservas y
+#   las demás series de la sala (no N consultas)
+# - Recordatorios y enlaces firmados siguen siendo de reservas sueltas:
+#   una ocurrencia separada ("sólo esta") pasa a ser una reserva normal
+# ------------------------------------------------------------
+import calendar
+import os
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from utils import archive
+from utils.db import EPOCH, external_version, get_conn, to_ts, transaction
+
+FREQS = {"daily": "Diaria", "weekly": "Semanal", "monthly": "Mensual"}
+MAX_OCCURRENCES = int(os.getenv("SERIES_MAX_OCCURRENCES", "1000"))
+WEEKDAYS = ("Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom")
+
+SERIES_FIELDS = (
+    "room", "title", "organizador", "color", "attendees", "phone", "status",
+    "notes", "chair_type", "chair_qty", "table_type", "table_qty",
+)
+
+
+@dataclass
+class Recurrence:
+    freq: str                        # "daily" | "weekly" | "monthly"
+    every: int = 1                   # cada N días/semanas/meses
+    byweekday: tuple = ()            # 0=lunes … 6=domingo (sólo weekly; vacío = día del inicio)
+    until: date | None = None        # última fecha posible (inclusive)
+    count: int | None = None         # o número de ocurrencias
+
+    def validate(self) -> str | None:
+        if self.freq not in FREQS:
+            return "Frecuencia inválida."
+        if int(self.every) < 1:
+            return "El intervalo debe ser 1 o más."
+        if self.until is None and not self.count:
+            return "Indica fecha final o número de repeticiones."
+        if self.count and int(self.count) > MAX_OCCURRENCES:
+            return f"Máximo {MAX_OCCURRENCES} repeticiones."
+        return None
+
+
+def occurrence_starts(rec: Recurrence, first: datetime, range_from: datetime | None = None,
+                      range_to: datetime | None = None, limit: int = MAX_OCCURRENCES):
+    """Inicios de ocurrencia en orden, desde range_from (inclusive) hasta range_to (exclusivo).
+
+    Diaria y semanal saltan directo al rango; count se respeta contando desde `first`.
+    Nunca más de `limit` (la validación pide MAX_OCCURRENCES + 1 para detectar el tope)."""
+    count = int(rec.count) if rec.count else limit
+    count = min(count, limit)
+    every = int(rec.every)
+
+    def done(t, n):
+        return n >= count or (rec.until is not None and t.date() > rec.until) or (range_to is not None and t >= range_to)
+
+    if rec.freq == "daily":
+        step = timedelta(days=every)
+        k = 0
+        if range_from is not None and range_from > first:
+            k = -(-(range_from - first) // step)   # ceil
+        while True:
+            t = first + step * k
+            if done(t, k):
+                return
+            yield t
+            k += 1
+
+    elif rec.freq == "weekly":
+        days = sorted({int(d) for d in rec.byweekday}) or [first.weekday()]
+        week0 = datetime.combine(first.date() - timedelta(days=first.weekday()), first.time())
+        n_first = sum(1 for d in days if d >= first.weekday())
+        b = 0
+        if range_from is not None and range_from > first:
+            b = max(0, (range_from - week0).days // (7 * every))
+        n = 0 if b == 0 else n_first + (b - 1) * len(days)
+        while True:
+            ws = week0 + timedelta(days=7 * every * b)
+            for d in days:
+                t = ws + timedelta(days=d)
+                if t < first:
+                    continue
+                if done(t, n):
+                    return
+                n += 1
+                if range_from is None or t >= range_from:
+                    yield t
+            b += 1
+
+    elif rec.freq == "monthly":
+        # Día del mes del inicio; los meses sin ese día se saltan (como RRULE)
+        n, m = 0, 0
+        while True:
+            y, mo = divmod(first.month - 1 + m * every, 12)
+            y += first.year
+            m += 1
+            if first.day > calendar.monthrange(y, mo + 1)[1]:
+                if y > first.year + 100:
+                    return
+                continue
+            t = first.replace(year=y, month=mo + 1)
+            if done(t, n):
+                return
+            n += 1
+            if range_from is None or t >= range_from:
+                yield t
+
+
+# ======================= LECTURA =======================
+
+def _rec_from_row(r) -> Recurrence:
+    return Recurrence(
+        freq=r["freq"],
+        every=int(r["every"] or 1),
+        byweekday=tuple(int(x) for x in (r["byweekday"] or "").split(",") if x != ""),
+        until=date.fromisoformat(r["until"]) if r["until"] else None,
+        count=int(r["count"]) if r["count"] else None,
+    )
+
+
+def _load(conn, ts_from: int, ts_to: int, room=None, exclude_series=None) -> list:
+    """Series cuyo tramo toca [ts_from, ts_to), con sus fechas exceptuadas."""
+    q = "SELECT * FROM series WHERE start_ts < ? AND end_ts > ?"
+    params = [ts_to, ts_from]
+    if room:
+        q += " AND room = ?"
+        params.append(room)
+    if exclude_series is not None:
+        q += " AND id != ?"
+        params.append(exclude_series)
+    cur = conn.execute(q, params)
+    cols = [c[0] for c in cur.description]
+    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    if rows:
+        marks = ",".join("?" * len(rows))
+        exc = {}
+        for sid, d in conn.execute(
+            f"SELECT series_id, occ_date FROM series_exceptions WHERE series_id IN ({marks})", [r["id"] for r in rows]
+        ):
+            exc.setdefault(sid, set()).add(d)
+        for r in rows:
+            r["exceptions"] = exc.get(r["id"], set())
+    return rows
+
+
+def _expand(row, ts_from: int, ts_to: int):
+    """(inicio_ts, fin_ts, fecha_ocurrencia) de la serie que tocan [ts_from, ts_to)."""
+    first = datetime.fromisoformat(row["start_dt"])
+    dur = int(row["duration_s"])
+    lo = EPOCH + timedelta(seconds=ts_from - dur)
+    hi = EPOCH + timedelta(seconds=ts_to)
+    for t in occurrence_starts(_rec_from_row(row), first, lo, hi):
+        d = t.date().isoformat()
+        if d in row["exceptions"]:
+            continue
+        s = to_ts(t)
+        if s + dur > ts_from:
+            yield s, s + dur, d
+
+
+def occurrence_id(series_id, occ_date) -> str:
+    return f"S{series_id}:{occ_date}"
+
+
+def parse_occurrence_id(value) -> tuple[int, str] | None:
+    v = str(value)
+    if not v.startswith("S") or ":" not in v:
+        return None
+    sid, d = v[1:].split(":", 1)
+    return int(sid), d
+
+
+def read_occurrences(conn, room_filter=None, date_from=None, date_to=None) -> pd.DataFrame:
+    """Ocurrencias con las columnas de read_bookings (id = 'S<serie>:<fecha>')."""
+    ts_from = to_ts(datetime.combine(date_from, datetime.min.time())) if date_from else 0
+    ts_to = to_ts(datetime.combine(date_to, datetime.max.time())) + 1 if date_to else to_ts(datetime(9999, 1, 1))
+    recs = []
+    for r in _load(conn, ts_from, ts_to, room=room_filter):
+        for s, e, d in _expand(r, ts_from, ts_to):
+            start = EPOCH + timedelta(seconds=s)
+            end = EPOCH + timedelta(seconds=e)
+            recs.append({
+                **{c: r[c] for c in SERIES_FIELDS},
+                "id": occurrence_id(r["id"], d),
+                "start_dt": start.isoformat(),
+                "end_dt": end.isoformat(),
+                "confirm_token": None,
+                "reminder_24h_sent": 0,
+                "reminder_24h_sent_at": None,
+                "series_id": r["id"],
+            })
+    return pd.DataFrame(recs)
+
+
+def load_rows(conn, ts_from: int, ts_to: int, statuses=None) -> list:
+    """[(room, start_ts, end_ts, attendees, chair_qty, table_qty)] de las ocurrencias en el rango (analítica)."""
+    out = []
+    for r in _load(conn, ts_from, ts_to):
+        if statuses and r["status"] not in statuses:
+            continue
+        w = (r["room"], int(r["attendees"] or 0), int(r["chair_qty"] or 0), int(r["table_qty"] or 0))
+        out.extend((w[0], s, e, *w[1:]) for s, e, _d in _expand(r, ts_from, ts_to))
+    return out
+
+
+def list_series(conn, room_filter=None) -> pd.DataFrame:
+    q = "SELECT id, room, title, organizador, start_dt, duration_s, freq, every, byweekday, until, count, status FROM series"
+    params = []
+    if room_filter:
+        q += " WHERE room = ?"
+        params.append(room_filter)
+    return pd.read_sql_query(q + " ORDER BY start_ts", conn, params=params)
+
+
+def describe_rows(df_series: pd.DataFrame) -> list:
+    """describe() de cada fila de list_series (la regla ya viene en sus columnas: sin consultar cada serie)."""
+    rows = df_series.astype(object).where(df_series.notna(), None).to_dict("records")
+    return [describe(_rec_from_row(r)) for r in rows]
+
+
+_series_rooms = (None, frozenset())   # (data_version, salas con alguna serie)
+
+
+def rooms_with_series() -> frozenset:
+    """Salas con alguna serie; se relee sólo si cambió la DB. Para lecturas fuera de transacción:
+    has_overlap/disponibilidad se saltan busy() (una consulta) en las salas sin series."""
+    global _series_rooms
+    ver = external_version()
+    if _series_rooms[0] != ver:
+        rooms = frozenset(r for (r,) in get_conn().execute("SELECT DISTINCT room FROM series"))
+        _series_rooms = (ver, rooms)
+    return _series_rooms[1]
+
+
+def busy(conn, room, ts_from: int, ts_to: int, exclude_series=None) -> list:
+    """[(inicio, fin, id_ocurrencia)] ordenado por inicio de todas las series de la sala en el rango."""
+    out = []
+    for r in _load(conn, ts_from, ts_to, room=room, exclude_series=exclude_series):
+        out.extend((s, e, occurrence_id(r["id"], d)) for s, e, d in _expand(r, ts_from, ts_to))
+    out.sort()
+    return out
+
+
+def conflict_rows(conn, room, start_ts: int, end_ts: int, exclude_series=None) -> list:
+    """Ocurrencias que chocan con [start_ts, end_ts), con el formato de bookings._conflict_rows."""
+    out = []
+    for r in _load(conn, start_ts, end_ts, room=room, exclude_series=exclude_series):
+        for s, e, d in _expand(r, start_ts, end_ts):
+            if s < end_ts and e > start_ts:
+                out.append({
+                    "id": occurrence_id(r["id"], d),
+                    "title": r["title"],
+                    "organizador": r["organizador"],
+                    "start_dt": (EPOCH + timedelta(seconds=s)).isoformat(),
+                    "end_dt": (EPOCH + timedelta(seconds=e)).isoformat(),
+                    "status": r["status"],
+                })
+    return out
+
+
+# ======================= CHOQUES EN LOTE =======================
+
+def sweep(busy_sorted: list, queries: list) -> list:
+    """Para cada (inicio, fin) de queries: ref del primer intervalo de busy_sorted que choca, o None.
+
+    busy_sorted = [(inicio, fin, ref)] por inicio. Máximo acumulado de fines + búsqueda binaria."""
+    starts = [b[0] for b in busy_sorted]
+    run_end, holder = [], []
+    best, who = None, None
+    for s, e, ref in busy_sorted:
+        if best is None or e > best:
+            best, who = e, ref
+        run_end.append(best)
+        holder.append(who)
+    out = []
+    for qs, qe in queries:
+        k = bisect_left(starts, qe)   # intervalos con inicio < fin de la query
+        out.append(holder[k - 1] if k > 0 and run_end[k - 1] > qs else None)
+    return out
+
+
+@dataclass
+class SeriesResult:
+    ok: bool
+    series_id: int | None = None
+    reason: str | None = None            # "invalid" | "capacity" | "conflict" | "not_found"
+    message: str | None = None
+    occurrences: int = 0
+    capacity: int | None = None
+    conflicts: list = field(default_factory=list)   # [(inicio_ocurrencia, id que choca)]
+
+
+def _check(w, booking: dict, rec: Recurrence, first: datetime, dur: int, series_id=None, skip_dates=()):
+    """Valida y devuelve (SeriesResult de error | None, ocurrencias [(s, e, fecha)])."""
+    from utils.bookings import get_room_catalog
+
+    msg = rec.validate()
+    if msg:
+        return SeriesResult(False, series_id, reason="invalid", message=msg), []
+    if dur <= 0:
+        return SeriesResult(False, series_id, reason="invalid", message="El fin debe ser posterior al inicio."), []
+    starts = list(occurrence_starts(rec, first, limit=MAX_OCCURRENCES + 1))
+    if len(starts) > MAX_OCCURRENCES:
+        # Con fecha final no se recorta en silencio: se pide acortarla
+        msg = f"La regla genera más de {MAX_OCCURRENCES} repeticiones; elige una fecha final más cercana."
+        return SeriesResult(False, series_id, reason="invalid", message=msg), []
+    occ = [(to_ts(t), to_ts(t) + dur, t.date().isoformat()) for t in starts]
+    occ = [o for o in occ if o[2] not in skip_dates]
+    if not occ:
+        return SeriesResult(False, series_id, reason="invalid", message="La regla no genera ocurrencias."), []
+    room = booking["room"]
+    cap = get_room_catalog().capacity(room)
+    if cap is not None and int(booking.get("attendees") or 0) > cap:
+        return SeriesResult(False, series_id, reason="capacity", capacity=cap), []
+    lo, hi = occ[0][0], occ[-1][1]
+    taken = [tuple(r) for r in w.execute(
+        f"SELECT start_ts, end_ts, id FROM {archive.source(w, lo)} "
+        "WHERE room = ? AND start_ts < ? AND end_ts > ? ORDER BY start_ts",
+        (room, hi, lo),
+    ).fetchall()]
+    taken = sorted(taken + busy(w, room, lo, hi, exclude_series=series_id))
+    hits = sweep(taken, [(s, e) for s, e, _d in occ])
+    conflicts = [(EPOCH + timedelta(seconds=o[0]), h) for o, h in zip(occ, hits) if h is not None]
+    if conflicts:
+        return SeriesResult(False, series_id, reason="conflict", capacity=cap, conflicts=conflicts), occ
+    return None, occ
+
+
+def _values(booking: dict, rec: Recurrence, first: datetime, dur: int, occ) -> list:
+    return [
+        *(booking.get(c) for c in SERIES_FIELDS[:3]),
+        first.isoformat(), dur, rec.freq, int(rec.every),
+        ",".join(str(int(d)) for d in sorted(set(rec.byweekday))) or None,
+        rec.until.isoformat() if rec.until else None,
+        int(rec.count) if rec.count else None,
+        occ[0][0], occ[-1][1],
+        booking.get("color"), int(booking.get("attendees") or 0), booking.get("phone"),
+        booking.get("status") or "Pendiente", booking.get("notes"), booking.get("chair_type"),
+        int(booking.get("chair_qty") or 0), booking.get("table_type"), int(booking.get("table_qty") or 0),
+    ]
+
+
+_COLS = (
+    "room, title, organizador, start_dt, duration_s, freq, every, byweekday, until, count, start_ts, end_ts, "
+    "color, attendees, phone, status, notes, chair_type, chair_qty, table_type, table_qty"
+)
+
+
+# ======================= ESCRITURA =======================
+
+def create_series(booking: dict, rec: Recurrence) -> SeriesResult:
+    """booking con las claves de BOOKING_FIELDS; start_dt/end_dt = primera ocurrencia."""
+    first = datetime.fromisoformat(str(booking["start_dt"]))
+    dur = to_ts(booking["end_dt"]) - to_ts(first)
+    with transaction() as w:
+        err, occ = _check(w, booking, rec, first, dur)
+        if err:
+            return err
+        cur = w.execute(
+            f"INSERT INTO series({_COLS}) VALUES ({','.join('?' * 21)})", _values(booking, rec, first, dur, occ)
+        )
+    return SeriesResult(True, cur.lastrowid, occurrences=len(occ))
+
+
+def update_series(series_id: int, booking: dict, rec: Recurrence) -> SeriesResult:
+    """Edita la serie completa (se conservan las excepciones por fecha)."""
+    first = datetime.fromisoformat(str(booking["start_dt"]))
+    dur = to_ts(booking["end_dt"]) - to_ts(first)
+    with transaction() as w:
+        if not w.execute("SELECT 1 FROM series WHERE id = ?", (series_id,)).fetchone():
+            return SeriesResult(False, series_id, reason="not_found")
+        skip = {d for (d,) in w.execute("SELECT occ_date FROM series_exceptions WHERE series_id = ?", (series_id,))}
+        err, occ = _check(w, booking, rec, first, dur, series_id=series_id, skip_dates=skip)
+        if err:
+            return err
+        sets = ", ".join(f"{c.strip()} = ?" for c in _COLS.split(","))
+        w.execute(f"UPDATE series SET {sets} WHERE id = ?", [*_values(booking, rec, first, dur, occ), series_id])
+    return SeriesResult(True, series_id, occurrences=len(occ))
+
+
+def delete_series(series_id: int):
+    # Las ocurrencias ya separadas quedan como reservas sueltas
+    with transaction() as w:
+        w.execute("DELETE FROM series_exceptions WHERE series_id = ?", (series_id,))
+        w.execute("DELETE FROM series WHERE id = ?", (series_id,))
+
+
+def skip_occurrence(series_id: int, occ_date: str):
+    """Borra sólo esta ocurrencia."""
+    with transaction() as w:
+        w.execute(
+            "INSERT OR REPLACE INTO series_exceptions(series_id, occ_date, booking_id) VALUES (?, ?, NULL)",
+            (series_id, occ_date),
+        )
+
+
+def detach_occurrence(series_id: int, occ_date: str, booking: dict):
+    """Edita sólo esta ocurrencia: la excepción y la nueva reserva suelta van en la misma transacción."""
+    from utils.bookings import ReserveResult, _index, _reserve_in, index_transaction
+
+    with index_transaction() as (w, rev):
+        if not w.execute("SELECT 1 FROM series WHERE id = ?", (series_id,)).fetchone():
+            return ReserveResult(False, reason="not_found")
+        w.execute("SAVEPOINT detach")
+        w.execute(
+            "INSERT OR REPLACE INTO series_exceptions(series_id, occ_date, booking_id) VALUES (?, ?, NULL)",
+            (series_id, occ_date),
+        )
+        res = _reserve_in(w, booking)
+        if not res.ok:
+            w.execute("ROLLBACK TO detach")
+            w.execute("RELEASE detach")
+            return res
+        w.execute(
+            "UPDATE series_exceptions SET booking_id = ? WHERE series_id = ? AND occ_date = ?",
+            (res.booking_id, series_id, occ_date),
+        )
+        w.execute("RELEASE detach")
+    _index.upsert(
+        res.booking_id, booking["room"], to_ts(booking["start_dt"]), to_ts(booking["end_dt"]),
+        booking.get("status") or "Pendiente", rev=rev,
+    )
+    return res
+
+
+def get_series(series_id: int, conn=None) -> tuple[dict, Recurrence] | None:
+    conn = conn or get_conn()
+    cur = conn.execute("SELECT * FROM series WHERE id = ?", (series_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    r = dict(zip([c[0] for c in cur.description], row))
+    return r, _rec_from_row(r)
+
+
+def describe(rec: Recurrence) -> str:
+    txt = {"daily": "día", "weekly": "semana", "monthly": "mes"}[rec.freq]
+    out = f"Cada {rec.every} {txt}" if int(rec.every) > 1 else f"Cada {txt}"
+    if rec.freq == "weekly" and rec.byweekday:
+        out += " (" + ", ".join(WEEKDAYS[d] for d in sorted(rec.byweekday)) + ")"
+    if rec.until:
+        out += f" hasta {rec.until.isoformat()}"
+    if rec.count:
+        out += f", {rec.count} veces"
+    return out
@@ -0,0 +1,107 @@
+# utils/tokens.py
+# ------------------------------------------------------------
+# Tokens firmados (HMAC-SHA256) para los enlaces Confirmar/Cancelar
+# - Codifican id de reserva + acción + vencimiento: se validan sin tocar la DB
+# - 27 caracteres base64url (frente a los 36 del UUID anterior)
+# - Secreto: LINK_SECRET; si falta se genera uno y se guarda en DATA_DIR
+# - Los UUID de confirm_token siguen valiendo mientras LEGACY_TOKENS=1
+# ------------------------------------------------------------
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import struct
+import threading
+from datetime import datetime
+
+from utils.db import DATA_DIR, to_ts
+
+LEGACY_TOKENS = os.getenv("LEGACY_TOKENS", "1") == "1"
+LINK_GRACE_H = int(os.getenv("LINK_GRACE_H", "24"))   # el enlace vale hasta el fin del evento + gracia
+
+_VERSION = 1
+_LAYOUT = struct.Struct(">BIBI")   # versión, booking_id, acción, vence (epoch hora local)
+_MAC_LEN = 10
+_TOKEN_LEN = 27                    # base64url sin '=' de 10 + 10 bytes
+ACTIONS = {"confirm": 1, "cancel": 2}
+ACTION_STATUS = {"confirm": "Confirmado", "cancel": "Cancelado"}
+_UUID_RE = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _get_secret() -> bytes:
+    global _secret
+    with _secret_lock:
+        if _secret is None:
+            env = os.getenv("LINK_SECRET")
+            secret = env.encode("utf-8") if env else _file_secret(DATA_DIR / "link_secret")
+            if not secret:
+                raise RuntimeError("Secreto de enlaces vacío (LINK_SECRET o DATA_DIR/link_secret)")
+            _secret = secret
+        return _secret
+
+
+def _file_secret(path) -> bytes:
+    # Persistido para que los enlaces sobrevivan a reinicios (mismo disco que la DB).
+    # App y scheduler arrancan a la vez: se escribe completo en un temporal y se enlaza
+    # con link() (falla si ya existe), así el archivo aparece entero y gana uno solo.
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                pass   # otro proceso lo creó antes: se usa el suyo
+        finally:
+            os.unlink(tmp)
+    return path.read_text().strip().encode("utf-8")
+
+
+def _mac(payload: bytes) -> bytes:
+    return hmac.new(_get_secret(), payload, hashlib.sha256).digest()[:_MAC_LEN]
+
+
+def sign(booking_id: int, action: str, expires_at) -> str:
+    """Token para `action` ('confirm'/'cancel'); expires_at es datetime, ISO o epoch (to_ts)."""
+    exp = expires_at if isinstance(expires_at, int) else to_ts(expires_at)
+    payload = _LAYOUT.pack(_VERSION, int(booking_id), ACTIONS[action], exp)
+    return base64.urlsafe_b64encode(payload + _mac(payload)).rstrip(b"=").decode("ascii")
+
+
+def link_expiry(end_dt) -> int:
+    return to_ts(end_dt) + LINK_GRACE_H * 3600
+
+
+def verify(token: str, action: str, now_ts: int | None = None) -> int | None:
+    """booking_id si el token es válido para `action` y no ha vencido; None si no (sin E/S)."""
+    if not isinstance(token, str) or len(token) != _TOKEN_LEN:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=")
+    except (binascii.Error, ValueError):
+        return None
+    payload, mac = raw[: _LAYOUT.size], raw[_LAYOUT.size:]
+    if len(mac) != _MAC_LEN or not hmac.compare_digest(mac, _mac(payload)):
+        return None
+    version, booking_id, act, exp = _LAYOUT.unpack(payload)
+    if version != _VERSION or act != ACTIONS.get(action):
+        return None
+    if exp < (now_ts if now_ts is not None else to_ts(datetime.now())):
+        return None
+    return booking_id
+
+
+def is_legacy(token: str) -> bool:
+    """UUID guardado en bookings.confirm_token (enlaces anteriores a la firma)."""
+    return LEGACY_TOKENS and isinstance(token, str) and bool(_UUID_RE.match(token))
@@ -0,0 +1,133 @@
+# utils/whatsapp.py
+# ------------------------------------------------------------
+# Envío por WhatsApp Cloud API
+# - Sesión HTTP persistente (keep-alive) compartida por el proceso
+# - Envío en lote con hilos acotados + límite de peticiones por segundo
+#   (un limitador por proceso: lotes seguidos o simultáneos comparten el ritmo)
+# - WHATSAPP_API_BASE permite apuntar a un servidor local de pruebas
+# ------------------------------------------------------------
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.profiling import timed
+
+API_BASE = os.getenv("WHATSAPP_API_BASE", "https://graph.facebook.com/v20.0").rstrip("/")
+MAX_WORKERS = int(os.getenv("WHATSAPP_MAX_WORKERS", "8"))
+RATE_PER_SEC = float(os.getenv("WHATSAPP_RPS", "20"))
+TIMEOUT_S = float(os.getenv("WHATSAPP_TIMEOUT_S", "20"))
+
+E164_RE = re.compile(r"\+\d{8,15}")   # lo que aceptan el formulario, la importación y la Cloud API
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(MAX_WORKERS, 1))
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+class RateLimiter:
+    """Token bucket thread-safe: como máximo `rate` llamadas por segundo (ráfaga = burst)."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters = {}
+
+
+def get_limiter(rate: float = RATE_PER_SEC) -> RateLimiter:
+    """Limitador compartido por el proceso (uno por ritmo), como la sesión HTTP."""
+    with _session_lock:
+        lim = _limiters.get(float(rate))
+        if lim is None:
+            lim = _limiters[float(rate)] = RateLimiter(rate)
+        return lim
+
+
+def is_valid_e164(phone: str) -> bool:
+    return bool(E164_RE.fullmatch((phone or "").strip()))
+
+
+def is_configured() -> bool:
+    return bool(os.environ.get("WHATSAPP_PHONE_NUMBER_ID") and os.environ.get("WHATSAPP_TOKEN"))
+
+
+def send_whatsapp_cloud_reply(to_phone_e164, text_message, session=None, timeout=TIMEOUT_S):
+    phone_id = os.environ.get("WHATSAPP_PHONE_NUMBER_ID")
+    token = os.environ.get("WHATSAPP_TOKEN")
+    if not phone_id or not token:
+        raise RuntimeError("Faltan variables WHATSAPP_PHONE_NUMBER_ID / WHATSAPP_TOKEN.")
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    data = {
+        "messaging_product": "whatsapp",
+        "to": to_phone_e164.replace(" ", ""),
+        "type": "text",
+        "text": {"body": text_message[:4096]},
+    }
+    url = f"{API_BASE}/{phone_id}/messages"
+    r = (session or get_session()).post(url, headers=headers, json=data, timeout=timeout)
+    if r.status_code >= 300:
+        raise RuntimeError(f"Cloud API error {r.status_code}: {r.text}")
+
+
+@timed("whatsapp.send_batch")
+def send_batch(messages, max_workers=MAX_WORKERS, rate_per_sec=RATE_PER_SEC, timeout=TIMEOUT_S):
+    """messages: iterable de (clave, teléfono, texto). Devuelve (claves_ok, [(clave, error)]).
+
+    Las llamadas salen en paralelo (máx. max_workers) respetando rate_per_sec entre todos los lotes."""
+    messages = list(messages)
+    if not messages:
+        return [], []
+    limiter = get_limiter(rate_per_sec)
+    session = get_session()
+
+    def _one(msg):
+        key, phone, text = msg
+        limiter.acquire()
+        try:
+            send_whatsapp_cloud_reply(phone, text, session=session, timeout=timeout)
+            return key, None
+        except Exception as e:
+            return key, str(e)
+
+    ok, fail = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(messages)))) as pool:
+        for key, err in pool.map(_one, messages):
+            if err is None:
+                ok.append(key)
+            else:
+                fail.append((key, err))
+    return ok, fail